@@ -39,6 +39,26 @@ def get_api_overview():
                         },
                         "example": "/realtime/stock/000001?force_refresh=true"
                     },
+                    "批量获取个股实时数据": {
+                        "url": "/realtime/stocks",
+                        "method": "GET / POST",
+                        "description": "在同一份行情快照上一次查询多只股票，返回行情及未找到的代码",
+                        "parameters": {
+                            "symbols": "股票代码，GET为逗号分隔字符串，POST为请求体中的列表",
+                            "force_refresh": "强制刷新行情快照，默认false"
+                        },
+                        "example": "/realtime/stocks?symbols=000001,600519,300750"
+                    },
+                    "订阅行情增量推送": {
+                        "url": "/realtime/stream",
+                        "method": "GET (Server-Sent Events)",
+                        "description": "连接后先推送符合条件的完整行情，之后每次快照刷新只推送价格或成交量变化的行情",
+                        "parameters": {
+                            "symbols": "股票代码，逗号分隔，不填表示全市场",
+                            "industry": "行业名称，如：医药"
+                        },
+                        "example": "/realtime/stream?symbols=000001,600519"
+                    },
                     "获取行业公司列表": {
                         "url": "/realtime/companies/{industry}",
                         "method": "GET",
@@ -49,6 +69,15 @@ def get_api_overview():
                         },
                         "example": "/realtime/companies/医药?force_refresh=true"
                     },
+                    "获取申万行业成分股": {
+                        "url": "/realtime/companies/shenwan/{industry}",
+                        "method": "GET",
+                        "description": "按申万行业分类精确获取成分股的实时行情（/realtime/companies/{industry} 只按名称关键词匹配）",
+                        "parameters": {
+                            "industry": "申万一、二、三级行业名称，如：医药生物、白酒Ⅱ"
+                        },
+                        "example": "/realtime/companies/shenwan/医药生物"
+                    },
                     "测试AKShare连接": {
                         "url": "/realtime/test/akshare",
                         "method": "GET",
@@ -157,6 +186,21 @@ def get_api_overview():
                         },
                         "example": "/industries/suggest/医药"
                     },
+                    "申万行业分类": {
+                        "url": "/industries/shenwan",
+                        "method": "GET",
+                        "description": "获取申万一、二、三级行业及成分股数量（每天刷新）",
+                        "parameters": {
+                            "level": "行业级别：1、2、3"
+                        },
+                        "example": "/industries/shenwan?level=1"
+                    },
+                    "个股申万行业": {
+                        "url": "/industries/shenwan/{symbol}",
+                        "method": "GET",
+                        "description": "获取个股的申万一、二、三级行业",
+                        "example": "/industries/shenwan/600519"
+                    },
                     "获取行业数据": {
                         "url": "/industries/{industry_name}/data",
                         "method": "GET",
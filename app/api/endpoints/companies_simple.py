@@ -7,10 +7,14 @@
 from fastapi import APIRouter, HTTPException, Query, Path
 from typing import List, Optional
 from app.utils.data_manager import data_manager
+from app.utils import freshness
 from app.services.analyzers.gemini_analyzer import GeminiAnalyzer
-from app.services.realtime_data_service import RealtimeDataService
+from app.services.realtime_data_service import realtime_service
 from pydantic import BaseModel
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/companies", tags=["公司管理"])
 
@@ -111,8 +115,6 @@ def get_companies(
     GET /api/v1/companies/?industry=医药&force_refresh=true
     ```
     """
-    realtime_service = RealtimeDataService()
-    
     try:
         if industry:
             # 如果指定了行业，使用实时数据服务获取该行业的公司
@@ -204,8 +206,6 @@ def get_company(
     GET /api/v1/companies/000001?force_refresh=true
     ```
     """
-    realtime_service = RealtimeDataService()
-    
     try:
         # 首先尝试从实时数据服务获取
         stock_data = realtime_service.get_stock_realtime_data(company_code, force_refresh)
@@ -298,8 +298,6 @@ def get_company_financial_data(
     ```
     """
     # 优先尝试实时数据
-    from app.services.realtime_data_service import RealtimeDataService
-    realtime_service = RealtimeDataService()
     financial_records = None
     
     # 1. 优先尝试实时数据采集
@@ -383,7 +381,8 @@ def analyze_company(
     **功能说明**：
     - 根据公司代码和分析类型，生成AI分析报告。
     - 支持财务分析、趋势分析等。
-    - 支持force_refresh参数，优先尝试实时数据，失败降级本地。
+    - 新鲜期（TTL_ANALYSES）内已有同类型报告时直接返回该报告，不重复调用AI。
+    - 支持force_refresh参数，优先尝试实时数据并重新分析，失败降级本地。
 
     **参数说明**：
     - company_code: str，公司代码，必填，6位数字。例如：000001
@@ -405,9 +404,12 @@ def analyze_company(
     }
     ```
     """
+    # 新鲜期内的分析报告直接返回
+    if not force_refresh:
+        latest = data_manager.get_analysis_results("company", company_code, request.analysis_type, limit=1)
+        if latest and freshness.is_fresh(latest[0].get("created_at"), "analysis"):
+            return AnalysisResponse(**latest[0])
     # 优先尝试实时数据
-    from app.services.realtime_data_service import RealtimeDataService
-    realtime_service = RealtimeDataService()
     company_data = None
     financial_records = None
     if force_refresh:
@@ -463,7 +465,7 @@ def analyze_company(
         "confidence": analysis_result.get("confidence", 0.8),
         "created_at": datetime.now().isoformat()
     }
-    data_manager.save_analysis_result(analysis_id, analysis_data)
+    data_manager.save_analysis_result(analysis_data)
     return AnalysisResponse(
         id=analysis_id,
         target_type="company",
@@ -483,7 +485,9 @@ def analyze_company(
 @router.get("/{company_code}/analysis", response_model=List[AnalysisResponse], summary="📊 获取公司分析报告", operation_id="company_analysis_reports")
 def get_company_analysis(
     company_code: str = Path(..., description="公司代码，6位数字。例如：000001"),
-    analysis_type: Optional[str] = Query(None, description="分析类型筛选，可选值：financial、industry。不填则返回所有类型")
+    analysis_type: Optional[str] = Query(None, description="分析类型筛选，可选值：financial、industry。不填则返回所有类型"),
+    skip: int = Query(0, ge=0, description="跳过记录数，用于分页。默认：0"),
+    limit: int = Query(20, ge=1, le=200, description="返回记录数限制，最大200。默认：20")
 ):
     """
     获取公司分析结果列表
@@ -496,6 +500,8 @@ def get_company_analysis(
     **参数说明**：
     - company_code: str，公司代码，必填，6位数字。例如：000001
     - analysis_type: str，分析类型筛选，可选，financial/industry
+    - skip: int，跳过记录数，可选，默认0
+    - limit: int，返回记录数限制，可选，默认20，最大200
 
     **返回**：
     - List[AnalysisResponse]，分析结果列表，包含：
@@ -521,31 +527,27 @@ def get_company_analysis(
     GET /api/v1/companies/000001/analysis?analysis_type=financial
     ```
     """
-    analysis_results = data_manager.get_analysis_results()
-    
-    # 过滤该公司的分析结果
-    company_analyses = []
-    for analysis_id, analysis_data in analysis_results.items():
-        if analysis_data.get('target_type') == 'company' and analysis_data.get('target_id') == company_code:
-            if analysis_type and analysis_data.get('analysis_type') != analysis_type:
-                continue
-            
-            company_analyses.append(AnalysisResponse(
-                id=analysis_id,
-                target_type=analysis_data.get('target_type', ''),
-                target_id=analysis_data.get('target_id', ''),
-                analysis_type=analysis_data.get('analysis_type', ''),
-                title=analysis_data.get('title', ''),
-                summary=analysis_data.get('summary', ''),
-                details=analysis_data.get('details', ''),
-                score=analysis_data.get('score'),
-                risk_level=analysis_data.get('risk_level'),
-                ai_model=analysis_data.get('ai_model', ''),
-                confidence=analysis_data.get('confidence'),
-                created_at=datetime.fromisoformat(analysis_data.get('created_at', datetime.now().isoformat()))
-            ))
+    analysis_results = data_manager.get_analysis_results(
+        'company', company_code, analysis_type=analysis_type, limit=limit, offset=skip
+    )
     
-    return company_analyses
+    return [
+        AnalysisResponse(
+            id=analysis_data.get('id', ''),
+            target_type=analysis_data.get('target_type', ''),
+            target_id=analysis_data.get('target_id', ''),
+            analysis_type=analysis_data.get('analysis_type', ''),
+            title=analysis_data.get('title', ''),
+            summary=analysis_data.get('summary', ''),
+            details=analysis_data.get('details', ''),
+            score=analysis_data.get('score'),
+            risk_level=analysis_data.get('risk_level'),
+            ai_model=analysis_data.get('ai_model', ''),
+            confidence=analysis_data.get('confidence'),
+            created_at=datetime.fromisoformat(analysis_data.get('created_at', datetime.now().isoformat()))
+        )
+        for analysis_data in analysis_results
+    ]
 
 
 @router.get("/summary", response_model=dict, summary="📈 获取公司数据概览", operation_id="companies_summary")
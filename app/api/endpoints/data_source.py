@@ -73,11 +73,12 @@ def get_stock_data(
             if "error" not in company_data:
                 local_storage.save_company(company_data)
             
-            # 处理并保存财务数据
+            # 处理并批量保存财务数据
             financial_data_list = processor.process_financial_data(data)
-            for financial_data in financial_data_list:
-                if "error" not in financial_data:
-                    local_storage.save_financial_data(symbol, financial_data)
+            local_storage.save_financial_data_bulk(
+                [financial_data for financial_data in financial_data_list if "error" not in financial_data],
+                company_id=symbol
+            )
         
         return DataSourceResponse(success=True, message="数据获取成功", data=data, source=actual_source)
     
@@ -8,7 +8,10 @@ from fastapi import APIRouter, HTTPException, Query, Path
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
+import numpy as np
 from app.services.incremental_data_service import incremental_service
+from app.utils.bar_store import int_to_date
+from app.utils.bar_panel import PANEL_FIELDS
 
 router = APIRouter(prefix="/historical", tags=["历史数据"])
 
@@ -30,6 +33,13 @@ class DataStatisticsResponse(BaseModel):
     volume_stats: Dict[str, float]
     last_updated: str
 
+class CrossSectionResponse(BaseModel):
+    field: str
+    symbols: List[str]
+    dates: List[str]
+    values: List[List[Optional[float]]]
+    missing_symbols: List[str]
+
 @router.get("/stock/{symbol}", response_model=HistoricalDataResponse, summary="📈 获取股票历史数据", operation_id="stock_historical_data")
 def get_stock_historical_data(
     symbol: str = Path(..., description="股票代码，6位数字。例如：000001（平安银行）、000002（万科A）、300750（宁德时代）"),
@@ -160,6 +170,69 @@ def get_stock_data_statistics(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
+@router.get("/panel", response_model=CrossSectionResponse, summary="🧮 全市场截面数据", operation_id="historical_cross_section")
+def get_cross_section(
+    field: str = Query("close", description=f"字段：{', '.join(PANEL_FIELDS)}。默认：close"),
+    start_date: Optional[str] = Query(None, description="开始日期，格式：YYYY-MM-DD。默认：面板最早日期"),
+    end_date: Optional[str] = Query(None, description="结束日期，格式：YYYY-MM-DD。默认：面板最新日期"),
+    symbols: Optional[str] = Query(None, description="股票代码，多个用逗号分隔。默认：全部股票")
+):
+    """
+    从全市场K线面板读取截面数据
+    
+    **返回数据：**
+    - symbols: 股票代码（行）
+    - dates: 交易日（列）
+    - values: 字段值矩阵，缺失为null
+    - missing_symbols: 面板中不存在的股票代码
+    
+    **使用示例：**
+    ```
+    GET /api/v1/historical/panel?field=close&start_date=2024-01-01&end_date=2024-03-31
+    GET /api/v1/historical/panel?field=volume&symbols=000001,600519
+    ```
+    """
+    try:
+        symbol_list = [s.strip() for s in symbols.split(',') if s.strip()] if symbols else None
+        section = incremental_service.get_cross_section(field, start_date, end_date, symbol_list)
+        
+        if section is None:
+            raise HTTPException(status_code=404, detail="K线面板尚未构建，请先调用 POST /historical/panel/rebuild")
+        
+        values = section["values"]
+        found = set(section["symbols"])
+        return CrossSectionResponse(
+            field=field,
+            symbols=section["symbols"],
+            dates=[int_to_date(value) for value in section["dates"]],
+            values=np.where(np.isnan(values), None, values).tolist(),
+            missing_symbols=[s for s in symbol_list if s not in found] if symbol_list else []
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取截面数据失败: {str(e)}")
+
+@router.get("/panel/info", summary="🧮 K线面板概况", operation_id="historical_panel_info")
+def get_panel_info():
+    """
+    获取全市场K线面板的股票数、交易日数和构建时间
+    """
+    return incremental_service.panel.info()
+
+@router.post("/panel/rebuild", summary="🧮 重建K线面板", operation_id="historical_panel_rebuild")
+def rebuild_panel():
+    """
+    用已缓存的日线数据重建全市场K线面板
+    """
+    try:
+        return incremental_service.rebuild_panel()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"重建K线面板失败: {str(e)}")
+
 @router.get("/incremental/demo", summary="🔍 演示增量数据逻辑", operation_id="incremental_demo")
 def demonstrate_incremental_logic():
     """
@@ -201,7 +274,7 @@ def demonstrate_incremental_logic():
         "cache_strategy": {
             "daily_data": "缓存1天",
             "minute_data": "缓存5分钟",
-            "storage": "./data/cache.json"
+            "storage": "./data/bars/<周期>/<代码>.npy（元信息为同目录的 <代码>.meta.json）"
         }
     }
 
@@ -214,17 +287,14 @@ def get_cache_status():
         from app.utils.data_manager import data_manager
         
         cache_info = data_manager.get_cache_info()
-        historical_caches = {}
-        
-        # 筛选历史数据缓存
-        for key, info in cache_info.items():
-            if key.startswith("historical_"):
-                historical_caches[key] = info
+        # 历史K线及其元信息存放在K线文件目录中，不在缓存库里
+        historical_caches = incremental_service.get_storage_info()
         
         return {
             "total_cache_count": len(cache_info),
             "historical_cache_count": len(historical_caches),
             "historical_caches": historical_caches,
+            "historical_storage": incremental_service.bar_store.root_dir,
             "cache_keys": list(cache_info.keys())
         }
         
@@ -240,20 +310,7 @@ def clear_symbol_cache(
     清除指定股票的缓存
     """
     try:
-        from app.utils.data_manager import data_manager
-        
-        if period:
-            cache_key = f"historical_{symbol}_{period}"
-            success = data_manager.clear_cache(cache_key)
-        else:
-            # 清除该股票的所有周期缓存
-            cache_info = data_manager.get_cache_info()
-            cleared_count = 0
-            for key in cache_info.keys():
-                if key.startswith(f"historical_{symbol}_"):
-                    if data_manager.clear_cache(key):
-                        cleared_count += 1
-            success = cleared_count > 0
+        success = incremental_service.clear_cache(symbol, period)
         
         if success:
             return {"message": f"清除 {symbol} 缓存成功"}
@@ -7,10 +7,15 @@
 from fastapi import APIRouter, HTTPException, Query, Path
 from typing import List, Optional
 from app.utils.data_manager import data_manager
+from app.utils import freshness
 from app.utils.industry_mapper import IndustryMapper
+from app.utils.industry_index import industry_index
 from app.services.analyzers.gemini_analyzer import GeminiAnalyzer
 from pydantic import BaseModel
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/industries", tags=["行业管理"])
 
@@ -95,6 +100,59 @@ def get_industry_suggestions(
         "all_industries": IndustryMapper.get_all_industries()
     }
 
+@router.get("/shenwan", response_model=dict, summary="🗂️ 申万行业分类", operation_id="shenwan_industries")
+def get_shenwan_industries(
+    level: int = Query(1, ge=1, le=3, description="行业级别：1（一级）、2（二级）、3（三级）")
+):
+    """
+    获取申万行业分类及各行业成分股数量
+    
+    **输入参数说明：**
+    - **level**: 行业级别，默认1
+    
+    **返回数据：**
+    - level: 行业级别
+    - industries: 行业名称 -> 成分股数量
+    - index: 索引状态（来源、收录股票数、更新时间）
+    
+    **数据说明：**
+    - 个股行业分类来自申万宏源研究，缓存在本地并每天刷新
+    - 索引在后台加载，加载完成前返回503
+    
+    **使用示例：**
+    ```
+    GET /api/v1/industries/shenwan?level=1
+    ```
+    """
+    industries = industry_index.industries(level)
+    if not industries:
+        raise HTTPException(status_code=503, detail="申万行业分类暂不可用，请稍后重试")
+    return {"level": level, "industries": industries, "index": industry_index.info()}
+
+@router.get("/shenwan/{symbol}", response_model=dict, summary="🏷️ 个股申万行业", operation_id="shenwan_stock_industry")
+def get_stock_shenwan_industry(
+    symbol: str = Path(..., description="股票代码，例如：000001、600519")
+):
+    """
+    获取个股的申万一、二、三级行业
+    
+    **返回数据：**
+    - symbol: 股票代码
+    - code: 申万三级行业代码
+    - level1/level2/level3: 一、二、三级行业名称
+    
+    **使用示例：**
+    ```
+    GET /api/v1/industries/shenwan/600519
+    ```
+    """
+    classification = industry_index.get(symbol)
+    if classification is None:
+        if not industry_index.warm():
+            raise HTTPException(status_code=503, detail="申万行业分类正在加载，请稍后重试")
+        raise HTTPException(status_code=404, detail=f"未找到股票 {symbol} 的申万行业分类")
+    return classification
+
 
 @router.get("/{industry_name}/data", response_model=List[IndustryDataResponse], summary="📊 获取行业数据", operation_id="industry_data")
 def get_industry_data(
@@ -155,8 +213,7 @@ def get_industry_data(
         raise HTTPException(status_code=404, detail=error_msg)
     
     # 优先尝试实时数据
-    from app.services.realtime_data_service import RealtimeDataService
-    realtime_service = RealtimeDataService()
+    from app.services.realtime_data_service import realtime_service
     industry_data = None
     
     # 1. 优先尝试实时数据采集
@@ -241,8 +298,6 @@ def get_latest_industry_data(
         raise HTTPException(status_code=404, detail="未找到行业")
     
     # 优先尝试实时数据
-    from app.services.realtime_data_service import RealtimeDataService
-    realtime_service = RealtimeDataService()
     industry_data = None
     
     if force_refresh:
@@ -282,7 +337,8 @@ def analyze_industry(
     **功能说明**：
     - 根据行业名称和分析类型，生成AI行业分析报告。
     - 支持趋势、投资、风险等多种分析类型。
-    - 支持force_refresh参数，优先尝试实时数据，失败降级本地。
+    - 新鲜期（TTL_ANALYSES）内已有同类型报告时直接返回该报告，不重复调用AI。
+    - 支持force_refresh参数，优先尝试实时数据并重新分析，失败降级本地。
 
     **参数说明**：
     - industry_name: str，行业名称，必填，支持中英文
@@ -308,9 +364,12 @@ def analyze_industry(
     mapped_industry = IndustryMapper.map_industry(industry_name)
     if not mapped_industry:
         raise HTTPException(status_code=404, detail="未找到行业")
+    # 新鲜期内的分析报告直接返回
+    if not force_refresh:
+        latest = data_manager.get_analysis_results("industry", mapped_industry, request.analysis_type, limit=1)
+        if latest and freshness.is_fresh(latest[0].get("created_at"), "analysis"):
+            return IndustryAnalysisResponse(**latest[0])
     # 优先尝试实时数据
-    from app.services.realtime_data_service import RealtimeDataService
-    realtime_service = RealtimeDataService()
     industry_data = None
     if force_refresh:
         # 实时获取行业数据（如有实现，可补充）
@@ -351,7 +410,7 @@ def analyze_industry(
         "confidence": analysis_result.get("confidence", 0.8),
         "created_at": datetime.now().isoformat()
     }
-    data_manager.save_analysis_result(analysis_id, analysis_data)
+    data_manager.save_analysis_result(analysis_data)
     return IndustryAnalysisResponse(
         id=analysis_id,
         target_type="industry",
@@ -371,7 +430,9 @@ def analyze_industry(
 @router.get("/{industry_name}/analysis", response_model=List[IndustryAnalysisResponse], summary="📊 获取行业分析报告", operation_id="industry_analysis_reports")
 def get_industry_analysis(
     industry_name: str = Path(..., description="行业名称，支持中文和英文。例如：医药、新能源、半导体"),
-    analysis_type: Optional[str] = Query(None, description="分析类型筛选，可选值：trend、investment、risk。不填则返回所有类型")
+    analysis_type: Optional[str] = Query(None, description="分析类型筛选，可选值：trend、investment、risk。不填则返回所有类型"),
+    skip: int = Query(0, ge=0, description="跳过记录数，用于分页。默认：0"),
+    limit: int = Query(20, ge=1, le=200, description="返回记录数限制，最大200。默认：20")
 ):
     """
     获取行业分析结果列表
@@ -385,6 +446,8 @@ def get_industry_analysis(
     **参数说明**：
     - industry_name: str，行业名称，必填，支持中英文。例如：医药、新能源、半导体
     - analysis_type: str，分析类型筛选，可选，trend/investment/risk
+    - skip: int，跳过记录数，可选，默认0
+    - limit: int，返回记录数限制，可选，默认20，最大200
 
     **返回**：
     - List[IndustryAnalysisResponse]，分析结果列表，包含：
@@ -416,31 +479,27 @@ def get_industry_analysis(
     if not mapped_industry:
         raise HTTPException(status_code=404, detail="未找到行业")
     
-    analysis_results = data_manager.get_analysis_results()
-    
-    # 过滤该行业的分析结果
-    industry_analyses = []
-    for analysis_id, analysis_data in analysis_results.items():
-        if analysis_data.get('target_type') == 'industry' and analysis_data.get('target_id') == mapped_industry:
-            if analysis_type and analysis_data.get('analysis_type') != analysis_type:
-                continue
-            
-            industry_analyses.append(IndustryAnalysisResponse(
-                id=analysis_id,
-                target_type=analysis_data.get('target_type', ''),
-                target_id=analysis_data.get('target_id', ''),
-                analysis_type=analysis_data.get('analysis_type', ''),
-                title=analysis_data.get('title', ''),
-                summary=analysis_data.get('summary', ''),
-                details=analysis_data.get('details', ''),
-                score=analysis_data.get('score'),
-                risk_level=analysis_data.get('risk_level'),
-                ai_model=analysis_data.get('ai_model', ''),
-                confidence=analysis_data.get('confidence'),
-                created_at=datetime.fromisoformat(analysis_data.get('created_at', datetime.now().isoformat()))
-            ))
+    analysis_results = data_manager.get_analysis_results(
+        'industry', mapped_industry, analysis_type=analysis_type, limit=limit, offset=skip
+    )
     
-    return industry_analyses
+    return [
+        IndustryAnalysisResponse(
+            id=analysis_data.get('id', ''),
+            target_type=analysis_data.get('target_type', ''),
+            target_id=analysis_data.get('target_id', ''),
+            analysis_type=analysis_data.get('analysis_type', ''),
+            title=analysis_data.get('title', ''),
+            summary=analysis_data.get('summary', ''),
+            details=analysis_data.get('details', ''),
+            score=analysis_data.get('score'),
+            risk_level=analysis_data.get('risk_level'),
+            ai_model=analysis_data.get('ai_model', ''),
+            confidence=analysis_data.get('confidence'),
+            created_at=datetime.fromisoformat(analysis_data.get('created_at', datetime.now().isoformat()))
+        )
+        for analysis_data in analysis_results
+    ]
 
 
 @router.get("/summary", response_model=dict, summary="📈 获取行业数据概览", operation_id="industries_summary")
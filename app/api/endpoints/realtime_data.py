@@ -4,11 +4,18 @@
 支持混合模式：本地缓存 + 实时获取
 """
 
+import asyncio
 from fastapi import APIRouter, HTTPException, Query, Path
-from typing import List, Optional, Dict, Any
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, Union
 from pydantic import BaseModel
 from datetime import datetime
+from app.core.config import settings
 from app.services.realtime_data_service import realtime_service
+from app.services.spot_feed import spot_feed, FeedFilter
+from app.utils.single_flight import single_flight
+from app.utils.trading_calendar import trading_calendar
 from app.utils.industry_mapper import IndustryMapper
 
 router = APIRouter(prefix="/realtime", tags=["实时数据"])
@@ -28,6 +35,24 @@ class StockDataResponse(BaseModel):
     market: Optional[str] = None
     source: str
     update_time: str
+    snapshot_time: Optional[str] = None
+    snapshot_age: Optional[float] = None
+    stale: bool = False
+
+class BatchStockRequest(BaseModel):
+    symbols: List[str]
+    force_refresh: bool = False
+
+class BatchStockResponse(BaseModel):
+    quotes: Dict[str, StockDataResponse]
+    missing: List[str]
+    count: int
+    snapshot_time: Optional[str] = None
+    snapshot_age: Optional[float] = None
+    stale: bool = False
+
+# 单次批量查询的股票数量上限
+MAX_BATCH_SYMBOLS = 2000
 
 class CompanyResponse(BaseModel):
     code: str
@@ -41,12 +66,25 @@ class CompanyResponse(BaseModel):
     market_cap: Optional[float] = None
     source: str
     update_time: str
+    snapshot_time: Optional[str] = None
+    snapshot_age: Optional[float] = None
+    stale: bool = False
+
+class ShenwanCompaniesResponse(BaseModel):
+    industry: str
+    count: int
+    companies: List[CompanyResponse]
+    index: Dict[str, Any]
 
 class CacheInfoResponse(BaseModel):
     cache_key: str
     timestamp: str
     data_type: str
 
+class CacheStatsResponse(BaseModel):
+    memory_cache: Dict[str, Any]
+    cache_store: Dict[str, Any]
+
 @router.get("/stock/{symbol}", response_model=StockDataResponse, summary="📈 获取个股实时数据", operation_id="stock_realtime_data")
 def get_stock_realtime_data(
     symbol: str = Path(..., description="股票代码，例如：000001（平安银行）、000002（万科A）、300750（宁德时代）"),
@@ -71,6 +109,8 @@ def get_stock_realtime_data(
     - 交易数据（成交量、成交额等）
     - 财务指标（市盈率、市净率等）
     - 数据来源和时间戳
+    - 全市场行情快照时间（snapshot_time）与快照年龄（snapshot_age，秒）
+    - 是否为过期数据（stale，过期数据返回的同时在后台刷新）
     
     **使用示例：**
     ```
@@ -91,6 +131,75 @@ def get_stock_realtime_data(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取股票数据失败: {str(e)}")
 
+def _batch_stock_response(symbols: List[str], force_refresh: bool) -> BatchStockResponse:
+    """批量查询并组装响应"""
+    if not symbols:
+        raise HTTPException(status_code=400, detail="请提供至少一个股票代码")
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"单次最多查询 {MAX_BATCH_SYMBOLS} 只股票")
+    
+    result = realtime_service.get_stocks_realtime_data(symbols, force_refresh)
+    quotes = {symbol: StockDataResponse(**quote) for symbol, quote in result["quotes"].items()}
+    return BatchStockResponse(
+        quotes=quotes,
+        missing=result["missing"],
+        count=len(quotes),
+        snapshot_time=result.get("snapshot_time"),
+        snapshot_age=result.get("snapshot_age"),
+        stale=result.get("stale", False)
+    )
+
+@router.get("/stocks", response_model=BatchStockResponse, summary="📊 批量获取个股实时数据", operation_id="stocks_realtime_data")
+def get_stocks_realtime_data(
+    symbols: str = Query(..., description="股票代码，逗号分隔，例如：000001,600519,300750"),
+    force_refresh: bool = Query(False, description="强制刷新行情快照。默认False")
+):
+    """
+    批量获取个股实时数据
+    
+    **输入参数说明：**
+    - **symbols**: 股票代码列表（必填），逗号分隔，单次最多2000只，也支持股票名称
+    - **force_refresh**: 强制刷新（可选），True=先同步刷新全市场行情快照
+    
+    **返回数据：**
+    - quotes: 以请求的代码为键的行情
+    - missing: 未找到的代码
+    - 全市场行情快照时间（snapshot_time）与快照年龄（snapshot_age，秒）
+    - 是否为过期数据（stale，过期数据返回的同时在后台刷新）
+    
+    **使用示例：**
+    ```
+    GET /api/v1/realtime/stocks?symbols=000001,600519,300750
+    ```
+    """
+    try:
+        return _batch_stock_response([symbol for symbol in symbols.split(",") if symbol.strip()], force_refresh)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量获取股票数据失败: {str(e)}")
+
+@router.post("/stocks", response_model=BatchStockResponse, summary="📊 批量获取个股实时数据（POST）", operation_id="stocks_realtime_data_post")
+def post_stocks_realtime_data(request: BatchStockRequest):
+    """
+    批量获取个股实时数据（请求体传入代码列表，适合代码较多的自选股看板）
+    
+    **使用示例：**
+    ```
+    POST /api/v1/realtime/stocks
+    {
+      "symbols": ["000001", "600519", "300750"],
+      "force_refresh": false
+    }
+    ```
+    """
+    try:
+        return _batch_stock_response(request.symbols, request.force_refresh)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量获取股票数据失败: {str(e)}")
+
 @router.get("/companies/{industry}", response_model=List[CompanyResponse], summary="🏢 获取行业公司实时数据", operation_id="companies_realtime_data")
 def get_companies_realtime(
     industry: str = Path(..., description="行业名称，支持中文和英文。例如：医药、新能源、半导体、medical、new_energy、semiconductor"),
@@ -114,6 +223,11 @@ def get_companies_realtime(
     - 实时价格数据（当前价、涨跌幅等）
     - 交易数据（成交量、成交额等）
     - 数据来源和时间戳
+    - 全市场行情快照时间（snapshot_time）与快照年龄（snapshot_age，秒）
+    - 是否为过期数据（stale，过期数据返回的同时在后台刷新）
+    
+    **数据说明：**
+    - 按股票名称中的行业关键词匹配；按申万行业分类精确取成分股请使用 /realtime/companies/shenwan/{industry}
     
     **使用示例：**
     ```
@@ -143,15 +257,131 @@ def get_companies_realtime(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取行业数据失败: {str(e)}")
 
-@router.get("/cache/info", response_model=Dict[str, CacheInfoResponse], summary="💾 获取缓存信息", operation_id="cache_info")
-def get_cache_info():
+@router.get("/companies/shenwan/{industry}", response_model=ShenwanCompaniesResponse, summary="🗂️ 获取申万行业成分股实时数据", operation_id="shenwan_companies_realtime_data")
+def get_shenwan_companies_realtime(
+    industry: str = Path(..., description="申万一、二、三级行业名称（与 /industries/shenwan 返回的名称完全相同），例如：医药生物、白酒Ⅱ")
+):
+    """
+    获取申万行业成分股的实时行情
+    
+    与 /realtime/companies/{industry} 的区别：后者按股票名称中的行业关键词匹配，
+    本接口按申万行业分类精确取成分股（名称不含行业关键词的股票也会返回）
+    
+    **返回数据：**
+    - industry: 申万行业名称
+    - count: 成分股数量
+    - companies: 成分股实时行情（字段同 /realtime/companies/{industry}）
+    - index: 申万行业索引状态（来源、收录股票数、更新时间）
+    
+    **数据说明：**
+    - 申万行业索引在后台加载，加载完成前返回503
+    
+    **使用示例：**
+    ```
+    GET /api/v1/realtime/companies/shenwan/医药生物
+    ```
+    """
+    industries = realtime_service.snapshots.industries
+    if not industries.warm():
+        raise HTTPException(status_code=503, detail="申万行业分类正在加载，请稍后重试")
+    if not len(industries.symbols(industry)):
+        raise HTTPException(status_code=404, detail=f"未找到申万行业 '{industry}'，可用名称见 /industries/shenwan")
+    try:
+        result = realtime_service.get_shenwan_companies_realtime(industry)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取申万行业数据失败: {str(e)}")
+    companies = [CompanyResponse(**company) for company in result["companies"]]
+    return ShenwanCompaniesResponse(
+        industry=industry, count=len(companies), companies=companies, index=result["index"]
+    )
+
+@router.get("/stream", summary="📡 订阅行情增量推送（SSE）", operation_id="realtime_stream")
+async def stream_realtime(
+    symbols: Optional[str] = Query(None, description="股票代码，逗号分隔，例如：000001,600519；不填表示全市场"),
+    industry: Optional[str] = Query(None, description="行业名称，例如：医药、新能源、semiconductor；与symbols同时指定时取交集")
+):
+    """
+    订阅全市场行情快照的增量推送（Server-Sent Events）
+    
+    **推送内容：**
+    - 连接建立时先推送一条 `snapshot` 事件：符合条件的全部行情
+    - 之后每次快照刷新推送一条 `delta` 事件：只包含最新价或成交量变化的行情（quotes）及已退出快照的代码（removed），
+      没有变化时不推送；`base_version` 为比较的上一份快照版本，客户端忽略 `version` 不大于已有版本的事件
+    - 客户端处理过慢导致积压时，丢弃积压的增量并重新推送 `snapshot` 事件
+    - 每隔 SPOT_FEED_KEEPALIVE 秒无推送时发送注释行保持连接
+    
+    **使用示例：**
+    ```
+    GET /api/v1/realtime/stream?symbols=000001,600519
+    GET /api/v1/realtime/stream?industry=医药
+    ```
+    """
+    symbol_list = [symbol for symbol in (symbols or '').split(",") if symbol.strip()]
+    if len(symbol_list) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"单次最多订阅 {MAX_BATCH_SYMBOLS} 只股票")
+    mapped_industry = None
+    if industry:
+        mapped_industry = IndustryMapper.map_industry(industry)
+        if not mapped_industry:
+            suggestions = IndustryMapper.get_suggestions(industry)
+            raise HTTPException(status_code=400, detail=f"未找到行业 '{industry}'，建议: {suggestions}")
+    
+    feed_filter = FeedFilter.create(symbol_list, mapped_industry)
+    subscription = spot_feed.subscribe(feed_filter)
+    
+    async def events():
+        try:
+            frame = await run_in_threadpool(spot_feed.snapshot_frame, feed_filter)
+            if frame is not None:
+                yield frame
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscription.queue.get(), timeout=settings.SPOT_FEED_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if subscription.lagged:
+                    # 积压：丢弃排队的增量，重新推送完整行情
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.lagged = False
+                    frame = await run_in_threadpool(spot_feed.snapshot_frame, feed_filter)
+                    if frame is None:
+                        continue
+                yield frame
+        finally:
+            spot_feed.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/snapshot/info", summary="🛰️ 获取行情快照状态", operation_id="spot_snapshot_info")
+def get_snapshot_info():
+    """获取全市场行情快照状态（快照时间、年龄、行数、刷新统计）"""
+    return realtime_service.snapshots.info()
+
+@router.get("/session", summary="🕘 获取当前交易时段", operation_id="trading_session")
+def get_trading_session():
+    """获取当前交易时段（pre_open/morning/lunch/afternoon/closed/holiday）、是否交易日、下一次开盘与收盘时间及交易日历来源"""
+    return trading_calendar.info()
+
+@router.get("/cache/info", response_model=Dict[str, Union[CacheInfoResponse, CacheStatsResponse]], summary="💾 获取缓存信息", operation_id="cache_info")
+def get_cache_info(
+    include_stats: bool = Query(True, description="是否附带命中/未命中等统计（以\"_stats\"键返回）")
+):
     """获取缓存信息"""
     try:
         from app.utils.data_manager import data_manager
-        cache_info = data_manager.get_cache_info()
+        cache_info = data_manager.get_cache_info(include_stats=include_stats)
         
         # 转换为响应格式
         response = {}
+        stats = cache_info.pop("_stats", None)
+        if stats is not None:
+            response["_stats"] = CacheStatsResponse(**stats)
         for key, info in cache_info.items():
             response[key] = CacheInfoResponse(
                 cache_key=key,
@@ -181,6 +411,17 @@ def clear_cache(cache_key: Optional[str] = Query(None, description="指定缓存
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"清除缓存失败: {str(e)}")
 
+@router.post("/cache/evict", summary="🧹 执行缓存淘汰", operation_id="evict_cache")
+def evict_cache():
+    """立即删除过期缓存，并按最近访问时间淘汰超出条数/大小预算的缓存"""
+    try:
+        from app.utils.data_manager import data_manager
+        result = data_manager.evict_cache()
+        return {"message": "缓存淘汰完成", **result}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"缓存淘汰失败: {str(e)}")
+
 @router.get("/test/akshare", summary="🔗 测试AKShare连接", operation_id="test_akshare_connection")
 def test_akshare_connection():
     """测试AKShare连接"""
@@ -212,7 +453,8 @@ def get_realtime_summary():
         from app.utils.data_manager import data_manager
         
         # 获取缓存信息
-        cache_info = data_manager.get_cache_info()
+        cache_info = data_manager.get_cache_info(include_stats=True)
+        cache_stats = cache_info.pop("_stats", {})
         
         # 获取数据摘要
         data_summary = data_manager.get_data_summary()
@@ -220,6 +462,11 @@ def get_realtime_summary():
         return {
             "cache_count": len(cache_info),
             "cache_keys": list(cache_info.keys()),
+            "cache_stats": cache_stats,
+            "spot_snapshot": realtime_service.snapshots.info(),
+            "single_flight": single_flight.stats(),
+            "spot_feed": spot_feed.stats(),
+            "trading_session": trading_calendar.info(),
             "data_summary": data_summary,
             "akshare_status": test_akshare_connection(),
             "last_updated": datetime.now().isoformat()
@@ -52,11 +52,12 @@ def get_stock_data(
             if "error" not in company_data:
                 local_storage.save_company(company_data)
             
-            # 处理并保存财务数据
+            # 处理并批量保存财务数据
             financial_data_list = processor.process_financial_data(data)
-            for financial_data in financial_data_list:
-                if "error" not in financial_data:
-                    local_storage.save_financial_data(ticker, financial_data)
+            local_storage.save_financial_data_bulk(
+                [financial_data for financial_data in financial_data_list if "error" not in financial_data],
+                company_id=ticker
+            )
             
             # 处理并保存行业数据
             industry_data = processor.extract_industry_data(data)
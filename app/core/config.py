@@ -30,14 +30,78 @@ class Settings(BaseSettings):
     # 应用配置
     DEBUG: bool = True
     SECRET_KEY: str = "your-secret-key-change-in-production"
+    # uvicorn工作进程数（调试模式下启用自动重载，固定为1）
+    WORKERS: int = 1
+    
+    # 全市场行情快照：交易时段的后台刷新间隔（秒，0表示只在读取时按需刷新）与读取时可接受的最大年龄（秒）
+    SPOT_REFRESH_INTERVAL: int = 30
+    SPOT_MAX_AGE: int = 60
+    # 行情增量推送（/realtime/stream）：每个连接最多积压的帧数与无推送时的保活间隔（秒）
+    SPOT_FEED_QUEUE_SIZE: int = 32
+    SPOT_FEED_KEEPALIVE: int = 15
+    
+    # 交易时段：开启时行情类数据只在交易时段内按TTL过期，休市期间获取的数据有效至下一次开盘，历史行情在收盘后过期
+    SESSION_AWARE_TTL: bool = True
+    # 休市后仍按交易时段处理的秒数（等待收盘数据落定）
+    SESSION_SETTLE_SECONDS: int = 300
+    # 交易日历（AKShare交易日）缓存的刷新间隔（天）
+    TRADING_CALENDAR_REFRESH_DAYS: int = 7
+    # 申万行业索引（个股 -> 一、二、三级行业）缓存的刷新间隔（小时）
+    INDUSTRY_INDEX_REFRESH_HOURS: int = 24
+    
+    # 过期数据处理：开启时过期不超过MAX_STALENESS秒的数据直接返回（标记stale）并在后台刷新，否则请求同步刷新
+    STALE_WHILE_REVALIDATE: bool = True
+    MAX_STALENESS: int = 3600
+    
+    # 各类数据的新鲜期（秒）：按数据持久化的写入时间判断，超过后需要刷新
+    TTL_QUOTES: int = 60  # 个股行情缓存（交易时段内）
+    TTL_INDUSTRY_LISTS: int = 60  # 行业公司列表缓存（含行情，交易时段内）
+    TTL_INDUSTRY_DATA: int = 86400  # 行业数据
+    TTL_FINANCIALS: int = 604800  # 财务数据
+    TTL_HISTORY: int = 86400  # 历史行情（超过后刷新最新K线）
+    TTL_ANALYSES: int = 86400  # AI分析报告（新鲜期内重复分析直接返回最近一次报告）
     
     # 爬虫配置
-    CRAWLER_DELAY: int = 1
+    CRAWLER_DELAY: int = 1  # 已由按主机的令牌桶限流（RATE_LIMIT_*）取代，保留以兼容旧配置
     CRAWLER_TIMEOUT: int = 30
+    # 采集器并发调用上游接口的共享线程池大小与单个调用的超时时间（秒）
+    COLLECTOR_MAX_WORKERS: int = 8
+    COLLECTOR_CALL_TIMEOUT: int = 20
+    # 批量采集：并发线程数、每批写入的结果数、最长运行时间（秒，0表示不限，到时停止并可从检查点继续）
+    BULK_WORKERS: int = 4
+    BULK_BATCH_SIZE: int = 200
+    BULK_MAX_SECONDS: int = 0
+    # 按主机限流（令牌桶，进程内所有采集线程共享）
+    RATE_LIMIT_RPS: float = 5.0
+    RATE_LIMIT_BURST: int = 5
+    RATE_LIMITS: str = "eastmoney.com=8:8,sina.com.cn=3:3,finance.yahoo.com=2:2"
+    # 失败重试（连接错误、超时、HTTP 429/5xx）
+    REQUEST_RETRY_COUNT: int = 3
+    RETRY_BACKOFF_BASE: float = 0.5
+    RETRY_BACKOFF_MAX: float = 30.0
+    RETRY_BUDGET_RATIO: float = 0.2
+    RETRY_BUDGET_RESERVE: int = 10
     USER_AGENT: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./data/financial.db"
+    # 存储后端：json（data/*.json文件）或 sqlite（DATABASE_URL指定的SQLite数据库）
+    STORAGE_BACKEND: str = "json"
+    # 数据文件编码：json（安装orjson时使用orjson）或 msgpack；读取时自动识别旧版JSON文件
+    DATA_FORMAT: str = "json"
+    # 数据文件压缩：none、gzip 或 zstd（需安装zstandard）
+    DATA_COMPRESSION: str = "none"
+    
+    # 缓存配置（data/cache.db）
+    # 各命名空间缓存的保留时间（秒），过期后删除；0表示不过期
+    CACHE_TTL_STOCK: int = 86400
+    CACHE_TTL_INDUSTRY: int = 86400
+    CACHE_TTL_HISTORICAL: int = 2592000
+    # 缓存总条数与总大小上限，超出时淘汰最久未访问的缓存；0表示不限
+    CACHE_MAX_ENTRIES: int = 5000
+    CACHE_MAX_MB: int = 256
+    # 后台淘汰间隔（秒），0表示不启动后台淘汰
+    CACHE_EVICTION_INTERVAL: int = 300
     
     # 数据源配置
     EASTMONEY_BASE_URL: str = "http://f10.eastmoney.com"
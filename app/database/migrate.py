@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+JSON数据迁移到SQLite
+将data/*.json（公司、财务、行业、分析结果）一次性导入SQL数据仓库
+
+用法：
+    python -m app.database.migrate [--data-dir ./data] [--database-url sqlite:///./data/financial.db] [--force]
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+from typing import Dict
+import logging
+
+from app.utils.data_manager import DataManager
+from app.database.repository import SQLRepository, MIGRATION_MARKER
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_json_to_sql(source: DataManager, target: SQLRepository) -> Dict[str, int]:
+    """
+    将JSON数据管理器中的数据导入SQL数据仓库
+
+    已存在的记录按唯一键覆盖，可重复执行；完成后写入迁移标记文件
+
+    Returns:
+        各类数据的迁移条数
+    """
+    companies = [
+        dict(company_data, code=company_data.get('code', company_id))
+        for company_id, company_data in source.get_all_companies().items()
+    ]
+    financial_records = [
+        dict(record, company_id=company_id)
+        for company_id, records in source.get_all_financial_data().items()
+        for record in records
+    ]
+    industries = {name: dict(data) for name, data in source.get_all_industries().items()}
+    analysis_results = [dict(result) for result in source.get_analysis_results()]
+
+    # 保留原有的更新时间，迁移后的数据按原时间判断新鲜度
+    ok = (
+        target.save_companies_bulk(companies)
+        and target.save_financial_data_bulk(financial_records, keep_timestamps=True)
+        and target.save_industries_bulk(industries, keep_timestamps=True)
+        and target.save_analysis_results_bulk(analysis_results)
+    )
+    if not ok:
+        raise RuntimeError("写入SQL数据仓库失败，请查看日志")
+
+    counts = {
+        "companies": len(companies),
+        "financial_records": len(financial_records),
+        "industries": len(industries),
+        "analysis_results": len(analysis_results)
+    }
+    with open(os.path.join(target.data_dir, MIGRATION_MARKER), 'w', encoding='utf-8') as f:
+        json.dump({"migrated_at": datetime.now().isoformat(), "counts": counts}, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"JSON数据已迁移到 {target.database_url}: {counts}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将data/*.json迁移到SQLite")
+    parser.add_argument("--data-dir", default=None, help="JSON数据目录，默认使用配置的DATA_DIR")
+    parser.add_argument("--database-url", default=None, help="数据库URL，默认使用配置的DATABASE_URL")
+    parser.add_argument("--force", action="store_true", help="忽略迁移标记重新迁移")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    repository = SQLRepository(args.data_dir, args.database_url, auto_migrate=False)
+    marker = os.path.join(repository.data_dir, MIGRATION_MARKER)
+    if os.path.exists(marker) and not args.force:
+        print(f"已迁移过（{marker}），如需重新迁移请使用 --force")
+        return
+
+    counts = migrate_json_to_sql(DataManager(repository.data_dir), repository)
+    print(f"✅ 迁移完成: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -12,6 +12,7 @@ class Company(Base):
     name = Column(String(100), index=True, comment="公司名称")
     industry = Column(String(50), index=True, comment="所属行业")
     market = Column(String(20), comment="市场类型")
+    data = Column(Text, comment="完整记录（JSON）")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -22,7 +23,8 @@ class FinancialData(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, index=True, comment="公司ID")
-    report_date = Column(DateTime, index=True, comment="报告期")
+    company_code = Column(String(10), index=True, comment="股票代码")
+    report_date = Column(DateTime, index=True, nullable=False, comment="报告期（缺失时为1900-01-01）")
     data_type = Column(String(50), index=True, comment="数据类型")
     
     # 财务指标
@@ -38,7 +40,13 @@ class FinancialData(Base):
     debt_ratio = Column(Float, comment="资产负债率")
     current_ratio = Column(Float, comment="流动比率")
     
+    data = Column(Text, comment="完整记录（JSON）")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # 同一公司、报告期、数据类型只保留一条记录
+        Index("ux_financial_data_company_report", "company_code", "report_date", "data_type", unique=True),
+    )
 
 
 class IndustryData(Base):
@@ -57,6 +65,7 @@ class IndustryData(Base):
     avg_pe = Column(Float, comment="平均市盈率")
     
     description = Column(Text, comment="描述")
+    data = Column(Text, comment="完整记录（JSON）")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -67,6 +76,8 @@ class AnalysisResult(Base):
     id = Column(Integer, primary_key=True, index=True)
     target_type = Column(String(50), index=True, comment="分析目标类型")
     target_id = Column(Integer, index=True, comment="分析目标ID")
+    target_code = Column(String(50), index=True, comment="分析目标代码")
+    result_key = Column(String(100), unique=True, index=True, comment="分析结果编号")
     analysis_type = Column(String(50), index=True, comment="分析类型")
     
     # 分析结果
@@ -80,7 +91,13 @@ class AnalysisResult(Base):
     ai_model = Column(String(50), comment="AI模型")
     confidence = Column(Float, comment="置信度")
     
+    data = Column(Text, comment="完整记录（JSON）")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # 按目标列出分析结果（按时间倒序分页）
+        Index("ix_analysis_results_target", "target_type", "target_code", "analysis_type", "created_at"),
+    )
 
 
 class TaskLog(Base):
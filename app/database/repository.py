@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+SQL数据仓库
+基于SQLAlchemy模型的数据管理器，接口与DataManager一致
+公司、财务、行业、分析结果存入SQLite（WAL模式），缓存仍使用CacheStore；
+不再创建JSON后端的财务日志与分析结果库，同一份数据只有一个存储
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple, Union
+import logging
+
+from sqlalchemy import create_engine, event, inspect, select, delete, func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.database.models import Company, FinancialData, IndustryData, AnalysisResult
+from app.utils.data_manager import DataManager
+from app.utils.helpers import to_records
+
+logger = logging.getLogger(__name__)
+
+# 行业数据表中由DataManager接口写入的行业快照
+INDUSTRY_SNAPSHOT = "snapshot"
+
+# 记录中与模型列同名的数值指标，写入时同步到对应列以便查询
+FINANCIAL_METRICS = (
+    "revenue", "net_profit", "total_assets", "total_liabilities", "operating_cash_flow",
+    "roe", "roa", "debt_ratio", "current_ratio"
+)
+INDUSTRY_METRICS = ("market_size", "growth_rate", "avg_pe")
+
+# 迁移标记文件（记录迁移时间和条数，存在时不再自动迁移）
+MIGRATION_MARKER = "sql_migration.json"
+
+# 缺少或无法解析的报告期存为该日期：SQLite唯一索引中NULL互不相等，存NULL时同一记录会重复插入
+NO_REPORT_DATE = datetime(1900, 1, 1)
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    """解析报告期（YYYYMMDD、YYYY-MM-DD、datetime），无法解析时返回None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    text_value = str(value).strip()
+    try:
+        if len(text_value) == 8 and text_value.isdigit():
+            return datetime.strptime(text_value, '%Y%m%d')
+        return datetime.fromisoformat(text_value[:10])
+    except ValueError:
+        return None
+
+
+def _parse_created_at(value: Any) -> datetime:
+    """解析分析结果的创建时间，缺失时使用当前时间"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return datetime.now()
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return None
+    return result if result == result else None
+
+
+class SQLRepository(DataManager):
+    """基于SQLAlchemy模型的数据仓库"""
+
+    def __init__(self, data_dir: str = None, database_url: str = None, auto_migrate: bool = True):
+        """
+        Args:
+            data_dir: 数据目录（缓存和迁移来源）
+            database_url: 数据库连接URL，默认使用配置的DATABASE_URL（指定data_dir时为data_dir/financial.db）
+            auto_migrate: 首次启动时是否自动从data/*.json迁移
+        """
+        super().__init__(data_dir)
+        if database_url is None:
+            database_url = settings.DATABASE_URL if data_dir is None else \
+                f"sqlite:///{os.path.join(self.data_dir, 'financial.db')}"
+        self.database_url = database_url
+
+        self.engine = create_engine(database_url, connect_args={"check_same_thread": False, "timeout": 30})
+        event.listen(self.engine, "connect", self._on_connect)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self._init_schema()
+
+        if auto_migrate:
+            self._auto_migrate()
+
+    def _init_record_stores(self):
+        """财务数据与分析结果存入SQL表，不创建JSON后端的财务日志与分析结果库"""
+        self.financial_journal = None
+        self.analysis_store = None
+
+    def close(self):
+        """关闭缓存数据库连接并释放SQLAlchemy连接池"""
+        super().close()
+        self.engine.dispose()
+
+    @staticmethod
+    def _on_connect(dbapi_connection, connection_record):
+        """每个连接启用WAL，读写互不阻塞"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    def _init_schema(self):
+        """建表，并为旧版数据库补充新增的列和索引"""
+        Base.metadata.create_all(self.engine)
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table in (Company.__table__, FinancialData.__table__, IndustryData.__table__, AnalysisResult.__table__):
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                        logger.info(f"数据表 {table.name} 新增列 {column.name}")
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+            self._fill_missing_report_dates(conn)
+
+    @staticmethod
+    def _fill_missing_report_dates(conn):
+        """旧版数据库中报告期为NULL的财务记录：同一公司、数据类型只保留最新一条，报告期改为NO_REPORT_DATE"""
+        missing = conn.execute(text("SELECT COUNT(*) FROM financial_data WHERE report_date IS NULL")).scalar()
+        if not missing:
+            return
+        conn.execute(text(
+            "DELETE FROM financial_data WHERE report_date IS NULL AND id NOT IN ("
+            "SELECT MAX(id) FROM financial_data WHERE report_date IS NULL GROUP BY company_code, data_type)"
+        ))
+        conn.execute(
+            FinancialData.__table__.update()
+            .where(FinancialData.report_date.is_(None))
+            .values(report_date=NO_REPORT_DATE)
+        )
+        logger.info(f"已补全 {missing} 条财务记录缺失的报告期")
+
+    def _auto_migrate(self):
+        """首次启动时从JSON文件迁移数据"""
+        if os.path.exists(os.path.join(self.data_dir, MIGRATION_MARKER)):
+            return
+        from app.database.migrate import migrate_json_to_sql
+        try:
+            migrate_json_to_sql(DataManager(self.data_dir), self)
+        except Exception as e:
+            logger.error(f"从JSON迁移数据失败: {e}")
+
+    # 公司数据管理
+    @staticmethod
+    def _company_row(company_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        company_id = company_data.get('code', company_data.get('id'))
+        if not company_id:
+            return None
+        return {
+            "code": str(company_id),
+            "name": company_data.get('name'),
+            "industry": company_data.get('industry'),
+            "market": company_data.get('market'),
+            "data": _dumps(company_data)
+        }
+
+    def _upsert_companies(self, rows: List[Dict[str, Any]]) -> bool:
+        """按股票代码批量插入或更新公司"""
+        if not rows:
+            return True
+        stmt = sqlite_insert(Company.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["code"],
+            set_={
+                "name": stmt.excluded.name,
+                "industry": stmt.excluded.industry,
+                "market": stmt.excluded.market,
+                "data": stmt.excluded.data,
+                "updated_at": func.now()
+            }
+        )
+        try:
+            with self.Session.begin() as session:
+                session.execute(stmt, rows)
+            return True
+        except Exception as e:
+            logger.error(f"保存公司数据失败: {e}")
+            return False
+
+    def save_company(self, company_data: Dict[str, Any]) -> bool:
+        """保存公司数据"""
+        row = self._company_row(company_data)
+        return self._upsert_companies([row]) if row else False
+
+    def save_companies_bulk(self, companies_data: Union[List[Dict[str, Any]], Any]) -> bool:
+        """批量保存公司数据（单个事务）"""
+        rows = {}
+        for company_data in to_records(companies_data):
+            row = self._company_row(company_data)
+            if row:
+                rows[row["code"]] = row
+        return self._upsert_companies(list(rows.values()))
+
+    def get_company(self, company_id: str) -> Optional[Dict[str, Any]]:
+        """获取公司数据"""
+        with self.Session() as session:
+            data = session.scalar(select(Company.data).where(Company.code == company_id))
+        return json.loads(data) if data else None
+
+    def get_all_companies(self) -> Dict[str, Any]:
+        """获取所有公司数据"""
+        with self.Session() as session:
+            rows = session.execute(select(Company.code, Company.data).order_by(Company.id)).all()
+        return {code: json.loads(data) for code, data in rows if data}
+
+    def get_companies_by_industry(self, industry: str) -> List[Dict[str, Any]]:
+        """获取指定行业的公司列表（走industry索引）"""
+        with self.Session() as session:
+            rows = session.scalars(
+                select(Company.data).where(Company.industry == industry).order_by(Company.id)
+            ).all()
+        return [json.loads(data) for data in rows if data]
+
+    def delete_company(self, company_id: str) -> bool:
+        """删除公司数据"""
+        with self.Session.begin() as session:
+            result = session.execute(delete(Company).where(Company.code == company_id))
+        return result.rowcount > 0
+
+    # 财务数据管理
+    @staticmethod
+    def _financial_row(company_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        row = {
+            "company_code": str(company_id),
+            "report_date": _parse_date(record.get('report_date')) or NO_REPORT_DATE,
+            # 数据类型为空时存空字符串，保证唯一索引对其生效
+            "data_type": record.get('data_type') or '',
+            "data": _dumps(record)
+        }
+        for metric in FINANCIAL_METRICS:
+            row[metric] = _to_float(record.get(metric))
+        return row
+
+    def _upsert_financial(self, items: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """按 (公司代码, 报告期, 数据类型) 批量插入或更新财务记录"""
+        if not items:
+            return True
+        rows = [self._financial_row(company_id, record) for company_id, record in items]
+        stmt = sqlite_insert(FinancialData.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["company_code", "report_date", "data_type"],
+            set_={column: stmt.excluded[column] for column in FINANCIAL_METRICS + ("data",)}
+        )
+        try:
+            with self.Session.begin() as session:
+                session.execute(stmt, rows)
+            return True
+        except Exception as e:
+            logger.error(f"保存财务数据失败: {e}")
+            return False
+
+    def save_financial_data(self, company_id: str, financial_data: Dict[str, Any]) -> bool:
+        """保存财务数据（相同报告期和数据类型的记录会被覆盖）"""
+        financial_data['updated_at'] = datetime.now().isoformat()
+        return self._upsert_financial([(company_id, financial_data)])
+
+    def save_financial_data_bulk(
+        self,
+        financial_data: Union[List[Dict[str, Any]], Any],
+        company_id: str = None,
+        keep_timestamps: bool = False
+    ) -> bool:
+        """批量保存财务数据（单个事务）"""
+        return self._upsert_financial(self._financial_items(financial_data, company_id, keep_timestamps))
+
+    def get_financial_data(self, company_id: str) -> List[Dict[str, Any]]:
+        """获取公司财务数据（走company_code索引）"""
+        with self.Session() as session:
+            rows = session.scalars(
+                select(FinancialData.data)
+                .where(FinancialData.company_code == company_id)
+                .order_by(FinancialData.id)
+            ).all()
+        return [json.loads(data) for data in rows if data]
+
+    def get_all_financial_data(self) -> Dict[str, List[Dict[str, Any]]]:
+        """获取全部公司的财务数据"""
+        with self.Session() as session:
+            rows = session.execute(
+                select(FinancialData.company_code, FinancialData.data).order_by(FinancialData.id)
+            ).all()
+        all_financial: Dict[str, List[Dict[str, Any]]] = {}
+        for company_id, data in rows:
+            all_financial.setdefault(company_id, []).append(json.loads(data))
+        return all_financial
+
+    def get_financial_data_by_period(
+        self,
+        start_date: str = None,
+        end_date: str = None,
+        company_ids: List[str] = None,
+        data_type: str = None
+    ) -> List[Dict[str, Any]]:
+        """按报告期范围查询财务数据（走report_date索引）"""
+        query = select(FinancialData.company_code, FinancialData.data).where(FinancialData.report_date > NO_REPORT_DATE)
+        if start_date:
+            query = query.where(FinancialData.report_date >= _parse_date(start_date))
+        if end_date:
+            query = query.where(FinancialData.report_date <= _parse_date(end_date))
+        if company_ids:
+            query = query.where(FinancialData.company_code.in_(company_ids))
+        if data_type:
+            query = query.where(FinancialData.data_type == data_type)
+
+        with self.Session() as session:
+            rows = session.execute(query.order_by(FinancialData.id)).all()
+        return [dict(json.loads(data), company_id=company_id) for company_id, data in rows]
+
+    def delete_financial_data(self, company_id: str, data_id: str = None) -> bool:
+        """删除财务数据"""
+        with self.Session.begin() as session:
+            query = delete(FinancialData).where(FinancialData.company_code == company_id)
+            if data_id:
+                rows = session.execute(
+                    select(FinancialData.id, FinancialData.data).where(FinancialData.company_code == company_id)
+                ).all()
+                ids = [row_id for row_id, data in rows if json.loads(data).get('id') == data_id]
+                if not ids:
+                    return False
+                query = delete(FinancialData).where(FinancialData.id.in_(ids))
+            result = session.execute(query)
+        return result.rowcount > 0
+
+    # 行业数据管理
+    def _replace_industries(self, industries: Dict[str, Dict[str, Any]]) -> bool:
+        """写入行业快照（每个行业只保留一条）"""
+        if not industries:
+            return True
+        now = datetime.now()
+        rows = []
+        for industry_name, industry_data in industries.items():
+            row = {
+                "industry": industry_name,
+                "data_date": now,
+                "data_type": INDUSTRY_SNAPSHOT,
+                "description": industry_data.get('description'),
+                "data": _dumps(industry_data)
+            }
+            for metric in INDUSTRY_METRICS:
+                row[metric] = _to_float(industry_data.get(metric))
+            company_count = _to_float(industry_data.get('company_count'))
+            row["company_count"] = int(company_count) if company_count is not None else None
+            rows.append(row)
+        try:
+            with self.Session.begin() as session:
+                session.execute(
+                    delete(IndustryData)
+                    .where(IndustryData.data_type == INDUSTRY_SNAPSHOT)
+                    .where(IndustryData.industry.in_(list(industries.keys())))
+                )
+                session.execute(IndustryData.__table__.insert(), rows)
+            return True
+        except Exception as e:
+            logger.error(f"保存行业数据失败: {e}")
+            return False
+
+    def save_industry_data(self, industry_name: str, industry_data: Dict[str, Any]) -> bool:
+        """保存行业数据"""
+        industry_data['updated_at'] = datetime.now().isoformat()
+        return self._replace_industries({industry_name: industry_data})
+
+    def save_industries_bulk(self, industries: Dict[str, Dict[str, Any]], keep_timestamps: bool = False) -> bool:
+        """批量保存行业数据（单个事务）"""
+        return self._replace_industries(self._industry_items(industries, keep_timestamps))
+
+    def get_industry_data(self, industry_name: str) -> Optional[Dict[str, Any]]:
+        """获取行业数据"""
+        with self.Session() as session:
+            data = session.scalar(
+                select(IndustryData.data)
+                .where(IndustryData.industry == industry_name)
+                .where(IndustryData.data_type == INDUSTRY_SNAPSHOT)
+                .order_by(IndustryData.id.desc())
+                .limit(1)
+            )
+        return json.loads(data) if data else None
+
+    def get_all_industries(self) -> Dict[str, Any]:
+        """获取所有行业数据"""
+        with self.Session() as session:
+            rows = session.execute(
+                select(IndustryData.industry, IndustryData.data)
+                .where(IndustryData.data_type == INDUSTRY_SNAPSHOT)
+                .order_by(IndustryData.id)
+            ).all()
+        return {industry: json.loads(data) for industry, data in rows if data}
+
+    # 分析结果管理
+    def _insert_analysis_results(self, results: List[Dict[str, Any]]) -> bool:
+        """批量写入分析结果（按id覆盖）"""
+        if not results:
+            return True
+        rows = []
+        for result in results:
+            target_id = result.get('target_id')
+            rows.append({
+                "result_key": result.get('id'),
+                "target_type": result.get('target_type'),
+                "target_id": target_id if isinstance(target_id, int) else None,
+                "target_code": str(target_id) if target_id is not None else None,
+                "analysis_type": result.get('analysis_type'),
+                "title": result.get('title'),
+                "summary": result.get('summary') if isinstance(result.get('summary'), str) else None,
+                "score": _to_float(result.get('score')),
+                "risk_level": result.get('risk_level'),
+                "ai_model": result.get('ai_model'),
+                "confidence": _to_float(result.get('confidence')),
+                "data": _dumps(result),
+                "created_at": _parse_created_at(result.get('created_at'))
+            })
+        stmt = sqlite_insert(AnalysisResult.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["result_key"],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != "result_key"}
+        )
+        try:
+            with self.Session.begin() as session:
+                session.execute(stmt, rows)
+            return True
+        except Exception as e:
+            logger.error(f"保存分析结果失败: {e}")
+            return False
+
+    def save_analysis_result(self, analysis_data: Dict[str, Any]) -> bool:
+        """保存分析结果"""
+        return self._insert_analysis_results([self._prepare_analysis_result(analysis_data)])
+
+    def save_analysis_results_bulk(self, results: List[Dict[str, Any]]) -> bool:
+        """批量保存分析结果（单个事务，按id覆盖；已有的id和创建时间保留）"""
+        return self._insert_analysis_results([self._prepare_analysis_result(dict(result)) for result in results])
+
+    def get_analysis_result(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """按id获取分析结果"""
+        with self.Session() as session:
+            data = session.scalar(select(AnalysisResult.data).where(AnalysisResult.result_key == analysis_id))
+        return json.loads(data) if data else None
+
+    @staticmethod
+    def _analysis_filter(query, target_type: str = None, target_id: str = None, analysis_type: str = None):
+        if target_type:
+            query = query.where(AnalysisResult.target_type == target_type)
+        if target_id:
+            query = query.where(AnalysisResult.target_code == str(target_id))
+        if analysis_type:
+            query = query.where(AnalysisResult.analysis_type == analysis_type)
+        return query
+
+    def get_analysis_results(
+        self,
+        target_type: str = None,
+        target_id: str = None,
+        analysis_type: str = None,
+        limit: int = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """获取分析结果（按创建时间倒序，走目标索引）"""
+        query = self._analysis_filter(select(AnalysisResult.data), target_type, target_id, analysis_type)
+        query = query.order_by(AnalysisResult.created_at.desc(), AnalysisResult.id.desc()).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        with self.Session() as session:
+            rows = session.scalars(query).all()
+        return [json.loads(data) for data in rows if data]
+
+    def count_analysis_results(
+        self,
+        target_type: str = None,
+        target_id: str = None,
+        analysis_type: str = None
+    ) -> int:
+        """统计分析结果数量"""
+        query = self._analysis_filter(select(func.count()).select_from(AnalysisResult), target_type, target_id, analysis_type)
+        with self.Session() as session:
+            return session.scalar(query)
+
+    # 数据管理
+    def backup_data(self, backup_dir: str = None) -> bool:
+        """备份数据（JSON文件和SQLite数据库）"""
+        if not backup_dir:
+            backup_dir = os.path.join(self.data_dir, f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        if not super().backup_data(backup_dir):
+            return False
+        if self.engine.dialect.name != "sqlite":
+            return True
+        try:
+            # 使用SQLite在线备份，WAL中未合并的数据也会一并写入
+            raw_connection = self.engine.raw_connection()
+            target = sqlite3.connect(os.path.join(backup_dir, "financial.db"))
+            try:
+                raw_connection.driver_connection.backup(target)
+            finally:
+                target.close()
+                raw_connection.close()
+            return True
+        except Exception as e:
+            logger.error(f"备份数据库失败: {e}")
+            return False
+
+    def get_data_summary(self) -> Dict[str, Any]:
+        """获取数据摘要"""
+        with self.Session() as session:
+            return {
+                "companies": session.scalar(select(func.count()).select_from(Company)),
+                "industries": session.scalar(
+                    select(func.count()).select_from(IndustryData).where(IndustryData.data_type == INDUSTRY_SNAPSHOT)
+                ),
+                "analysis_results": session.scalar(select(func.count()).select_from(AnalysisResult)),
+                "total_financial_records": session.scalar(select(func.count()).select_from(FinancialData))
+            }
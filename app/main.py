@@ -4,6 +4,9 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.responses import HTMLResponse
 from app.core.config import settings
+from app.utils.data_manager import data_manager
+from app.utils.industry_index import industry_index
+from app.utils.trading_calendar import trading_calendar
 from app.api.endpoints import companies_simple, industries_simple, tasks_simple, yahoo_data, data_source, realtime_data, historical_data, api_overview
 import logging
 import os
@@ -385,8 +388,16 @@ async def startup_event():
     os.makedirs(settings.DATA_DIR, exist_ok=True)
     # 创建static目录
     os.makedirs("app/static", exist_ok=True)
+    # 后台预热申万行业索引与交易日历，请求路径上不再同步下载
+    industry_index.warm()
+    trading_calendar.warm()
     logging.info("🚀 金融分析系统启动完成")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放数据库连接"""
+    data_manager.close()
+
 @app.get("/", 
          summary="🏠 系统首页",
          description="查看系统基本信息和快速导航链接",
@@ -6,6 +6,11 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+def _metric(value: Any, template: str) -> str:
+    """格式化指标，缺失的指标写为暂无数据（不按0填充，避免模型把缺失当作真实值）"""
+    return template.format(value) if value is not None else "暂无数据"
+
+
 class GeminiAnalyzer:
     """Gemini AI分析器"""
     
@@ -209,10 +214,10 @@ class GeminiAnalyzer:
 
 行业信息：
 - 行业名称：{data.get('industry', '未知')}
-- 市场规模：{data.get('market_size', 0)} 亿元
-- 增长率：{data.get('growth_rate', 0):.2f}%
-- 公司数量：{data.get('company_count', 0)} 家
-- 平均市盈率：{data.get('avg_pe', 0):.2f}
+- 市场规模：{_metric(data.get('market_size'), '{} 亿元')}
+- 增长率：{_metric(data.get('growth_rate'), '{:.2f}%')}
+- 公司数量：{_metric(data.get('company_count'), '{} 家')}
+- 平均市盈率：{_metric(data.get('avg_pe'), '{:.2f}')}
 
 请从以下角度进行分析：
 1. 行业发展阶段判断
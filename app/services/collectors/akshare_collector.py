@@ -1,12 +1,54 @@
-import akshare as ak
 from typing import Dict, Any, List, Optional
 from app.services.collectors.base_collector import BaseCollector
 import logging
 from datetime import datetime, timedelta
 import pandas as pd # Added missing import for pandas
+from app.utils.frame_normalizer import FrameSchema, frame_records, frame_to_dict
+from app.core.config import settings
+from app.utils.industry_index import industry_index
+from app.utils.fan_out import fan_out
+from app.utils.rate_limiter import akshare_api as ak
 
 logger = logging.getLogger(__name__)
 
+# 各接口返回的中文列名 -> 标准字段名及类型
+STOCK_HIST_SCHEMA = FrameSchema(
+    {'日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close',
+     '成交量': 'volume', '成交额': 'amount', '涨跌幅': 'change_pct', '换手率': 'turnover'},
+    numeric=('open', 'high', 'low', 'close', 'volume', 'amount', 'change_pct', 'turnover'),
+    dates=('date',)
+)
+INDEX_HIST_SCHEMA = FrameSchema(
+    {'日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close',
+     '成交量': 'volume', '成交额': 'amount', '涨跌幅': 'change_pct'},
+    numeric=('open', 'high', 'low', 'close', 'volume', 'amount', 'change_pct'),
+    dates=('date',)
+)
+FUND_NAV_SCHEMA = FrameSchema(
+    {'净值日期': 'date', '单位净值': 'nav', '累计净值': 'accumulative_nav', '日增长率': 'change_pct'},
+    numeric=('nav', 'accumulative_nav', 'change_pct'),
+    dates=('date',)
+)
+INDEX_CONS_SCHEMA = FrameSchema(
+    {'品种代码': 'symbol', '品种名称': 'name'},
+    strings=('symbol',)
+)
+SECTOR_SPOT_SCHEMA = FrameSchema(
+    {'板块名称': 'name', '涨跌幅': 'change_pct', '最新价': 'price', '总成交量': 'volume', '总成交额': 'amount'},
+    numeric=('change_pct', 'price', 'volume', 'amount')
+)
+SECTOR_DETAIL_SCHEMA = FrameSchema(
+    {'代码': 'symbol', '名称': 'name', '最新价': 'price', '涨跌幅': 'change_pct'},
+    numeric=('price', 'change_pct'),
+    strings=('symbol',)
+)
+
+
+def _between(frame: pd.DataFrame, start_date: str, end_date: str) -> pd.DataFrame:
+    """按date字段筛选日期范围（含两端）"""
+    dates = frame['date']
+    return frame[(dates >= pd.to_datetime(start_date)) & (dates <= pd.to_datetime(end_date))]
+
 class AKShareCollector(BaseCollector):
     """AKShare数据采集器，专注于中国市场数据"""
     
@@ -15,8 +57,8 @@ class AKShareCollector(BaseCollector):
         
     def collect(self, **kwargs) -> Dict[str, Any]:
         """实现基类的数据采集方法"""
-        collection_type = kwargs.get('type', 'stock')
-        symbol = kwargs.get('symbol')
+        collection_type = kwargs.pop('type', 'stock')
+        symbol = kwargs.pop('symbol', None)
         
         if not symbol:
             logger.error("未提供股票代码")
@@ -39,7 +81,12 @@ class AKShareCollector(BaseCollector):
             return {"error": f"获取数据失败: {str(e)}"}
     
     def get_stock_data(self, symbol: str, **kwargs) -> Dict[str, Any]:
-        """获取股票数据"""
+        """
+        获取股票数据
+        日线、个股信息、财务摘要与行业分类相互独立，在共享线程池中并发获取，每个调用不超过
+        COLLECTOR_CALL_TIMEOUT秒（可用timeout参数覆盖）；部分调用失败或超时时返回其余数据，
+        失败的部分记录在errors中，上游调用全部失败时抛出异常
+        """
         try:
             # 处理日期参数
             end_date = kwargs.get('end_date', datetime.now().strftime('%Y%m%d'))
@@ -48,82 +95,54 @@ class AKShareCollector(BaseCollector):
                 # 默认获取一年的数据
                 start_date = (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
             
-            # 获取股票历史数据
-            stock_zh_a_hist_df = ak.stock_zh_a_hist(
-                symbol=symbol, 
-                period="daily", 
-                start_date=start_date, 
-                end_date=end_date,
-                adjust=kwargs.get('adjust', '')
-            )
+            call_timeout = kwargs.get('timeout') or settings.COLLECTOR_CALL_TIMEOUT
+            results, errors = fan_out({
+                # 股票历史数据
+                'historical_data': lambda: ak.stock_zh_a_hist(
+                    symbol=symbol,
+                    period="daily",
+                    start_date=start_date,
+                    end_date=end_date,
+                    adjust=kwargs.get('adjust', '')
+                ),
+                # 股票基本信息
+                'company_info': lambda: ak.stock_individual_info_em(symbol=symbol),
+                # 财务摘要数据
+                'financial_data': lambda: ak.stock_financial_abstract(symbol=symbol),
+                # 行业信息（申万行业索引，每天刷新一次；首次使用时等待后台加载，最多等待单次调用超时，
+                # fan_out无法中断调用，不限时等待会长期占用共享的采集线程）
+                'industry': lambda: industry_index.get(symbol)
+                if industry_index.warm(wait=True, timeout=call_timeout) else None,
+            }, timeout=kwargs.get('timeout'))
+            if all(name in errors for name in ('historical_data', 'company_info', 'financial_data')):
+                raise RuntimeError(f"股票 {symbol} 的数据全部获取失败: {errors}")
             
-            # 获取股票基本信息
-            try:
-                stock_info_df = ak.stock_individual_info_em(symbol=symbol)
-                stock_info = {}
-                if not stock_info_df.empty:
-                    for _, row in stock_info_df.iterrows():
-                        stock_info[row['item']] = row['value']
-            except Exception as e:
-                logger.warning(f"获取股票信息失败: {e}")
-                stock_info = {}
+            # 处理历史数据
+            historical_data = STOCK_HIST_SCHEMA.records(results.get('historical_data'))
             
-            # 获取公司财务数据 - 修复API调用
-            try:
-                # 使用正确的API调用方式获取财务摘要数据
-                financial_abstract_df = ak.stock_financial_abstract(symbol=symbol)
-                
-                financial_data = {}
-                if not financial_abstract_df.empty:
-                    # 处理财务摘要数据
-                    financial_data = self._process_financial_abstract(financial_abstract_df)
-                else:
-                    logger.warning(f"股票 {symbol} 无财务摘要数据")
-                    
-            except Exception as e:
-                logger.warning(f"获取财务报表失败: {e}")
-                financial_data = {}
+            stock_info = frame_to_dict(results.get('company_info'), 'item', 'value')
             
-            # 处理历史数据
-            historical_data = []
-            if not stock_zh_a_hist_df.empty:
-                for _, row in stock_zh_a_hist_df.iterrows():
-                    historical_data.append({
-                        'date': row.get('日期'),
-                        'open': float(row.get('开盘')),
-                        'high': float(row.get('最高')),
-                        'low': float(row.get('最低')),
-                        'close': float(row.get('收盘')),
-                        'volume': float(row.get('成交量')),
-                        'amount': float(row.get('成交额')) if '成交额' in row else None,
-                        'change_pct': float(row.get('涨跌幅')) if '涨跌幅' in row else None,
-                        'turnover': float(row.get('换手率')) if '换手率' in row else None
-                    })
-            
-            # 获取行业信息
-            try:
-                stock_sector = ""
-                stock_industry_info_df = ak.stock_sector_detail(sector="申万一级")
-                if not stock_industry_info_df.empty:
-                    for _, row in stock_industry_info_df.iterrows():
-                        # 修复数据类型转换问题
-                        stock_code = str(row.get('代码', '')).strip()
-                        if stock_code == symbol:
-                            stock_sector = row.get('行业', '')
-                            break
-            except Exception as e:
-                logger.warning(f"获取行业信息失败: {e}")
-                stock_sector = ""
+            # 处理财务摘要数据
+            financial_data = {}
+            financial_abstract_df = results.get('financial_data')
+            if financial_abstract_df is not None and not financial_abstract_df.empty:
+                financial_data = self._process_financial_abstract(financial_abstract_df)
+            elif 'financial_data' not in errors:
+                logger.warning(f"股票 {symbol} 无财务摘要数据")
+            
+            industry_levels = results.get('industry') or {}
             
             # 构建结果
             result = {
                 'symbol': symbol,
                 'company_name': stock_info.get('股票简称', ''),
-                'industry': stock_sector,
+                'industry': industry_levels.get('level1', ''),
+                'industry_levels': industry_levels,
                 'market': '上证' if symbol.startswith('6') else '深证' if symbol.startswith(('0', '3')) else '未知',
                 'historical_data': historical_data,
                 'financial_data': financial_data,
-                'company_info': stock_info
+                'company_info': stock_info,
+                'errors': errors
             }
             
             return result
@@ -259,25 +278,14 @@ class AKShareCollector(BaseCollector):
             # 获取基金基本信息
             try:
                 fund_info_df = ak.fund_em_fund_info(fund=symbol)
-                fund_info = {}
-                if not fund_info_df.empty:
-                    for _, row in fund_info_df.iterrows():
-                        fund_info[row['明细']] = row['数据']
+                fund_info = frame_to_dict(fund_info_df, '明细', '数据')
             except Exception as e:
                 logger.warning(f"获取基金信息失败: {e}")
                 fund_info = {}
             
             # 处理历史数据
-            historical_data = []
-            if not fund_em_info_df.empty:
-                for _, row in fund_em_info_df.iterrows():
-                    if start_date <= row.get('净值日期').replace('-', '') <= end_date:
-                        historical_data.append({
-                            'date': row.get('净值日期'),
-                            'nav': float(row.get('单位净值')),
-                            'accumulative_nav': float(row.get('累计净值')) if '累计净值' in row else None,
-                            'change_pct': float(row.get('日增长率')) if '日增长率' in row else None
-                        })
+            nav_frame = _between(FUND_NAV_SCHEMA.frame(fund_em_info_df), start_date, end_date)
+            historical_data = frame_records(nav_frame, FUND_NAV_SCHEMA.dates)
             
             # 构建结果
             result = {
@@ -313,19 +321,7 @@ class AKShareCollector(BaseCollector):
             )
             
             # 处理历史数据
-            historical_data = []
-            if not index_zh_a_hist_df.empty:
-                for _, row in index_zh_a_hist_df.iterrows():
-                    historical_data.append({
-                        'date': row.get('日期'),
-                        'open': float(row.get('开盘')),
-                        'high': float(row.get('最高')),
-                        'low': float(row.get('最低')),
-                        'close': float(row.get('收盘')),
-                        'volume': float(row.get('成交量')),
-                        'amount': float(row.get('成交额')) if '成交额' in row else None,
-                        'change_pct': float(row.get('涨跌幅')) if '涨跌幅' in row else None
-                    })
+            historical_data = INDEX_HIST_SCHEMA.records(index_zh_a_hist_df)
             
             # 获取指数成分股
             try:
@@ -336,13 +332,7 @@ class AKShareCollector(BaseCollector):
                 else:
                     index_stock_cons_df = None
                 
-                constituent_stocks = []
-                if index_stock_cons_df is not None and not index_stock_cons_df.empty:
-                    for _, row in index_stock_cons_df.iterrows():
-                        constituent_stocks.append({
-                            'symbol': row.get('品种代码'),
-                            'name': row.get('品种名称')
-                        })
+                constituent_stocks = INDEX_CONS_SCHEMA.records(index_stock_cons_df)
             except Exception as e:
                 logger.warning(f"获取指数成分股失败: {e}")
                 constituent_stocks = []
@@ -376,30 +366,14 @@ class AKShareCollector(BaseCollector):
                 symbol=symbol
             )
             
-            # 处理历史数据
-            historical_data = []
-            if not bond_zh_hs_cov_daily_df.empty:
-                for _, row in bond_zh_hs_cov_daily_df.iterrows():
-                    date_str = row.get('日期')
-                    if start_date <= date_str.replace('-', '') <= end_date:
-                        historical_data.append({
-                            'date': date_str,
-                            'open': float(row.get('开盘')),
-                            'high': float(row.get('最高')),
-                            'low': float(row.get('最低')),
-                            'close': float(row.get('收盘')),
-                            'volume': float(row.get('成交量')),
-                            'amount': float(row.get('成交额')) if '成交额' in row else None,
-                            'change_pct': float(row.get('涨跌幅')) if '涨跌幅' in row else None
-                        })
+            # 处理历史数据（与指数日线字段相同）
+            bond_frame = _between(INDEX_HIST_SCHEMA.frame(bond_zh_hs_cov_daily_df), start_date, end_date)
+            historical_data = frame_records(bond_frame, INDEX_HIST_SCHEMA.dates)
             
             # 获取债券基本信息
             try:
                 bond_info_df = ak.bond_zh_cov_info(symbol=symbol)
-                bond_info = {}
-                if not bond_info_df.empty:
-                    for _, row in bond_info_df.iterrows():
-                        bond_info[row['item']] = row['value']
+                bond_info = frame_to_dict(bond_info_df, 'item', 'value')
             except Exception as e:
                 logger.warning(f"获取债券信息失败: {e}")
                 bond_info = {}
@@ -425,18 +399,7 @@ class AKShareCollector(BaseCollector):
             # 获取申万一级行业列表
             industry_list_df = ak.stock_sector_spot(indicator="申万一级")
             
-            result = []
-            if not industry_list_df.empty:
-                for _, row in industry_list_df.iterrows():
-                    result.append({
-                        'name': row.get('板块名称'),
-                        'change_pct': float(row.get('涨跌幅')),
-                        'price': float(row.get('最新价')),
-                        'volume': float(row.get('总成交量')),
-                        'amount': float(row.get('总成交额'))
-                    })
-            
-            return result
+            return SECTOR_SPOT_SCHEMA.records(industry_list_df)
         except Exception as e:
             logger.error(f"获取行业列表失败: {e}")
             return []
@@ -447,18 +410,7 @@ class AKShareCollector(BaseCollector):
             # 获取行业成分股
             stocks_df = ak.stock_sector_detail(sector=industry)
             
-            result = []
-            if not stocks_df.empty:
-                for _, row in stocks_df.iterrows():
-                    result.append({
-                        'symbol': row.get('代码'),
-                        'name': row.get('名称'),
-                        'price': float(row.get('最新价')),
-                        'change_pct': float(row.get('涨跌幅')),
-                        'industry': industry
-                    })
-            
-            return result
+            return SECTOR_DETAIL_SCHEMA.records(stocks_df, industry=industry)
         except Exception as e:
             logger.error(f"获取行业成分股失败: {e}")
             return []
@@ -1,9 +1,9 @@
 import requests
-import time
 import logging
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
 from app.core.config import settings
+from app.utils.rate_limiter import host_of, rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +11,9 @@ logger = logging.getLogger(__name__)
 class BaseCollector(ABC):
     """基础数据采集器"""
     
+    # collect() 中股票代码参数的名称
+    symbol_key = "symbol"
+    
     def __init__(self):
         self.session = requests.Session()
         self.session.headers.update({
@@ -21,27 +24,27 @@ class BaseCollector(ABC):
             'Connection': 'keep-alive',
         })
     
-    def get(self, url: str, **kwargs) -> Optional[requests.Response]:
-        """发送GET请求"""
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', settings.CRAWLER_TIMEOUT)
+        response = self.session.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+    
+    def request(self, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+        """发送请求（按主机限流，连接错误、超时及HTTP 429/5xx按退避重试）"""
         try:
-            response = self.session.get(url, timeout=settings.CRAWLER_TIMEOUT, **kwargs)
-            response.raise_for_status()
-            time.sleep(settings.CRAWLER_DELAY)  # 请求间隔
-            return response
+            return rate_limiter.call(host_of(url), self._request, method, url, **kwargs)
         except requests.RequestException as e:
             logger.error(f"请求失败: {url}, 错误: {e}")
             return None
     
+    def get(self, url: str, **kwargs) -> Optional[requests.Response]:
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+    
     def post(self, url: str, data: Dict[str, Any] = None, **kwargs) -> Optional[requests.Response]:
         """发送POST请求"""
-        try:
-            response = self.session.post(url, data=data, timeout=settings.CRAWLER_TIMEOUT, **kwargs)
-            response.raise_for_status()
-            time.sleep(settings.CRAWLER_DELAY)  # 请求间隔
-            return response
-        except requests.RequestException as e:
-            logger.error(f"请求失败: {url}, 错误: {e}")
-            return None
+        return self.request('POST', url, data=data, **kwargs)
     
     @abstractmethod
     def collect(self, **kwargs) -> Dict[str, Any]:
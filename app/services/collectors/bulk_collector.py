@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+批量采集
+在有界线程池中对一批股票代码调用采集器（AKShareCollector、YahooFinanceCollector 等），
+结果按批写入（分片文件 + 批量更新公司数据），每批写入成功后原子更新检查点；
+部分上游调用失败的结果（errors不为空）记为失败，不写入；
+进程中断后用同一任务名重新运行，已完成的代码直接跳过，未写入及失败的代码重新采集。
+可设置最长运行时间，到时停止提交新代码，已采集的结果写入后退出，下次运行从检查点继续
+
+    python -m app.services.collectors.bulk_collector --job nightly --universe
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from app.core.config import settings
+from app.services.collectors.base_collector import BaseCollector
+from app.utils.atomic_io import atomic_write_data, atomic_write_json, read_json
+
+logger = logging.getLogger(__name__)
+
+# (代码, 采集结果)
+CollectResult = Tuple[str, Dict[str, Any]]
+# 接收一批采集结果并持久化（抛出异常表示写入失败，这批代码不会记入检查点）
+Sink = Callable[[str, int, List[CollectResult]], None]
+
+
+def company_record(symbol: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """从采集结果中提取公司记录"""
+    return {
+        "code": symbol,
+        "name": result.get("company_name") or result.get("company_info", {}).get("shortName", ""),
+        "industry": result.get("industry", ""),
+        "market": result.get("market", ""),
+        "updated_at": datetime.now().isoformat(),
+    }
+
+
+def _result_error(result: Any) -> Optional[str]:
+    """采集结果的错误信息：失败或部分上游调用失败（errors不为空）的结果记为失败，继续时重新采集"""
+    if not isinstance(result, dict):
+        return "采集结果为空"
+    if result.get("error"):
+        return str(result["error"])
+    if result.get("errors"):
+        return f"部分数据获取失败: {result['errors']}"
+    return None
+
+
+class DataManagerSink:
+    """默认的结果写入：每批写一个分片文件，并批量更新公司数据"""
+
+    def __init__(self, data_manager=None):
+        self._data_manager = data_manager
+
+    @property
+    def data_manager(self):
+        if self._data_manager is None:
+            from app.utils.data_manager import data_manager
+            self._data_manager = data_manager
+        return self._data_manager
+
+    def __call__(self, job_dir: str, part: int, results: List[CollectResult]):
+        atomic_write_data(
+            os.path.join(job_dir, f"part-{part:05d}.json"),
+            {symbol: result for symbol, result in results}
+        )
+        self.data_manager.save_companies_bulk([company_record(symbol, result) for symbol, result in results])
+
+
+class BulkCollector:
+    """批量采集驱动"""
+
+    def __init__(
+        self,
+        collector: BaseCollector,
+        job: str,
+        workers: int = None,
+        batch_size: int = None,
+        sink: Sink = None,
+        root_dir: str = None
+    ):
+        """
+        Args:
+            collector: 采集器，按其 symbol_key 将代码传给 collect()
+            job: 任务名，检查点与分片文件位于 root_dir/job 下
+            workers: 并发采集的线程数
+            batch_size: 每批写入的结果数
+            sink: 结果写入函数，默认写分片文件并批量更新公司数据
+            root_dir: 批量任务目录，默认 DATA_DIR/bulk
+        """
+        self.collector = collector
+        self.job = job
+        self.workers = max(1, settings.BULK_WORKERS if workers is None else workers)
+        self.batch_size = max(1, settings.BULK_BATCH_SIZE if batch_size is None else batch_size)
+        self.sink = sink or DataManagerSink()
+        self.job_dir = os.path.join(root_dir or os.path.join(settings.DATA_DIR, "bulk"), job)
+        self.checkpoint_path = os.path.join(self.job_dir, "checkpoint.json")
+        self._stop = threading.Event()
+        if self.workers * 4 > settings.COLLECTOR_MAX_WORKERS:
+            logger.warning(
+                f"BULK_WORKERS={self.workers} 时建议 COLLECTOR_MAX_WORKERS 不小于 {self.workers * 4}，"
+                f"当前为 {settings.COLLECTOR_MAX_WORKERS}，上游调用会在线程池中排队"
+            )
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """读取检查点，不存在时返回空检查点"""
+        checkpoint = read_json(self.checkpoint_path)
+        checkpoint.setdefault("done", [])
+        checkpoint.setdefault("failed", {})
+        checkpoint.setdefault("parts", 0)
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any], done: Set[str], failed: Dict[str, str]):
+        checkpoint.update(
+            job=self.job,
+            done=sorted(done),
+            failed=failed,
+            updated_at=datetime.now().isoformat()
+        )
+        atomic_write_json(self.checkpoint_path, checkpoint)
+
+    def stop(self):
+        """停止提交新代码（已提交的采集完成并写入后run返回）"""
+        self._stop.set()
+
+    def _collect_one(self, symbol: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = getattr(self.collector, "symbol_key", "symbol")
+        return self.collector.collect(**dict(kwargs, **{key: symbol}))
+
+    def run(
+        self,
+        symbols: Iterable[str],
+        resume: bool = True,
+        retry_failed: bool = True,
+        max_seconds: float = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        批量采集
+
+        Args:
+            symbols: 股票代码
+            resume: 从检查点继续（跳过已完成的代码），否则重新开始
+            retry_failed: 继续时重新采集上次失败的代码
+            max_seconds: 最长运行时间（秒），到时停止提交新代码，默认 BULK_MAX_SECONDS（0表示不限）
+            kwargs: 传给采集器 collect() 的其他参数
+
+        Returns:
+            本次运行统计（完成、失败、跳过、剩余数量及耗时）
+        """
+        started = time.time()
+        max_seconds = settings.BULK_MAX_SECONDS if max_seconds is None else max_seconds
+        deadline = started + max_seconds if max_seconds else None
+        self._stop.clear()
+
+        checkpoint = self.load_checkpoint() if resume else {"done": [], "failed": {}, "parts": 0}
+        done: Set[str] = set(checkpoint["done"])
+        failed: Dict[str, str] = {} if retry_failed else dict(checkpoint["failed"])
+        ordered = list(dict.fromkeys(symbol.strip() for symbol in symbols if symbol and symbol.strip()))
+        pending = [symbol for symbol in ordered if symbol not in done and symbol not in failed]
+        checkpoint["total"] = len(ordered)
+        logger.info(f"批量采集 {self.job}: 共 {len(ordered)} 只，待采集 {len(pending)} 只")
+
+        stats = {"completed": 0, "failed": 0, "skipped": len(ordered) - len(pending)}
+        buffer: List[CollectResult] = []
+        buffer_failed: Dict[str, str] = {}
+
+        def flush():
+            if not buffer and not buffer_failed:
+                return
+            if buffer:
+                checkpoint["parts"] += 1
+                self.sink(self.job_dir, checkpoint["parts"], list(buffer))
+                done.update(symbol for symbol, _ in buffer)
+            failed.update(buffer_failed)
+            for symbol, _ in buffer:
+                failed.pop(symbol, None)
+            self._save_checkpoint(checkpoint, done, failed)
+            buffer.clear()
+            buffer_failed.clear()
+
+        queue = iter(pending)
+        in_flight: Dict[Future, str] = {}
+        exhausted = False
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"bulk-{self.job}") as executor:
+            while True:
+                # 最多保持2倍线程数的代码在途，停止或到时后不再提交
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    if self._stop.is_set() or (deadline and time.time() >= deadline):
+                        exhausted = True
+                        break
+                    symbol = next(queue, None)
+                    if symbol is None:
+                        exhausted = True
+                        break
+                    in_flight[executor.submit(self._collect_one, symbol, kwargs)] = symbol
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    symbol = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                        error = _result_error(result)
+                    except Exception as e:
+                        result, error = None, str(e) or type(e).__name__
+                    if error:
+                        buffer_failed[symbol] = str(error)
+                        stats["failed"] += 1
+                    else:
+                        buffer.append((symbol, result))
+                        stats["completed"] += 1
+                if len(buffer) + len(buffer_failed) >= self.batch_size:
+                    flush()
+        flush()
+
+        stats.update(
+            remaining=len([symbol for symbol in ordered if symbol not in done and symbol not in failed]),
+            elapsed=round(time.time() - started, 3),
+            job_dir=self.job_dir
+        )
+        logger.info(f"批量采集 {self.job} 结束: {stats}")
+        return stats
+
+
+def _universe() -> List[str]:
+    """全市场A股代码（来自行情快照）"""
+    from app.services.spot_snapshot import spot_snapshots
+    snapshot = spot_snapshots.get()
+    if snapshot is None:
+        raise RuntimeError("行情快照不可用，无法获取全市场代码")
+    return [code for code in snapshot.codes.tolist() if code]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="批量采集股票数据（支持检查点续传）")
+    parser.add_argument("--job", required=True, help="任务名（检查点目录名）")
+    parser.add_argument("--source", choices=("akshare", "yahoo"), default="akshare", help="数据源")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--symbols", help="逗号分隔的股票代码")
+    group.add_argument("--symbols-file", help="每行一个股票代码的文件")
+    group.add_argument("--universe", action="store_true", help="全市场A股")
+    parser.add_argument("--workers", type=int, help="并发线程数")
+    parser.add_argument("--batch-size", type=int, help="每批写入的结果数")
+    parser.add_argument("--max-seconds", type=float, help="最长运行时间（秒）")
+    parser.add_argument("--restart", action="store_true", help="忽略检查点重新开始")
+    args = parser.parse_args(argv)
+
+    if args.symbols:
+        symbols = args.symbols.split(",")
+    elif args.symbols_file:
+        with open(args.symbols_file, "r", encoding="utf-8") as f:
+            symbols = f.read().split()
+    else:
+        symbols = _universe()
+
+    if args.source == "yahoo":
+        from app.services.collectors.yahoo_collector import YahooFinanceCollector
+        collector = YahooFinanceCollector()
+    else:
+        from app.services.collectors.akshare_collector import AKShareCollector
+        collector = AKShareCollector()
+
+    bulk = BulkCollector(collector, args.job, workers=args.workers, batch_size=args.batch_size)
+    stats = bulk.run(symbols, resume=not args.restart, max_seconds=args.max_seconds)
+    print(stats)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,13 +1,25 @@
 import yfinance as yf
 from typing import Dict, Any, List, Optional
 from app.services.collectors.base_collector import BaseCollector
+from app.utils.rate_limiter import rate_limiter
 import logging
 
 logger = logging.getLogger(__name__)
 
+# yfinance请求的限流主机
+YAHOO_HOST = "finance.yahoo.com"
+
+
+def _yahoo(func, *args, **kwargs):
+    """按Yahoo主机限流调用yfinance（属性访问也会请求网络，用lambda包装）"""
+    return rate_limiter.call(YAHOO_HOST, func, *args, **kwargs)
+
+
 class YahooFinanceCollector(BaseCollector):
     """Yahoo Finance数据采集器"""
     
+    symbol_key = "ticker"
+    
     def __init__(self):
         super().__init__()
         
@@ -35,10 +47,10 @@ class YahooFinanceCollector(BaseCollector):
             stock = yf.Ticker(ticker)
             
             # 获取历史数据
-            hist = stock.history(period=period, interval=interval)
+            hist = _yahoo(stock.history, period=period, interval=interval)
             
             # 获取公司信息
-            info = stock.info
+            info = _yahoo(lambda: stock.info)
             
             # 获取财务数据
             financials = {}
@@ -46,17 +58,20 @@ class YahooFinanceCollector(BaseCollector):
             cash_flow = {}
             
             try:
-                financials = stock.financials.to_dict() if hasattr(stock, 'financials') and not stock.financials.empty else {}
+                frame = _yahoo(lambda: stock.financials)
+                financials = frame.to_dict() if frame is not None and not frame.empty else {}
             except Exception as e:
                 logger.warning(f"获取财务数据失败: {e}")
                 
             try:
-                balance_sheet = stock.balance_sheet.to_dict() if hasattr(stock, 'balance_sheet') and not stock.balance_sheet.empty else {}
+                frame = _yahoo(lambda: stock.balance_sheet)
+                balance_sheet = frame.to_dict() if frame is not None and not frame.empty else {}
             except Exception as e:
                 logger.warning(f"获取资产负债表失败: {e}")
                 
             try:
-                cash_flow = stock.cashflow.to_dict() if hasattr(stock, 'cashflow') and not stock.cashflow.empty else {}
+                frame = _yahoo(lambda: stock.cashflow)
+                cash_flow = frame.to_dict() if frame is not None and not frame.empty else {}
             except Exception as e:
                 logger.warning(f"获取现金流量表失败: {e}")
             
@@ -115,7 +130,7 @@ class YahooFinanceCollector(BaseCollector):
             
             # 如果是有效股票，返回其信息
             if hasattr(search_result, 'info'):
-                info = search_result.info
+                info = _yahoo(lambda: search_result.info)
                 return [{
                     'symbol': info.get('symbol', query),
                     'name': info.get('shortName', ''),
@@ -142,11 +157,11 @@ class YahooFinanceCollector(BaseCollector):
             for index in indices:
                 try:
                     ticker = yf.Ticker(index)
-                    hist = ticker.history(period='1d')
+                    hist = _yahoo(ticker.history, period='1d')
                     if not hist.empty:
                         latest = hist.iloc[-1]
                         market_data[index] = {
-                            'name': ticker.info.get('shortName', index),
+                            'name': _yahoo(lambda: ticker.info).get('shortName', index),
                             'last_price': float(latest.get('Close', 0)),
                             'change': float(latest.get('Close', 0) - hist.iloc[-2].get('Close', 0)) if len(hist) > 1 else 0,
                             'change_percent': float((latest.get('Close', 0) / hist.iloc[-2].get('Close', 0) - 1) * 100) if len(hist) > 1 else 0,
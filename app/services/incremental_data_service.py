@@ -2,27 +2,48 @@
 """
 增量数据服务
 智能处理历史数据的增量更新
+K线存放在列式存储（data/bars）中，缓存表只保存元信息
 """
 
-import akshare as ak
-import pandas as pd
+import os
+import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 from app.utils.data_manager import data_manager
+from app.utils.bar_store import BarStore, int_to_date
+from app.utils.bar_panel import BarPanel
+from app.utils.single_flight import single_flight
+from app.utils import freshness
+from app.utils.rate_limiter import akshare_api as ak
 
 logger = logging.getLogger(__name__)
 
+# akshare历史行情列名 -> 标准字段名
+HIST_COLUMN_MAP = {
+    "日期": "date",
+    "开盘": "open",
+    "最高": "high",
+    "最低": "low",
+    "收盘": "close",
+    "成交量": "volume",
+    "成交额": "turnover",
+    "振幅": "amplitude",
+    "涨跌幅": "change_percent",
+    "涨跌额": "change_amount",
+    "换手率": "turnover_rate",
+}
+
 class IncrementalDataService:
     """增量数据服务"""
-    
-    def __init__(self):
-        self.cache_duration = timedelta(days=1)  # 日线数据缓存1天
-        self.minute_cache_duration = timedelta(minutes=5)  # 分钟数据缓存5分钟
-    
+
+    def __init__(self, bar_store: BarStore = None, panel: BarPanel = None):
+        self.bar_store = bar_store or BarStore(os.path.join(data_manager.data_dir, "bars"))
+        self.panel = panel or BarPanel(os.path.join(data_manager.data_dir, "panel"))
+
     def get_stock_historical_data(
-        self, 
-        symbol: str, 
+        self,
+        symbol: str,
         start_date: str = None,
         end_date: str = None,
         period: str = "daily",
@@ -30,7 +51,7 @@ class IncrementalDataService:
     ) -> Dict[str, Any]:
         """
         获取股票历史数据（增量更新）
-        
+
         Args:
             symbol: 股票代码
             start_date: 开始日期 (YYYY-MM-DD)
@@ -48,294 +69,285 @@ class IncrementalDataService:
                 # 默认获取1年数据
                 start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
                 date_range = (start_date, end_date)
-            
-            # 2. 检查本地缓存
-            cached_data = self._get_cached_historical_data(symbol, period)
-            
-            if not force_refresh and cached_data:
+
+            # 2. 检查本地K线
+            meta = self._get_cached_meta(symbol, period)
+            bars = self.bar_store.load(symbol, period) if meta else None
+
+            if not force_refresh and bars is not None and bars.shape[1] > 0:
                 # 3. 智能增量更新
-                updated_data = self._incremental_update(
-                    symbol, cached_data, date_range, period
-                )
-                return updated_data
+                return self._incremental_update(symbol, bars, meta, date_range, period)
             else:
                 # 4. 全量获取
                 logger.info(f"全量获取 {symbol} 历史数据")
                 return self._fetch_full_historical_data(symbol, date_range, period)
-                
+
         except Exception as e:
             logger.error(f"获取历史数据失败 {symbol}: {e}")
             return {"error": str(e)}
-    
-    def _get_cached_historical_data(self, symbol: str, period: str) -> Optional[Dict[str, Any]]:
-        """获取缓存的历史数据"""
+
+    @staticmethod
+    def _cache_key(symbol: str, period: str) -> str:
+        """旧版K线元信息的缓存键（元信息现在与K线文件一起存放）"""
+        return f"historical_{symbol}_{period}"
+
+    def _get_cached_meta(self, symbol: str, period: str) -> Optional[Dict[str, Any]]:
+        """获取K线元信息（已覆盖的日期范围、更新时间）"""
         try:
-            cache_key = f"historical_{symbol}_{period}"
-            cached_data = data_manager.get_cache_data(cache_key)
-            
-            if cached_data and self._is_cache_valid(cache_key):
-                return cached_data
+            meta = self.bar_store.load_meta(symbol, period)
+            if meta is None:
+                meta = self._migrate_legacy_meta(symbol, period)
+            # 旧版缓存把K线列表放在data字段中，没有coverage，视为无缓存
+            if meta and meta.get('coverage'):
+                return meta
             return None
         except Exception as e:
             logger.error(f"获取缓存历史数据失败 {symbol}: {e}")
             return None
-    
+
+    def _migrate_legacy_meta(self, symbol: str, period: str) -> Optional[Dict[str, Any]]:
+        """将缓存中的旧版元信息移到K线文件旁"""
+        key = self._cache_key(symbol, period)
+        meta = data_manager.get_cache_data(key)
+        if not meta or not meta.get('coverage'):
+            return None
+        bars = self.bar_store.load(symbol, period)
+        if bars is None:
+            return None
+        if self.bar_store.save(symbol, period, bars, meta):
+            data_manager.clear_cache(key)
+        return meta
+
     def _incremental_update(
-        self, 
-        symbol: str, 
-        cached_data: Dict[str, Any], 
+        self,
+        symbol: str,
+        bars: np.ndarray,
+        meta: Dict[str, Any],
         date_range: Tuple[str, str],
         period: str
     ) -> Dict[str, Any]:
         """
         增量更新历史数据
-        
+
         逻辑：
-        1. 分析缓存数据的日期范围
-        2. 确定需要补充的日期范围
-        3. 只获取缺失的数据
-        4. 合并新旧数据
+        1. 对比请求范围与已覆盖范围
+        2. 只获取头部和尾部缺失的区间
+        3. 缓存过期时从最后一根K线开始刷新尾部
+        4. 按日期合并新旧数据
         """
         try:
             start_date, end_date = date_range
             request_start = datetime.strptime(start_date, '%Y-%m-%d')
             request_end = datetime.strptime(end_date, '%Y-%m-%d')
-            
-            # 获取缓存数据的日期范围
-            cached_dates = set()
-            if 'data' in cached_data and cached_data['data']:
-                for record in cached_data['data']:
-                    if 'date' in record:
-                        cached_dates.add(record['date'])
-            
-            # 确定需要获取的日期范围
-            missing_dates = []
-            current_date = request_start
-            while current_date <= request_end:
-                date_str = current_date.strftime('%Y-%m-%d')
-                if date_str not in cached_dates:
-                    missing_dates.append(date_str)
-                current_date += timedelta(days=1)
-            
-            if not missing_dates:
+            covered_start = datetime.strptime(meta['coverage']['start'], '%Y-%m-%d')
+            covered_end = datetime.strptime(meta['coverage']['end'], '%Y-%m-%d')
+            last_bar = datetime.strptime(int_to_date(bars[0, -1]), '%Y-%m-%d')
+            expired = not self._is_cache_valid(meta)
+
+            # 确定需要获取的区间
+            missing_ranges = []
+            if request_start < covered_start:
+                missing_ranges.append((request_start, covered_start - timedelta(days=1)))
+            if request_end > covered_end or (expired and request_end >= last_bar):
+                tail_start = last_bar if expired else covered_end + timedelta(days=1)
+                missing_ranges.append((max(tail_start, request_start), request_end))
+
+            if not missing_ranges:
                 logger.info(f"{symbol} 缓存数据完整，无需更新")
-                return cached_data
-            
+                return self._build_result(symbol, period, bars, meta, date_range)
+
             # 获取缺失的数据
-            logger.info(f"{symbol} 需要补充 {len(missing_dates)} 天的数据")
-            missing_data = self._fetch_missing_data(symbol, missing_dates, period)
-            
-            if missing_data:
-                # 合并数据
-                updated_data = self._merge_historical_data(cached_data, missing_data)
-                
-                # 更新缓存
-                cache_key = f"historical_{symbol}_{period}"
-                data_manager.save_cache_data(cache_key, updated_data)
-                
-                return updated_data
-            else:
-                return cached_data
-                
+            logger.info(f"{symbol} 需要补充 {len(missing_ranges)} 个区间的数据")
+            for range_start, range_end in missing_ranges:
+                new_bars = self._fetch_bars(symbol, period, range_start, range_end)
+                bars = BarStore.merge(bars, new_bars)
+
+            meta = self._save(
+                symbol, period, bars,
+                coverage=(min(request_start, covered_start), max(request_end, covered_end)),
+                source="增量更新"
+            )
+            return self._build_result(symbol, period, bars, meta, date_range)
+
         except Exception as e:
             logger.error(f"增量更新失败 {symbol}: {e}")
-            return cached_data
-    
-    def _fetch_missing_data(
-        self, 
-        symbol: str, 
-        missing_dates: List[str], 
-        period: str
-    ) -> List[Dict[str, Any]]:
-        """获取缺失的数据"""
-        try:
-            if period == "daily":
-                # 获取日线数据
-                df = ak.stock_zh_a_hist(symbol=symbol, period="daily", 
-                                       start_date=missing_dates[0], 
-                                       end_date=missing_dates[-1])
-            else:
-                # 其他周期的数据获取逻辑
-                df = ak.stock_zh_a_hist(symbol=symbol, period=period)
-            
-            if df.empty:
-                return []
-            
-            # 转换为标准格式
-            data = []
-            for _, row in df.iterrows():
-                record = {
-                    "date": row.get('日期', ''),
-                    "open": row.get('开盘', 0),
-                    "high": row.get('最高', 0),
-                    "low": row.get('最低', 0),
-                    "close": row.get('收盘', 0),
-                    "volume": row.get('成交量', 0),
-                    "turnover": row.get('成交额', 0),
-                    "amplitude": row.get('振幅', 0),
-                    "change_percent": row.get('涨跌幅', 0),
-                    "change_amount": row.get('涨跌额', 0),
-                    "turnover_rate": row.get('换手率', 0)
-                }
-                data.append(record)
-            
-            return data
-            
-        except Exception as e:
-            logger.error(f"获取缺失数据失败 {symbol}: {e}")
-            return []
-    
-    def _merge_historical_data(
-        self, 
-        cached_data: Dict[str, Any], 
-        new_data: List[Dict[str, Any]]
+            return self._build_result(symbol, period, bars, meta, date_range)
+
+    def _fetch_bars(self, symbol: str, period: str, start: datetime, end: datetime) -> np.ndarray:
+        """获取指定区间的K线（同一股票、周期、区间的并发请求只访问一次akshare，各调用方得到结果数组的独立副本）"""
+        key = f"historical:{symbol}:{period}:{start:%Y%m%d}:{end:%Y%m%d}"
+        return single_flight.do(key, self._download_bars, symbol, period, start, end)
+
+    def _download_bars(self, symbol: str, period: str, start: datetime, end: datetime) -> np.ndarray:
+        """从akshare获取指定区间的K线并转换为列式数组"""
+        df = ak.stock_zh_a_hist(symbol=symbol, period=period,
+                                start_date=start.strftime('%Y%m%d'),
+                                end_date=end.strftime('%Y%m%d'))
+        return BarStore.from_frame(df, HIST_COLUMN_MAP)
+
+    def _save(
+        self,
+        symbol: str,
+        period: str,
+        bars: np.ndarray,
+        coverage: Tuple[datetime, datetime],
+        source: str
     ) -> Dict[str, Any]:
-        """合并历史数据"""
-        try:
-            # 合并数据
-            all_data = cached_data.get('data', []) + new_data
-            
-            # 按日期排序
-            all_data.sort(key=lambda x: x.get('date', ''))
-            
-            # 去重（按日期）
-            seen_dates = set()
-            unique_data = []
-            for record in all_data:
-                date = record.get('date', '')
-                if date and date not in seen_dates:
-                    seen_dates.add(date)
-                    unique_data.append(record)
-            
-            return {
-                "symbol": cached_data.get('symbol', ''),
-                "period": cached_data.get('period', ''),
-                "data": unique_data,
-                "total_records": len(unique_data),
-                "date_range": {
-                    "start": unique_data[0].get('date') if unique_data else '',
-                    "end": unique_data[-1].get('date') if unique_data else ''
-                },
-                "last_updated": datetime.now().isoformat(),
-                "source": "增量更新"
-            }
-            
-        except Exception as e:
-            logger.error(f"合并历史数据失败: {e}")
-            return cached_data
-    
+        """写入K线文件及元信息"""
+        meta = {
+            "symbol": symbol,
+            "period": period,
+            "total_records": int(bars.shape[1]),
+            "date_range": {
+                "start": int_to_date(bars[0, 0]) if bars.shape[1] else '',
+                "end": int_to_date(bars[0, -1]) if bars.shape[1] else ''
+            },
+            "coverage": {
+                "start": coverage[0].strftime('%Y-%m-%d'),
+                "end": coverage[1].strftime('%Y-%m-%d')
+            },
+            "last_updated": datetime.now().isoformat(),
+            "source": source
+        }
+        self.bar_store.save(symbol, period, bars, meta)
+        return meta
+
+    def _build_result(
+        self,
+        symbol: str,
+        period: str,
+        bars: np.ndarray,
+        meta: Dict[str, Any],
+        date_range: Tuple[str, str]
+    ) -> Dict[str, Any]:
+        """按请求的日期范围切片并组装返回结果"""
+        sliced = BarStore.slice(bars, *date_range)
+        return {
+            "symbol": symbol,
+            "period": period,
+            "data": BarStore.to_records(sliced),
+            "total_records": int(sliced.shape[1]),
+            "date_range": {
+                "start": date_range[0],
+                "end": date_range[1]
+            },
+            "last_updated": meta.get('last_updated', ''),
+            "source": meta.get('source', '')
+        }
+
     def _fetch_full_historical_data(
-        self, 
-        symbol: str, 
-        date_range: Tuple[str, str], 
+        self,
+        symbol: str,
+        date_range: Tuple[str, str],
         period: str
     ) -> Dict[str, Any]:
         """全量获取历史数据"""
         try:
-            start_date, end_date = date_range
-            
+            start = datetime.strptime(date_range[0], '%Y-%m-%d')
+            end = datetime.strptime(date_range[1], '%Y-%m-%d')
+
             # 获取历史数据
-            df = ak.stock_zh_a_hist(symbol=symbol, period=period, 
-                                   start_date=start_date, end_date=end_date)
-            
-            if df.empty:
+            bars = self._fetch_bars(symbol, period, start, end)
+
+            if bars.shape[1] == 0:
                 return {"error": "未获取到数据"}
-            
-            # 转换为标准格式
-            data = []
-            for _, row in df.iterrows():
-                record = {
-                    "date": row.get('日期', ''),
-                    "open": row.get('开盘', 0),
-                    "high": row.get('最高', 0),
-                    "low": row.get('最低', 0),
-                    "close": row.get('收盘', 0),
-                    "volume": row.get('成交量', 0),
-                    "turnover": row.get('成交额', 0),
-                    "amplitude": row.get('振幅', 0),
-                    "change_percent": row.get('涨跌幅', 0),
-                    "change_amount": row.get('涨跌额', 0),
-                    "turnover_rate": row.get('换手率', 0)
-                }
-                data.append(record)
-            
-            result = {
-                "symbol": symbol,
-                "period": period,
-                "data": data,
-                "total_records": len(data),
-                "date_range": {
-                    "start": start_date,
-                    "end": end_date
-                },
-                "last_updated": datetime.now().isoformat(),
-                "source": "全量获取"
-            }
-            
-            # 保存到缓存
-            cache_key = f"historical_{symbol}_{period}"
-            data_manager.save_cache_data(cache_key, result)
-            
-            return result
-            
+
+            # 保存到列式存储
+            meta = self._save(symbol, period, bars, coverage=(start, end), source="全量获取")
+            return self._build_result(symbol, period, bars, meta, date_range)
+
         except Exception as e:
             logger.error(f"全量获取历史数据失败 {symbol}: {e}")
             return {"error": str(e)}
-    
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """检查缓存是否有效"""
-        try:
-            cache_data = data_manager.get_cache_data(cache_key)
-            if not cache_data:
-                return False
-            
-            last_updated = cache_data.get('last_updated')
-            if not last_updated:
-                return False
-            
-            last_update_time = datetime.fromisoformat(last_updated)
-            return datetime.now() - last_update_time < self.cache_duration
-            
-        except Exception as e:
-            logger.error(f"检查缓存有效性失败: {e}")
-            return False
-    
+
+    def _is_cache_valid(self, meta: Dict[str, Any]) -> bool:
+        """检查缓存是否有效（按元信息中的更新时间与历史行情新鲜期 TTL_HISTORY 判断）"""
+        return freshness.is_fresh(meta.get('last_updated'), "history")
+
+    def get_bars(
+        self,
+        symbol: str,
+        start_date: str = None,
+        end_date: str = None,
+        period: str = "daily"
+    ) -> Optional[np.ndarray]:
+        """读取本地K线数组（不触发网络请求），形状为 (字段数, 记录数)"""
+        bars = self.bar_store.load(symbol, period)
+        if bars is None:
+            return None
+        return BarStore.slice(bars, start_date, end_date)
+
+    def rebuild_panel(self, symbols: List[str] = None) -> Dict[str, Any]:
+        """用已缓存的日线K线重建全市场面板"""
+        return self.panel.build(self.bar_store, symbols)
+
+    def get_cross_section(
+        self,
+        field: str,
+        start_date: str = None,
+        end_date: str = None,
+        symbols: List[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """截面查询（所有股票在日期区间内的某个字段），面板未构建时返回None"""
+        return self.panel.get(field, start_date, end_date, symbols)
+
+    def clear_cache(self, symbol: str, period: str = None) -> bool:
+        """清除股票的K线文件和元信息（包括旧版缓存元信息），period为空时清除所有周期"""
+        deleted = self.bar_store.delete(symbol, period)
+        if period:
+            keys = [self._cache_key(symbol, period)]
+        else:
+            keys = [key for key in data_manager.get_cache_info() if key.startswith(f"historical_{symbol}_")]
+        for key in keys:
+            deleted = data_manager.clear_cache(key) or deleted
+        return deleted
+
+    def get_storage_info(self) -> Dict[str, Dict[str, Any]]:
+        """已存储的K线：{"代码_周期": 元信息}（缺少元信息时只有代码与周期）"""
+        info = {}
+        for period in self.bar_store.periods():
+            for symbol in self.bar_store.symbols(period):
+                meta = self.bar_store.load_meta(symbol, period) or {"symbol": symbol, "period": period}
+                info[f"{symbol}_{period}"] = meta
+        return info
+
     def get_data_statistics(self, symbol: str) -> Dict[str, Any]:
         """获取数据统计信息"""
         try:
-            cached_data = self._get_cached_historical_data(symbol, "daily")
-            
-            if not cached_data:
+            meta = self._get_cached_meta(symbol, "daily")
+            bars = self.bar_store.load(symbol, "daily") if meta else None
+
+            if bars is None:
                 return {"message": "无缓存数据"}
-            
-            data = cached_data.get('data', [])
-            
-            if not data:
+
+            if bars.shape[1] == 0:
                 return {"message": "数据为空"}
-            
-            # 计算统计信息
-            prices = [record.get('close', 0) for record in data if record.get('close')]
-            volumes = [record.get('volume', 0) for record in data if record.get('volume')]
-            
+
+            # 计算统计信息（忽略缺失值和0值）
+            prices = BarStore.column(bars, "close")
+            prices = prices[np.isfinite(prices) & (prices != 0)]
+            volumes = BarStore.column(bars, "volume")
+            volumes = volumes[np.isfinite(volumes) & (volumes != 0)]
+
             return {
                 "symbol": symbol,
-                "total_records": len(data),
-                "date_range": cached_data.get('date_range', {}),
+                "total_records": int(bars.shape[1]),
+                "date_range": meta.get('date_range', {}),
                 "price_stats": {
-                    "min": min(prices) if prices else 0,
-                    "max": max(prices) if prices else 0,
-                    "avg": sum(prices) / len(prices) if prices else 0
+                    "min": float(prices.min()) if prices.size else 0,
+                    "max": float(prices.max()) if prices.size else 0,
+                    "avg": float(prices.mean()) if prices.size else 0
                 },
                 "volume_stats": {
-                    "total": sum(volumes) if volumes else 0,
-                    "avg": sum(volumes) / len(volumes) if volumes else 0
+                    "total": float(volumes.sum()) if volumes.size else 0,
+                    "avg": float(volumes.mean()) if volumes.size else 0
                 },
-                "last_updated": cached_data.get('last_updated', '')
+                "last_updated": meta.get('last_updated', '')
             }
-            
+
         except Exception as e:
             logger.error(f"获取数据统计失败 {symbol}: {e}")
             return {"error": str(e)}
 
 # 全局实例
-incremental_service = IncrementalDataService() 
\ No newline at end of file
+incremental_service = IncrementalDataService()
@@ -2,25 +2,41 @@
 """
 实时数据服务
 支持混合模式：本地缓存 + 实时获取
+过期不久的数据可直接返回（标记stale）并在后台刷新（stale-while-revalidate）
 """
 
-import akshare as ak
+import threading
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional, Union
 from datetime import datetime, timedelta
 import logging
+from app.core.config import settings
+from app.services.spot_snapshot import spot_snapshots, SpotSnapshot, industry_pattern
 from app.utils.data_manager import data_manager
+from app.utils.single_flight import single_flight
+from app.utils import freshness
 
 logger = logging.getLogger(__name__)
 
+# 行业数据中尚无数据源的指标（为空时列在unavailable_fields中）
+INDUSTRY_METRIC_FIELDS = ('market_size', 'growth_rate', 'company_count', 'avg_pe')
+
+
+def _has_legacy_placeholders(industry_data: Dict[str, Any]) -> bool:
+    """旧版本写入的行业数据带有示例指标值（没有unavailable_fields），不能当作真实数据返回"""
+    return industry_data.get('source') == 'AKShare行业数据' and 'unavailable_fields' not in industry_data
+
+
 class RealtimeDataService:
     """实时数据服务"""
     
-    def __init__(self):
-        self.cache_duration = timedelta(minutes=5)  # 缓存5分钟
-        self.last_update = {}
-        self._all_stocks_cache = None  # 全局A股数据缓存
-        self._all_stocks_cache_time = None  # 缓存时间
+    def __init__(self, snapshots=None):
+        # 缓存新鲜度按持久化的写入时间与各数据类别的新鲜期（TTL_*配置）判断
+        # 全市场行情快照（进程内共享，后台定时刷新）
+        self.snapshots = snapshots or spot_snapshots
+        # 正在后台刷新的键
+        self._revalidating = set()
+        self._revalidate_lock = threading.Lock()
     
     def get_stock_realtime_data(self, symbol: str, force_refresh: bool = False) -> Dict[str, Any]:
         """
@@ -30,18 +46,23 @@ class RealtimeDataService:
         try:
             # 1. 检查本地缓存
             if not force_refresh:
-                cached_data = self._get_cached_stock_data(symbol)
-                if cached_data and self._is_cache_valid(symbol):
+                cached_item = self._get_cached_stock_item(symbol)
+                cached_data = cached_item.get("data") if cached_item else None
+                if cached_data and self._is_cache_valid(cached_item, "quote"):
                     logger.info(f"使用缓存数据: {symbol}")
-                    return cached_data
+                    return self._with_snapshot_age(cached_data)
+                if cached_data and self._can_serve_stale(cached_item.get("timestamp"), "quote"):
+                    # 过期不久：直接返回旧数据，后台刷新
+                    logger.info(f"使用过期缓存数据并后台刷新: {symbol}")
+                    self._revalidate(f"stock:{symbol}", self._collect_stock_data, symbol)
+                    return dict(self._with_snapshot_age(cached_data), stale=True)
             
-            # 2. 实时获取数据
+            # 2. 实时获取数据（并发的相同请求只获取一次）
             logger.info(f"实时获取数据: {symbol}")
-            realtime_data = self._fetch_stock_realtime(symbol)
+            realtime_data = single_flight.do(f"stock:{symbol}", self._collect_stock_data, symbol)
             
             if realtime_data and "error" not in realtime_data:
-                # 3. 更新缓存
-                self._update_stock_cache(symbol, realtime_data)
+                # 3. 已更新缓存
                 return realtime_data
             else:
                 # 4. 降级到本地存储
@@ -52,6 +73,43 @@ class RealtimeDataService:
             logger.error(f"获取股票数据失败 {symbol}: {e}")
             return self._get_local_stock_data(symbol)
     
+    def get_stocks_realtime_data(self, symbols: List[str], force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        批量获取个股实时数据
+        所有代码在同一份快照上一次解析，不逐只读写缓存
+        
+        Returns:
+            {"quotes": {代码: 行情}, "missing": [未找到的代码], "snapshot_time", "snapshot_age", "stale"}
+        """
+        symbols = [symbol.strip() for symbol in symbols if symbol and symbol.strip()]
+        snapshot = self._get_snapshot(force_refresh)
+        if snapshot is None:
+            # 快照不可用时降级到本地存储
+            logger.warning(f"行情快照不可用，批量查询使用本地数据: {len(symbols)} 只")
+            quotes, missing = {}, []
+            for symbol in dict.fromkeys(symbols):
+                local_data = self._get_local_stock_data(symbol)
+                if "error" in local_data:
+                    missing.append(symbol)
+                else:
+                    quotes[symbol] = local_data
+            return {"quotes": quotes, "missing": missing, "snapshot_time": None, "snapshot_age": None}
+        
+        quotes, missing = snapshot.quotes(symbols)
+        update_time = datetime.now().isoformat()
+        stale = self._is_snapshot_stale(snapshot)
+        industries = self.snapshots.industries
+        for quote in quotes.values():
+            quote.update(
+                industry=industries.industry(quote["code"]),
+                source="AKShare实时获取",
+                update_time=update_time,
+                stale=stale
+            )
+        if missing:
+            logger.info(f"批量查询未找到 {len(missing)} 只股票: {missing[:10]}")
+        return dict({"quotes": quotes, "missing": missing, "stale": stale}, **snapshot.meta())
+    
     def get_companies_by_industry_realtime(self, industry: str, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """
         获取指定行业的公司列表（实时）
@@ -59,18 +117,25 @@ class RealtimeDataService:
         try:
             # 1. 检查本地缓存
             if not force_refresh:
-                cached_companies = self._get_cached_industry_companies(industry)
-                if cached_companies and self._is_cache_valid(industry):
+                cached_item = self._get_cached_industry_item(industry)
+                cached_companies = (cached_item.get("data") if cached_item else None) or []
+                if cached_companies and self._is_cache_valid(cached_item, "industry_list"):
                     logger.info(f"使用缓存数据: {industry} 行业")
-                    return cached_companies
+                    return [self._with_snapshot_age(company) for company in cached_companies]
+                if cached_companies and self._can_serve_stale(cached_item.get("timestamp"), "industry_list"):
+                    # 过期不久：直接返回旧数据，后台刷新
+                    logger.info(f"使用过期缓存数据并后台刷新: {industry} 行业")
+                    self._revalidate(f"industry_companies:{industry}", self._collect_industry_companies, industry)
+                    return [dict(self._with_snapshot_age(company), stale=True) for company in cached_companies]
             
-            # 2. 实时获取数据
+            # 2. 实时获取数据（并发的相同请求只筛选一次）
             logger.info(f"实时获取行业数据: {industry}")
-            realtime_companies = self._fetch_industry_companies(industry)
+            realtime_companies = single_flight.do(
+                f"industry_companies:{industry}", self._collect_industry_companies, industry
+            )
             
             if realtime_companies:
-                # 3. 更新缓存
-                self._update_industry_cache(industry, realtime_companies)
+                # 3. 已更新缓存
                 return realtime_companies
             else:
                 # 4. 降级到本地存储
@@ -81,38 +146,58 @@ class RealtimeDataService:
             logger.error(f"获取行业数据失败 {industry}: {e}")
             return self._get_local_industry_companies(industry)
     
+    def get_shenwan_companies_realtime(self, industry: str) -> Dict[str, Any]:
+        """
+        获取申万行业（任一级别，名称完全相同）成分股的实时行情
+        成分股来自申万行业索引，行情来自全市场快照，不经过行业缓存
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            return {"industry": industry, "companies": [], "index": self.snapshots.industries.info()}
+        common = dict(
+            industry=industry,
+            market="A股",
+            source="AKShare实时获取",
+            update_time=datetime.now().isoformat(),
+            stale=self._is_snapshot_stale(snapshot),
+            **snapshot.meta()
+        )
+        companies = [dict(record, **common) for record in snapshot.records(snapshot.shenwan_rows(industry))]
+        return {"industry": industry, "companies": companies, "index": self.snapshots.industries.info()}
+    
+    def _collect_stock_data(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """获取个股实时数据并更新缓存"""
+        realtime_data = self._fetch_stock_realtime(symbol)
+        if realtime_data and "error" not in realtime_data:
+            self._update_stock_cache(symbol, realtime_data)
+        return realtime_data
+    
+    def _collect_industry_companies(self, industry: str) -> List[Dict[str, Any]]:
+        """获取行业公司列表并更新缓存"""
+        companies = self._fetch_industry_companies(industry)
+        if companies:
+            self._update_industry_cache(industry, companies)
+        return companies
+    
     def _fetch_stock_realtime(self, symbol: str) -> Optional[Dict[str, Any]]:
         """从AKShare获取个股实时数据"""
         try:
-            # 首先尝试从缓存获取A股数据
-            stock_quote = self._get_all_stocks_cache()
-            
-            # 如果缓存不存在或已过期，重新获取
-            if stock_quote is None:
-                logger.info("获取所有A股实时数据（将缓存5分钟）")
-                stock_quote = ak.stock_zh_a_spot_em()
-                self._update_all_stocks_cache(stock_quote)
-            else:
-                logger.info("使用缓存的A股数据")
+            snapshot = self._get_snapshot()
+            if snapshot is None:
+                return None
             
-            # 从数据中筛选目标股票
-            stock_data = stock_quote[stock_quote['代码'] == symbol]
+            # 按代码（或名称）索引直接取出目标股票
+            quote = snapshot.quote(symbol)
             
-            if not stock_data.empty:
-                row = stock_data.iloc[0]
-                return {
-                    "code": symbol,
-                    "name": row.get('名称', ''),
-                    "current_price": row.get('最新价', 0),
-                    "change_percent": row.get('涨跌幅', 0),
-                    "volume": row.get('成交量', 0),
-                    "turnover": row.get('成交额', 0),
-                    "market_cap": row.get('总市值', 0),
-                    "pe_ratio": row.get('市盈率', 0),
-                    "pb_ratio": row.get('市净率', 0),
-                    "source": "AKShare实时获取",
-                    "update_time": datetime.now().isoformat()
-                }
+            if quote is not None:
+                return dict(
+                    quote,
+                    industry=self.snapshots.industries.industry(quote["code"]),
+                    source="AKShare实时获取",
+                    update_time=datetime.now().isoformat(),
+                    stale=self._is_snapshot_stale(snapshot),
+                    **snapshot.meta()
+                )
             else:
                 logger.warning(f"未找到股票 {symbol} 的实时数据")
                 return None
@@ -124,78 +209,50 @@ class RealtimeDataService:
     def _fetch_industry_companies(self, industry: str) -> List[Dict[str, Any]]:
         """从AKShare获取行业公司列表"""
         try:
-            # 首先尝试从缓存获取A股数据
-            stocks_df = self._get_all_stocks_cache()
-            
-            # 如果缓存不存在或已过期，重新获取
-            if stocks_df is None:
-                logger.info("获取所有A股实时数据（将缓存5分钟）")
-                stocks_df = ak.stock_zh_a_spot_em()
-                self._update_all_stocks_cache(stocks_df)
-            else:
-                logger.info("使用缓存的A股数据")
+            snapshot = self._get_snapshot()
+            if snapshot is None:
+                return []
+            common = dict(
+                industry=industry,
+                market="A股",
+                source="AKShare实时获取",
+                update_time=datetime.now().isoformat(),
+                stale=self._is_snapshot_stale(snapshot),
+                **snapshot.meta()
+            )
             
-            # 获取行业信息（简化版本，实际可能需要更复杂的行业映射）
-            # 这里使用关键词匹配
-            industry_keywords = {
-                "医药": ["医药", "生物", "制药", "医疗"],
-                "新能源": ["新能源", "光伏", "风电", "储能"],
-                "半导体": ["半导体", "芯片", "集成电路", "电子"]
-            }
-            
-            keywords = industry_keywords.get(industry, [industry])
-            
-            # 筛选包含关键词的公司
-            companies = []
-            for _, row in stocks_df.iterrows():
-                name = row.get('名称', '')
-                if any(keyword in name for keyword in keywords):
-                    company = {
-                        "code": row.get('代码', ''),
-                        "name": name,
-                        "industry": industry,
-                        "market": "A股",
-                        "current_price": row.get('最新价', 0),
-                        "change_percent": row.get('涨跌幅', 0),
-                        "volume": row.get('成交量', 0),
-                        "turnover": row.get('成交额', 0),
-                        "market_cap": row.get('总市值', 0),
-                        "source": "AKShare实时获取",
-                        "update_time": datetime.now().isoformat()
-                    }
-                    companies.append(company)
-            
-            return companies
+            # 行业按名称关键词匹配（简化的行业映射），匹配结果缓存在快照上
+            rows = snapshot.industry_rows(industry)
+            return [dict(record, **common) for record in snapshot.records(rows)]
             
         except Exception as e:
             logger.error(f"AKShare获取行业数据失败 {industry}: {e}")
             return []
     
-    def _get_cached_stock_data(self, symbol: str) -> Optional[Dict[str, Any]]:
-        """获取缓存的股票数据"""
+    def _get_cached_stock_item(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """获取缓存的股票数据（包含数据和写入时间）"""
         try:
             # 从data_manager获取缓存数据
             cache_key = f"stock_cache_{symbol}"
-            return data_manager.get_cache_data(cache_key)
+            return data_manager.get_cache_item(cache_key)
         except Exception as e:
             logger.error(f"获取缓存数据失败 {symbol}: {e}")
             return None
     
-    def _get_cached_industry_companies(self, industry: str) -> List[Dict[str, Any]]:
-        """获取缓存的行业公司数据"""
+    def _get_cached_industry_item(self, industry: str) -> Optional[Dict[str, Any]]:
+        """获取缓存的行业公司数据（包含数据和写入时间）"""
         try:
             cache_key = f"industry_cache_{industry}"
-            return data_manager.get_cache_data(cache_key) or []
+            return data_manager.get_cache_item(cache_key)
         except Exception as e:
             logger.error(f"获取行业缓存数据失败 {industry}: {e}")
-            return []
+            return None
     
     def _update_stock_cache(self, symbol: str, data: Dict[str, Any]):
         """更新股票缓存"""
         try:
             cache_key = f"stock_cache_{symbol}"
             data_manager.save_cache_data(cache_key, data)
-            self.last_update[symbol] = datetime.now()
         except Exception as e:
             logger.error(f"更新股票缓存失败 {symbol}: {e}")
     
@@ -204,15 +261,50 @@ class RealtimeDataService:
         try:
             cache_key = f"industry_cache_{industry}"
             data_manager.save_cache_data(cache_key, companies)
-            self.last_update[industry] = datetime.now()
         except Exception as e:
             logger.error(f"更新行业缓存失败 {industry}: {e}")
     
-    def _is_cache_valid(self, key: str) -> bool:
-        """检查缓存是否有效"""
-        if key not in self.last_update:
+    @staticmethod
+    def _is_cache_valid(cached_item: Optional[Dict[str, Any]], data_class: str) -> bool:
+        """检查缓存是否有效（按缓存写入时间与数据类别的新鲜期判断）"""
+        if not cached_item:
+            return False
+        return freshness.is_fresh(cached_item.get("timestamp"), data_class)
+    
+    @staticmethod
+    def _can_serve_stale(updated_at: Union[str, float, datetime, None], data_class: str) -> bool:
+        """
+        过期数据能否直接返回
+        过期时间不超过 MAX_STALENESS 秒时返回旧数据并后台刷新，否则请求需等待刷新
+        """
+        if not settings.STALE_WHILE_REVALIDATE:
             return False
-        return datetime.now() - self.last_update[key] < self.cache_duration
+        return freshness.is_fresh(updated_at, data_class, grace=timedelta(seconds=settings.MAX_STALENESS))
+    
+    def _is_snapshot_stale(self, snapshot: SpotSnapshot) -> bool:
+        """快照是否已过期（过期快照在后台刷新期间仍可使用）"""
+        return self.snapshots.is_expired(snapshot.fetched_at)
+    
+    def _revalidate(self, key: str, refresh: Callable[..., Any], *args):
+        """
+        后台刷新过期数据
+        同一键同时只有一个刷新任务；刷新与阻塞请求共用单飞调用键，期间到达的阻塞请求直接等待这次刷新
+        """
+        with self._revalidate_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        
+        def run():
+            try:
+                single_flight.do(key, refresh, *args)
+            except Exception as e:
+                logger.warning(f"后台刷新失败 {key}: {e}")
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard(key)
+        
+        threading.Thread(target=run, name=f"revalidate-{key}", daemon=True).start()
     
     def _get_local_stock_data(self, symbol: str) -> Dict[str, Any]:
         """获取本地存储的股票数据"""
@@ -255,18 +347,21 @@ class RealtimeDataService:
             logger.error(f"获取本地行业数据失败 {industry}: {e}")
             return []
 
-    def _get_all_stocks_cache(self) -> Optional[pd.DataFrame]:
-        """获取缓存的A股数据"""
-        if (self._all_stocks_cache is not None and 
-            self._all_stocks_cache_time is not None and
-            datetime.now() - self._all_stocks_cache_time < self.cache_duration):
-            return self._all_stocks_cache
-        return None
+    def _get_snapshot(self, force_refresh: bool = False) -> Optional[SpotSnapshot]:
+        """获取全市场行情快照（由快照管理器定时刷新，过期不久时后台刷新，强制刷新时同步刷新）"""
+        snapshot = self.snapshots.get(max_age=0 if force_refresh else None, allow_stale=not force_refresh)
+        if snapshot is None:
+            logger.warning("全市场行情快照不可用")
+        return snapshot
     
-    def _update_all_stocks_cache(self, data: pd.DataFrame):
-        """更新A股数据缓存"""
-        self._all_stocks_cache = data
-        self._all_stocks_cache_time = datetime.now()
+    def _with_snapshot_age(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """按快照时间重新计算缓存数据的快照年龄及是否过期"""
+        snapshot_time = data.get("snapshot_time") if isinstance(data, dict) else None
+        fetched_at = freshness.parse_time(snapshot_time)
+        if fetched_at is None:
+            return data
+        age = (datetime.now() - fetched_at).total_seconds()
+        return dict(data, snapshot_age=round(age, 3), stale=self.snapshots.is_expired(fetched_at))
 
     def get_financial_data(self, company_code: str, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """
@@ -278,18 +373,23 @@ class RealtimeDataService:
             if not force_refresh:
                 cached_data = data_manager.get_financial_data(company_code)
                 if cached_data:
-                    logger.info(f"使用本地财务数据: {company_code}")
-                    return cached_data
+                    updated_at = max((str(record.get('updated_at') or '') for record in cached_data), default='')
+                    # 没有写入时间的旧数据不主动刷新
+                    if freshness.data_age(updated_at) is None or freshness.is_fresh(updated_at, "financial"):
+                        logger.info(f"使用本地财务数据: {company_code}")
+                        return cached_data
+                    if self._can_serve_stale(updated_at, "financial"):
+                        logger.info(f"使用过期财务数据并后台刷新: {company_code}")
+                        self._revalidate(f"financial:{company_code}", self._collect_financial_data, company_code)
+                        return [dict(record, stale=True) for record in cached_data]
             
-            # 2. 实时采集财务数据
+            # 2. 实时采集财务数据（并发的相同请求只采集一次）
             logger.info(f"实时采集财务数据: {company_code}")
-            financial_data = self._fetch_financial_data(company_code)
+            financial_data = single_flight.do(
+                f"financial:{company_code}", self._collect_financial_data, company_code
+            )
             
             if financial_data:
-                # 3. 保存到本地
-                for data in financial_data:
-                    data_manager.save_financial_data(company_code, data)
-                logger.info(f"财务数据采集成功并保存: {company_code}")
                 return financial_data
             else:
                 # 4. 降级到本地存储
@@ -300,10 +400,18 @@ class RealtimeDataService:
             logger.error(f"获取财务数据失败 {company_code}: {e}")
             return data_manager.get_financial_data(company_code)
     
+    def _collect_financial_data(self, company_code: str) -> List[Dict[str, Any]]:
+        """采集财务数据并批量保存到本地（一次写入）"""
+        financial_data = self._fetch_financial_data(company_code)
+        if financial_data:
+            data_manager.save_financial_data_bulk(financial_data, company_id=company_code)
+            logger.info(f"财务数据采集成功并保存: {company_code}")
+        return financial_data
+    
     def _fetch_financial_data(self, company_code: str) -> List[Dict[str, Any]]:
         """从AKShare获取公司财务数据"""
         try:
-            import akshare as ak
+            from app.utils.rate_limiter import akshare_api as ak
             
             # 获取财务报表数据
             financial_data = []
@@ -416,18 +524,23 @@ class RealtimeDataService:
             # 1. 检查本地缓存
             if not force_refresh:
                 cached_data = data_manager.get_industry_data(industry)
-                if cached_data:
-                    logger.info(f"使用本地行业数据: {industry}")
-                    return cached_data
+                if cached_data and not _has_legacy_placeholders(cached_data):
+                    updated_at = cached_data.get('updated_at')
+                    if freshness.data_age(updated_at) is None or freshness.is_fresh(updated_at, "industry"):
+                        logger.info(f"使用本地行业数据: {industry}")
+                        return cached_data
+                    if self._can_serve_stale(updated_at, "industry"):
+                        logger.info(f"使用过期行业数据并后台刷新: {industry}")
+                        self._revalidate(f"industry:{industry}", self._collect_industry_data, industry)
+                        return dict(cached_data, stale=True)
             
-            # 2. 实时采集行业数据
+            # 2. 实时采集行业数据（并发的相同请求只采集一次）
             logger.info(f"实时采集行业数据: {industry}")
-            industry_data = self._fetch_industry_data(industry)
+            industry_data = single_flight.do(
+                f"industry:{industry}", self._collect_industry_data, industry
+            )
             
             if industry_data:
-                # 3. 保存到本地
-                data_manager.save_industry_data(industry, industry_data)
-                logger.info(f"行业数据采集成功并保存: {industry}")
                 return industry_data
             else:
                 # 4. 降级到本地存储
@@ -438,11 +551,17 @@ class RealtimeDataService:
             logger.error(f"获取行业数据失败 {industry}: {e}")
             return data_manager.get_industry_data(industry)
     
+    def _collect_industry_data(self, industry: str) -> Optional[Dict[str, Any]]:
+        """采集行业数据并保存到本地"""
+        industry_data = self._fetch_industry_data(industry)
+        if industry_data:
+            data_manager.save_industry_data(industry, industry_data)
+            logger.info(f"行业数据采集成功并保存: {industry}")
+        return industry_data
+    
     def _fetch_industry_data(self, industry: str) -> Optional[Dict[str, Any]]:
         """从AKShare获取行业数据"""
         try:
-            import akshare as ak
-            
             # 获取行业相关数据
             industry_data = {
                 'industry': industry,
@@ -470,17 +589,18 @@ class RealtimeDataService:
                     # 获取半导体指数数据
                     pass
                 
-                # 设置一些示例数据
-                industry_data.update({
-                    'market_size': 1000000000,  # 10亿
-                    'growth_rate': 0.15,  # 15%
-                    'company_count': 50,
-                    'avg_pe': 25.5
-                })
+                # 公司数量按申万行业索引统计（行业名称按关键词匹配任一级别）
+                members = self.snapshots.industries.matching(industry_pattern(industry))
+                if len(members):
+                    industry_data['company_count'] = len(members)
                 
             except Exception as e:
                 logger.warning(f"获取行业指数数据失败 {industry}: {e}")
             
+            # 尚无数据源的指标保持为空并单独列出，不写入示例值，避免缓存后被当作真实数据返回
+            industry_data['unavailable_fields'] = [
+                field for field in INDUSTRY_METRIC_FIELDS if industry_data.get(field) is None
+            ]
             return industry_data
             
         except Exception as e:
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+行情快照增量推送
+每次快照刷新后与上一份快照按列向量化比较，只保留最新价或成交量变化的行（含新增股票）。
+订阅按过滤条件（股票代码、行业）分组，每组每次刷新只筛选、序列化一次，同组的所有连接共享同一帧
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.spot_snapshot import SpotSnapshot, SpotSnapshotManager, spot_snapshots
+from app.utils.serializer import json_dumps
+
+logger = logging.getLogger(__name__)
+
+# 判断行情是否变化的字段
+DELTA_FIELDS = ("current_price", "volume")
+
+
+class SnapshotDelta:
+    """相邻两份快照之间的变化"""
+
+    __slots__ = ("previous", "snapshot", "rows", "removed_rows")
+
+    def __init__(
+        self,
+        previous: Optional[SpotSnapshot],
+        snapshot: SpotSnapshot,
+        rows: np.ndarray,
+        removed_rows: np.ndarray
+    ):
+        self.previous = previous
+        self.snapshot = snapshot
+        self.rows = rows  # 新快照中变化的行号
+        self.removed_rows = removed_rows  # 上一份快照中已不存在的行号
+
+    @property
+    def base_version(self) -> int:
+        return self.previous.version if self.previous is not None else 0
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.removed_rows)
+
+
+def _first_rows(codes: np.ndarray) -> Tuple[pd.Index, np.ndarray]:
+    """去重后的代码索引及对应行号（重复代码以首次出现的行为准）"""
+    index = pd.Index(codes)
+    first = ~index.duplicated()
+    return index[first], np.flatnonzero(first)
+
+
+def diff_snapshots(previous: Optional[SpotSnapshot], snapshot: SpotSnapshot) -> SnapshotDelta:
+    """计算两份快照之间最新价或成交量变化的行"""
+    if previous is None:
+        return SnapshotDelta(None, snapshot, np.arange(len(snapshot)), np.array([], dtype=np.int64))
+
+    previous_codes, previous_rows = _first_rows(previous.codes)
+    positions = previous_codes.get_indexer(snapshot.codes)
+    added = positions < 0
+    aligned = previous_rows[np.where(added, 0, positions)]
+
+    changed = added.copy()
+    for field in DELTA_FIELDS:
+        current = snapshot.columns[field]
+        before = previous.columns[field][aligned]
+        changed |= ~((current == before) | (np.isnan(current) & np.isnan(before)))
+
+    removed = np.flatnonzero(~pd.Index(previous.codes).isin(snapshot.codes))
+    return SnapshotDelta(previous, snapshot, np.flatnonzero(changed), removed)
+
+
+class FeedFilter(NamedTuple):
+    """订阅过滤条件（可哈希，相同条件的订阅归为一组）；同时指定代码与行业时取交集"""
+
+    symbols: Optional[Tuple[str, ...]] = None
+    industry: Optional[str] = None
+
+    @classmethod
+    def create(cls, symbols: Iterable[str] = None, industry: str = None) -> "FeedFilter":
+        cleaned = sorted({symbol.strip() for symbol in symbols or [] if symbol and symbol.strip()})
+        return cls(tuple(cleaned) or None, (industry or '').strip() or None)
+
+    def select(self, snapshot: SpotSnapshot, rows: np.ndarray) -> np.ndarray:
+        """保留rows中符合条件的行"""
+        if self.symbols is not None:
+            wanted = [row for row in (snapshot.row(symbol) for symbol in self.symbols) if row is not None]
+            rows = rows[np.isin(rows, wanted)]
+        if self.industry is not None and len(rows):
+            rows = rows[snapshot.industry_mask(self.industry)[rows]]
+        return rows
+
+
+class Subscription:
+    """一个推送连接，帧在刷新线程中投递到连接所在的事件循环"""
+
+    def __init__(self, feed_filter: FeedFilter, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.filter = feed_filter
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # 队列满时丢弃帧并标记，连接重新发送完整快照
+        self.lagged = False
+        self.closed = False
+
+    def push(self, frame: bytes) -> bool:
+        """投递一帧，连接已断开时返回False"""
+        if self.closed or self.loop.is_closed():
+            self.closed = True
+            return False
+        if self.lagged:
+            # 积压中的连接会重新发送完整快照，后续增量不必再排队
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._put, frame)
+        except RuntimeError:
+            # 事件循环已关闭（连接已断开）
+            self.closed = True
+            return False
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def _put(self, frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+def _sse(event: str, version: int, payload: Dict[str, Any]) -> bytes:
+    """编码为一条SSE消息"""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (version, event.encode(), json_dumps(payload))
+
+
+class SpotDeltaFeed:
+    """行情增量推送中心"""
+
+    def __init__(self, snapshots: SpotSnapshotManager = None, queue_size: int = None):
+        """
+        Args:
+            snapshots: 快照管理器，刷新后计算增量并推送
+            queue_size: 每个连接最多缓存的帧数
+        """
+        self.snapshots = snapshots or spot_snapshots
+        self.queue_size = settings.SPOT_FEED_QUEUE_SIZE if queue_size is None else queue_size
+        self._lock = threading.Lock()
+        self._groups: Dict[FeedFilter, Set[Subscription]] = {}
+        self._stats = {"published": 0, "frames": 0, "deliveries": 0, "changed_rows": 0, "closed": 0}
+        self.snapshots.add_listener(self.publish)
+
+    def subscribe(self, feed_filter: FeedFilter, loop: asyncio.AbstractEventLoop = None) -> Subscription:
+        """订阅增量推送（在连接所在的事件循环中调用，或显式传入loop）"""
+        subscription = Subscription(feed_filter, loop or asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._groups.setdefault(feed_filter, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """取消订阅"""
+        subscription.close()
+        with self._lock:
+            group = self._groups.get(subscription.filter)
+            if group is not None:
+                group.discard(subscription)
+                if not group:
+                    del self._groups[subscription.filter]
+
+    def publish(self, previous: Optional[SpotSnapshot], snapshot: SpotSnapshot):
+        """快照刷新回调：计算增量，按过滤条件分组序列化后投递"""
+        with self._lock:
+            groups = {feed_filter: list(group) for feed_filter, group in self._groups.items()}
+        if not groups:
+            return
+
+        delta = diff_snapshots(previous, snapshot)
+        frames = deliveries = 0
+        closed: List[Subscription] = []
+        for feed_filter, subscriptions in groups.items():
+            frame = self.delta_frame(feed_filter, delta)
+            if frame is None:
+                continue
+            frames += 1
+            for subscription in subscriptions:
+                if subscription.push(frame):
+                    deliveries += 1
+                else:
+                    closed.append(subscription)
+        # 事件循环已关闭的连接不再投递
+        for subscription in closed:
+            self.unsubscribe(subscription)
+        # 刷新回调可能在多个线程中并发执行，计数需加锁
+        with self._lock:
+            self._stats["published"] += 1
+            self._stats["changed_rows"] += len(delta.rows)
+            self._stats["frames"] += frames
+            self._stats["deliveries"] += deliveries
+            self._stats["closed"] += len(closed)
+
+    @staticmethod
+    def delta_frame(feed_filter: FeedFilter, delta: SnapshotDelta) -> Optional[bytes]:
+        """一组订阅的增量帧，没有变化时返回None"""
+        snapshot = delta.snapshot
+        rows = feed_filter.select(snapshot, delta.rows)
+        removed: List[str] = []
+        if delta.previous is not None and len(delta.removed_rows):
+            removed = delta.previous.codes[feed_filter.select(delta.previous, delta.removed_rows)].tolist()
+        if not len(rows) and not removed:
+            return None
+        payload = dict(
+            {"version": snapshot.version, "base_version": delta.base_version},
+            quotes=snapshot.records(rows),
+            removed=removed,
+            **snapshot.meta()
+        )
+        return _sse("delta", snapshot.version, payload)
+
+    def snapshot_frame(self, feed_filter: FeedFilter) -> Optional[bytes]:
+        """当前快照中符合条件的全部行情（连接建立或积压时发送），快照不可用时返回None"""
+        snapshot = self.snapshots.get()
+        if snapshot is None:
+            return None
+        rows = feed_filter.select(snapshot, np.arange(len(snapshot)))
+        payload = dict({"version": snapshot.version}, quotes=snapshot.records(rows), **snapshot.meta())
+        return _sse("snapshot", snapshot.version, payload)
+
+    def stats(self) -> Dict[str, Any]:
+        """订阅分组、连接数及推送统计"""
+        with self._lock:
+            groups = len(self._groups)
+            connections = sum(len(group) for group in self._groups.values())
+            return dict(self._stats, groups=groups, connections=connections)
+
+
+# 全局增量推送中心
+spot_feed = SpotDeltaFeed()
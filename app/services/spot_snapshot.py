@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+全市场A股行情快照
+进程内唯一的快照管理器：后台线程在交易时段按固定间隔拉取全市场行情（ak.stock_zh_a_spot_em），
+休市期间收盘数据拉取一次后等到下一次开盘再刷新，所有读取者共享最新一份快照，不再每个请求重复下载全表。
+快照生成时按代码和名称建立索引，行情字段转为列数组，单只查询为一次哈希查找，批量查询为一次花式索引；
+行业按预编译的关键词正则对整列名称及申万行业名称匹配一次，结果按行业缓存在快照上直到下一次刷新
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.utils.industry_index import IndustryIndex, industry_index
+from app.utils.single_flight import single_flight
+from app.utils.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# 休市期间后台线程的最长休眠时间（秒），到期后重新检查交易时段
+IDLE_CHECK_INTERVAL = 600
+
+
+def _fetch_spot() -> pd.DataFrame:
+    """拉取全市场A股实时行情"""
+    from app.utils.rate_limiter import akshare_api as ak
+    return ak.stock_zh_a_spot_em()
+
+
+# 行业 -> 名称关键词（简化的行业映射，未列出的行业按行业名本身匹配）
+INDUSTRY_KEYWORDS = {
+    "医药": ["医药", "生物", "制药", "医疗"],
+    "新能源": ["新能源", "光伏", "风电", "储能"],
+    "半导体": ["半导体", "芯片", "集成电路", "电子"]
+}
+
+
+# 每份快照最多缓存的行业掩码数
+MAX_INDUSTRY_MASKS = 256
+
+
+@lru_cache(maxsize=MAX_INDUSTRY_MASKS)
+def industry_pattern(industry: str) -> re.Pattern:
+    """行业关键词的预编译正则（多关键词交替，长关键词优先）"""
+    keywords = sorted(set(INDUSTRY_KEYWORDS.get(industry, [industry])), key=len, reverse=True)
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
+
+# 行情字段 -> akshare列名
+QUOTE_COLUMNS = {
+    "current_price": "最新价",
+    "change_percent": "涨跌幅",
+    "volume": "成交量",
+    "turnover": "成交额",
+    "market_cap": "总市值",
+    "pe_ratio": "市盈率",
+    "pb_ratio": "市净率",
+}
+
+
+class SpotSnapshot:
+    """
+    一份全市场行情快照
+
+    快照生成后不再修改，刷新时整体替换为新快照；读取者不得修改frame及列数组
+    """
+
+    __slots__ = (
+        "frame", "fetched_at", "version", "codes", "names", "columns", "code_index", "name_index", "industries",
+        "_industry_masks"
+    )
+
+    def __init__(self, frame: pd.DataFrame, fetched_at: datetime, version: int, industries: IndustryIndex = None):
+        self.frame = frame
+        self.fetched_at = fetched_at
+        self.version = version
+        self.industries = industries
+
+        rows = len(frame)
+        self.codes = self._text_column(frame, "代码")
+        self.names = self._text_column(frame, "名称")
+        # 数值列统一为float64数组，缺失列按0填充
+        self.columns: Dict[str, np.ndarray] = {}
+        for field, column in QUOTE_COLUMNS.items():
+            if column in frame.columns:
+                values = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                values = np.zeros(rows, dtype=np.float64)
+            values.flags.writeable = False
+            self.columns[field] = values
+        # 重复代码/名称以首次出现的行为准
+        self.code_index: Dict[str, int] = {}
+        for i, code in enumerate(self.codes.tolist()):
+            self.code_index.setdefault(code, i)
+        self.name_index: Dict[str, int] = {}
+        for i, name in enumerate(self.names.tolist()):
+            self.name_index.setdefault(name, i)
+        self._industry_masks: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def _text_column(frame: pd.DataFrame, column: str) -> np.ndarray:
+        if column not in frame.columns:
+            return np.full(len(frame), '', dtype=object)
+        values = frame[column].fillna('').astype(str).str.strip().to_numpy(dtype=object)
+        values.flags.writeable = False
+        return values
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def row(self, symbol: str) -> Optional[int]:
+        """股票代码（或名称）-> 行号"""
+        row = self.code_index.get(symbol)
+        if row is None:
+            row = self.name_index.get(symbol)
+        return row
+
+    def records(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """按行号批量取出行情（一次花式索引），NaN转为None"""
+        codes = self.codes[rows].tolist()
+        names = self.names[rows].tolist()
+        fields = {}
+        for field, values in self.columns.items():
+            picked = values[rows]
+            fields[field] = np.where(np.isnan(picked), None, picked).tolist()
+        return [
+            dict({"code": code, "name": name}, **{field: fields[field][i] for field in fields})
+            for i, (code, name) in enumerate(zip(codes, names))
+        ]
+
+    def quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """单只股票行情（按代码或名称查找）"""
+        row = self.row(symbol)
+        if row is None:
+            return None
+        return self.records(np.array([row]))[0]
+
+    def quotes(self, symbols: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        批量查询行情
+
+        Returns:
+            ({请求的代码: 行情}, 未找到的代码列表)，重复的代码只返回一次
+        """
+        symbols = list(dict.fromkeys(symbols))
+        found, rows, missing = [], [], []
+        for symbol in symbols:
+            row = self.row(symbol)
+            if row is None:
+                missing.append(symbol)
+            else:
+                found.append(symbol)
+                rows.append(row)
+        records = self.records(np.asarray(rows, dtype=np.int64)) if rows else []
+        return dict(zip(found, records)), missing
+
+    def industry_mask(self, industry: str) -> np.ndarray:
+        """属于行业的行（只读布尔数组，名称包含行业关键词的股票），同一快照内按行业缓存"""
+        mask = self._industry_masks.get(industry)
+        if mask is None:
+            pattern = industry_pattern(industry)
+            mask = pd.Series(self.names).str.contains(pattern, regex=True).to_numpy(dtype=bool)
+            mask.flags.writeable = False
+            if len(self._industry_masks) >= MAX_INDUSTRY_MASKS:
+                self._industry_masks.clear()
+            self._industry_masks[industry] = mask
+        return mask
+
+    def industry_rows(self, industry: str) -> np.ndarray:
+        """属于行业的行号"""
+        return np.flatnonzero(self.industry_mask(industry))
+
+    def shenwan_rows(self, industry: str) -> np.ndarray:
+        """申万行业（任一级别，名称完全相同）成分股的行号，索引未加载时为空"""
+        if self.industries is None:
+            return np.array([], dtype=np.int64)
+        return np.flatnonzero(np.isin(self.codes, self.industries.symbols(industry)))
+
+    @property
+    def age_seconds(self) -> float:
+        """快照年龄（秒）"""
+        return (datetime.now() - self.fetched_at).total_seconds()
+
+    def meta(self) -> Dict[str, Any]:
+        """附加到响应中的快照时间与年龄"""
+        return {
+            "snapshot_time": self.fetched_at.isoformat(),
+            "snapshot_age": round(self.age_seconds, 3)
+        }
+
+
+class SpotSnapshotManager:
+    """全市场行情快照管理器"""
+
+    def __init__(
+        self,
+        fetcher: Callable[[], pd.DataFrame] = None,
+        refresh_interval: int = None,
+        max_age: int = None,
+        industries: IndustryIndex = None
+    ):
+        """
+        Args:
+            fetcher: 拉取全市场行情的函数，默认 ak.stock_zh_a_spot_em
+            refresh_interval: 交易时段的后台刷新间隔（秒），0表示不启动后台刷新，只在读取时按需刷新
+            max_age: 交易时段读取时可接受的最大快照年龄（秒），超过时同步刷新；休市期间获取的快照有效至下一次开盘
+            industries: 申万行业索引（查询申万行业成分股、填充个股行业），默认全局industry_index
+        """
+        self.fetcher = fetcher or _fetch_spot
+        self.industries = industries or industry_index
+        self.refresh_interval = settings.SPOT_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        self.max_age = settings.SPOT_MAX_AGE if max_age is None else max_age
+        self._snapshot: Optional[SpotSnapshot] = None
+        self._version = 0
+        # 串行化刷新，同一时刻只有一个线程拉取全表
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._thread_guard = threading.Lock()
+        # 过期快照的后台刷新（同时只有一个）
+        self._revalidating = threading.Event()
+        # 快照替换后的回调 (上一份快照, 新快照)
+        self._listeners: List[Callable[[Optional[SpotSnapshot], SpotSnapshot], None]] = []
+        self._stats = {
+            "refreshes": 0, "failures": 0, "last_error": '', "last_duration": 0.0, "stale_served": 0
+        }
+        # 统计单独加锁：读取路径计数时不能等待持有刷新锁的全表拉取
+        self._stats_lock = threading.Lock()
+
+    def _ensure_thread(self):
+        """启动后台刷新线程（fork后的子进程重新启动）"""
+        if not self.refresh_interval:
+            return
+        with self._thread_guard:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="spot-snapshot", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            snapshot = self._snapshot
+            if snapshot is None or self.is_expired(snapshot.fetched_at, self.refresh_interval):
+                if self.refresh(min_version=snapshot.version if snapshot else 0) is None:
+                    time.sleep(self.refresh_interval)
+                    continue
+            time.sleep(self._idle_seconds())
+
+    def _idle_seconds(self) -> float:
+        """距当前快照过期的秒数：交易时段内约为刷新间隔，休市期间等到下一次开盘（分段休眠）"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.refresh_interval
+        remaining = (self.expires_at(snapshot.fetched_at, self.refresh_interval) - datetime.now()).total_seconds()
+        return min(max(remaining, 1.0), max(self.refresh_interval, IDLE_CHECK_INTERVAL))
+
+    def expires_at(self, fetched_at: datetime, max_age: float = None) -> datetime:
+        """
+        快照的过期时间
+        开启SESSION_AWARE_TTL时按交易时段计算：交易时段内max_age秒后过期，休市期间获取的快照有效至下一次开盘
+        """
+        max_age = self.max_age if max_age is None else max_age
+        if max_age <= 0:
+            return fetched_at
+        if settings.SESSION_AWARE_TTL:
+            return trading_calendar.quote_expiry(fetched_at, timedelta(seconds=max_age))
+        return fetched_at + timedelta(seconds=max_age)
+
+    def is_expired(self, fetched_at: datetime, max_age: float = None, grace: float = 0) -> bool:
+        """快照是否已过期（grace为过期后仍可使用的秒数）"""
+        return datetime.now() >= self.expires_at(fetched_at, max_age) + timedelta(seconds=grace)
+
+    def get(self, max_age: float = None, allow_stale: bool = None) -> Optional[SpotSnapshot]:
+        """
+        获取最新快照
+
+        快照不存在或已过期（见expires_at）时同步刷新（并发请求合并为一次拉取）；刷新失败时返回已有的旧快照（可能为None）。
+        allow_stale且开启STALE_WHILE_REVALIDATE时，过期不足MAX_STALENESS秒的快照直接返回，并在后台刷新；
+        allow_stale默认只在未指定max_age时开启
+        """
+        self._ensure_thread()
+        if allow_stale is None:
+            allow_stale = max_age is None
+        snapshot = self._snapshot
+        if snapshot is not None and not self.is_expired(snapshot.fetched_at, max_age):
+            return snapshot
+        if (
+            snapshot is not None and allow_stale and settings.STALE_WHILE_REVALIDATE
+            and not self.is_expired(snapshot.fetched_at, max_age, grace=settings.MAX_STALENESS)
+        ):
+            with self._stats_lock:
+                self._stats["stale_served"] += 1
+            self._revalidate(snapshot.version)
+            return snapshot
+        # 快照只读，所有请求直接共享同一个对象
+        refreshed = single_flight.do(
+            f"spot:{id(self)}", self.refresh, min_version=snapshot.version if snapshot else 0,
+            copy_result=False
+        )
+        return refreshed or snapshot
+
+    def _revalidate(self, version: int):
+        """后台刷新过期快照，与同步刷新共用单飞调用键"""
+        if self._revalidating.is_set():
+            return
+        with self._thread_guard:
+            if self._revalidating.is_set():
+                return
+            self._revalidating.set()
+
+        def run():
+            try:
+                single_flight.do(f"spot:{id(self)}", self.refresh, min_version=version, copy_result=False)
+            except Exception as e:
+                logger.warning(f"后台刷新全市场行情快照失败: {e}")
+            finally:
+                self._revalidating.clear()
+
+        threading.Thread(target=run, name="spot-snapshot-revalidate", daemon=True).start()
+
+    def refresh(self, min_version: int = None) -> Optional[SpotSnapshot]:
+        """
+        拉取全表并替换快照
+
+        Args:
+            min_version: 等待锁期间其他线程已刷新出比该版本新的快照时直接返回，不再重复拉取
+        """
+        with self._refresh_lock:
+            current = self._snapshot
+            if min_version is not None and current is not None and current.version > min_version:
+                return current
+
+            started = time.time()
+            try:
+                frame = self.fetcher()
+            except Exception as e:
+                self._record_failure(str(e))
+                logger.error(f"刷新全市场行情快照失败: {e}")
+                return None
+            if frame is None or frame.empty:
+                self._record_failure("empty")
+                logger.warning("全市场行情为空，保留旧快照")
+                return None
+
+            self._version += 1
+            snapshot = SpotSnapshot(frame, datetime.now(), self._version, self.industries)
+            self._snapshot = snapshot
+            duration = round(time.time() - started, 3)
+            with self._stats_lock:
+                self._stats["refreshes"] += 1
+                self._stats["last_duration"] = duration
+            logger.info(f"全市场行情快照已刷新: {len(frame)} 只股票，耗时 {duration}s")
+            # 在刷新锁内通知，保证回调按版本顺序执行
+            for listener in list(self._listeners):
+                try:
+                    listener(current, snapshot)
+                except Exception as e:
+                    logger.error(f"快照刷新回调失败: {e}")
+            return snapshot
+
+    def _record_failure(self, error: str):
+        with self._stats_lock:
+            self._stats["failures"] += 1
+            self._stats["last_error"] = error
+
+    def add_listener(self, listener: Callable[[Optional[SpotSnapshot], SpotSnapshot], None]):
+        """注册快照刷新回调，在刷新线程中以 (上一份快照, 新快照) 调用，回调应尽快返回"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Optional[SpotSnapshot], SpotSnapshot], None]):
+        """移除快照刷新回调"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def peek(self) -> Optional[SpotSnapshot]:
+        """获取当前快照（不触发刷新）"""
+        return self._snapshot
+
+    def info(self) -> Dict[str, Any]:
+        """快照状态"""
+        snapshot = self._snapshot
+        with self._stats_lock:
+            stats = dict(self._stats)
+        info = dict(
+            stats,
+            refresh_interval=self.refresh_interval,
+            max_age=self.max_age,
+            background_refresh=bool(self._thread is not None and self._thread.is_alive()),
+            revalidating=self._revalidating.is_set()
+        )
+        if settings.SESSION_AWARE_TTL:
+            info.update(session=trading_calendar.session())
+        if snapshot is None:
+            info.update(available=False)
+        else:
+            info.update(
+                available=True, rows=len(snapshot.frame), version=snapshot.version,
+                expires_at=self.expires_at(snapshot.fetched_at).isoformat(), **snapshot.meta()
+            )
+        return info
+
+
+# 全局快照管理器
+spot_snapshots = SpotSnapshotManager()
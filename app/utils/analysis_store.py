@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+分析结果存储
+报告正文与索引分表存放：索引按 (目标类型, 目标ID, 分析类型, 创建时间) 建立，
+列表查询只扫描该目标的索引行，分页后再读取当页正文
+"""
+
+import json
+import os
+import sqlite3
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+from app.utils.serializer import serializer
+from app.utils.sqlite_local import ThreadLocalConnections
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisStore:
+    """基于SQLite的分析结果存储"""
+
+    def __init__(self, db_path: str, legacy_json_path: str = None):
+        self.db_path = db_path
+        # 每线程一个连接，线程结束时自动关闭
+        self._connections = ThreadLocalConnections(db_path)
+        self._init_db()
+        if legacy_json_path:
+            self._migrate_legacy_json(legacy_json_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        return self._connections.get()
+
+    def close(self):
+        """关闭所有线程的数据库连接"""
+        self._connections.close()
+
+    def _init_db(self):
+        """初始化索引表和正文表"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_index (
+                id TEXT PRIMARY KEY,
+                target_type TEXT,
+                target_id TEXT,
+                analysis_type TEXT,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_analysis_target "
+            "ON analysis_index (target_type, target_id, analysis_type, created_at)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_created ON analysis_index (created_at)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_reports (
+                id TEXT PRIMARY KEY,
+                body BLOB NOT NULL
+            )
+            """
+        )
+
+    def _migrate_legacy_json(self, legacy_json_path: str):
+        """将旧版analysis_results.json导入（仅执行一次）"""
+        if not os.path.exists(legacy_json_path):
+            return
+        try:
+            with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                legacy_data = json.load(f)
+
+            records = []
+            for analysis_id, record in legacy_data.items():
+                if isinstance(record, dict):
+                    records.append(dict(record, id=record.get('id') or analysis_id))
+            if not self.save_many(records):
+                return
+
+            os.replace(legacy_json_path, legacy_json_path + ".migrated")
+            logger.info(f"已迁移旧版分析结果文件: {legacy_json_path}，共 {len(records)} 条")
+        except Exception as e:
+            logger.error(f"迁移旧版分析结果文件失败: {e}")
+
+    @staticmethod
+    def _rows(record: Dict[str, Any]) -> Tuple[tuple, tuple]:
+        """拆分为索引行和正文行"""
+        target_id = record.get('target_id')
+        index_row = (
+            record['id'],
+            record.get('target_type'),
+            str(target_id) if target_id is not None else None,
+            record.get('analysis_type'),
+            str(record.get('created_at') or '')
+        )
+        body_row = (record['id'], serializer.dumps(record))
+        return index_row, body_row
+
+    def save_many(self, records: List[Dict[str, Any]]) -> bool:
+        """批量写入分析结果（按id覆盖，单个事务）"""
+        if not records:
+            return True
+        try:
+            rows = [self._rows(record) for record in records]
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO analysis_index (id, target_type, target_id, analysis_type, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [index_row for index_row, _ in rows]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO analysis_reports (id, body) VALUES (?, ?)",
+                    [body_row for _, body_row in rows]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return True
+        except Exception as e:
+            logger.error(f"保存分析结果失败: {e}")
+            return False
+
+    def save(self, record: Dict[str, Any]) -> bool:
+        """写入单条分析结果"""
+        return self.save_many([record])
+
+    @staticmethod
+    def _where(target_type: str = None, target_id: str = None, analysis_type: str = None) -> Tuple[str, list]:
+        clauses, params = [], []
+        for column, value in (("target_type", target_type), ("target_id", target_id), ("analysis_type", analysis_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(str(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def list_ids(
+        self,
+        target_type: str = None,
+        target_id: str = None,
+        analysis_type: str = None,
+        limit: int = None,
+        offset: int = 0
+    ) -> List[str]:
+        """按创建时间倒序列出分析结果id（只读索引）"""
+        where, params = self._where(target_type, target_id, analysis_type)
+        rows = self._connect().execute(
+            f"SELECT id FROM analysis_index{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit if limit is not None else -1, offset]
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def list(
+        self,
+        target_type: str = None,
+        target_id: str = None,
+        analysis_type: str = None,
+        limit: int = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """按创建时间倒序列出分析结果（只读取当页正文）"""
+        where, params = self._where(target_type, target_id, analysis_type)
+        rows = self._connect().execute(
+            f"""
+            SELECT r.body FROM (
+                SELECT id, created_at FROM analysis_index{where}
+                ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+            ) AS page
+            JOIN analysis_reports AS r ON r.id = page.id
+            ORDER BY page.created_at DESC, page.id DESC
+            """,
+            params + [limit if limit is not None else -1, offset]
+        ).fetchall()
+        return [serializer.loads(row[0]) for row in rows]
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """按id读取分析结果"""
+        row = self._connect().execute(
+            "SELECT body FROM analysis_reports WHERE id = ?", (analysis_id,)
+        ).fetchone()
+        return serializer.loads(row[0]) if row else None
+
+    def count(self, target_type: str = None, target_id: str = None, analysis_type: str = None) -> int:
+        """统计分析结果数量"""
+        where, params = self._where(target_type, target_id, analysis_type)
+        return self._connect().execute(f"SELECT COUNT(*) FROM analysis_index{where}", params).fetchone()[0]
+
+    def delete(self, analysis_id: str) -> bool:
+        """删除分析结果"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute("DELETE FROM analysis_index WHERE id = ?", (analysis_id,))
+            conn.execute("DELETE FROM analysis_reports WHERE id = ?", (analysis_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount > 0
+
+    def backup(self, target_path: str):
+        """在线备份到指定文件"""
+        target = sqlite3.connect(target_path)
+        try:
+            self._connect().backup(target)
+        finally:
+            target.close()
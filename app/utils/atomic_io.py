@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+多进程安全的文件读写
+原子替换写入（临时文件 + 重命名）、跨进程建议锁、合并同一文件待写更新的单写线程
+"""
+
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Optional, Tuple
+import logging
+from app.utils.serializer import Serializer, serializer as default_serializer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_bytes(filepath: str, payload: bytes):
+    """原子写入：先写同目录临时文件并fsync，再重命名覆盖，读取者不会看到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(filepath)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(filepath: str, data: Any, indent: Optional[int] = 2):
+    """原子写入JSON文件"""
+    payload = json.dumps(data, ensure_ascii=False, indent=indent, default=str).encode('utf-8')
+    atomic_write_bytes(filepath, payload)
+
+
+def read_json(filepath: str) -> Dict[str, Any]:
+    """读取JSON文件，文件不存在时返回空字典"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def atomic_write_data(filepath: str, data: Any, serializer: Serializer = None):
+    """按配置的编码与压缩方式原子写入数据文件"""
+    atomic_write_bytes(filepath, (serializer or default_serializer).dumps(data))
+
+
+def read_data(filepath: str, serializer: Serializer = None) -> Dict[str, Any]:
+    """读取数据文件（自动识别旧版JSON及压缩格式），文件不存在时返回空字典"""
+    try:
+        return (serializer or default_serializer).load_file(filepath)
+    except FileNotFoundError:
+        return {}
+
+
+class _PathLock:
+    """进程内按路径的锁：flock只在进程间互斥，同一进程的线程另用线程锁串行"""
+
+    __slots__ = ("lock", "owner", "depth")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.owner: Optional[int] = None
+        self.depth = 0
+
+
+_path_locks: Dict[str, _PathLock] = {}
+_path_locks_guard = threading.Lock()
+
+
+def _path_lock(lock_path: str) -> _PathLock:
+    with _path_locks_guard:
+        path_lock = _path_locks.get(lock_path)
+        if path_lock is None:
+            path_lock = _path_locks[lock_path] = _PathLock()
+        return path_lock
+
+
+def _lock_file(lock_file, exclusive: bool):
+    if fcntl:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK if exclusive else msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(filepath: str):
+    """
+    跨进程建议锁（锁文件为 <文件>.lock）
+
+    POSIX使用flock，Windows使用msvcrt.locking；同一线程可重入
+    """
+    lock_path = os.path.abspath(filepath) + ".lock"
+    path_lock = _path_lock(lock_path)
+    me = threading.get_ident()
+    if path_lock.owner == me:
+        path_lock.depth += 1
+        try:
+            yield
+        finally:
+            path_lock.depth -= 1
+        return
+
+    with path_lock.lock:
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a+b') as lock_file:
+            _lock_file(lock_file, True)
+            path_lock.owner = me
+            try:
+                yield
+            finally:
+                path_lock.owner = None
+                _lock_file(lock_file, False)
+
+
+Mutation = Callable[[Dict[str, Any]], Any]
+Written = Callable[[str, Dict[str, Any]], None]
+
+
+class CoalescingWriter:
+    """
+    单写线程
+
+    对同一文件的待写更新排队，写线程每次取出该文件的全部待写更新，
+    在文件锁内读取一次最新内容、依次应用、原子写入一次，然后通知各调用方。
+    抛出异常的更新不会留下部分修改（重新读取文件并重放同批已成功的更新）
+    """
+
+    def __init__(self, serializer: Serializer = None):
+        self.serializer = serializer or default_serializer
+        self._cond = threading.Condition()
+        self._pending: Dict[str, List[Tuple[Mutation, Future, Optional[Written]]]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats = {"updates": 0, "writes": 0}
+
+    def _ensure_thread(self):
+        """启动写线程（fork后的子进程重新启动）"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            self._pending = {}
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="json-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, filepath: str, mutate: Mutation, on_written: Written = None) -> Future:
+        """
+        提交一次读-改-写更新
+
+        Args:
+            filepath: 数据文件路径
+            mutate: 接收文件当前内容（dict）并原地修改，返回值作为Future结果
+            on_written: 写入成功后的回调 (文件路径, 写入的数据)，在文件锁内调用
+        """
+        future: Future = Future()
+        filepath = os.path.abspath(filepath)
+        if threading.current_thread() is self._thread:
+            # 回调中再次提交时直接执行，避免写线程等待自身
+            self._apply(filepath, [(mutate, future, on_written)])
+            return future
+        with self._cond:
+            self._ensure_thread()
+            self._pending.setdefault(filepath, []).append((mutate, future, on_written))
+            self._cond.notify()
+        return future
+
+    def update(self, filepath: str, mutate: Mutation, on_written: Written = None, timeout: float = None) -> Any:
+        """提交更新并等待写入完成，返回mutate的返回值"""
+        return self.submit(filepath, mutate, on_written).result(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                filepath = next(iter(self._pending))
+                batch = self._pending.pop(filepath)
+            self._apply(filepath, batch)
+
+    def _apply(self, filepath: str, batch: List[Tuple[Mutation, Future, Optional[Written]]]):
+        """在文件锁内应用一批更新并写入一次"""
+        # outcomes[i] = (结果, 异常)，与batch一一对应
+        outcomes: List[Tuple[Any, Optional[BaseException]]] = []
+        try:
+            with file_lock(filepath):
+                data = read_data(filepath, self.serializer)
+                for mutate, _, _ in batch:
+                    try:
+                        outcomes.append((mutate(data), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+                        # 丢弃失败更新的部分修改：重新读取文件（仍持有文件锁，内容未变）并重放此前成功的更新，
+                        # 只在出错时付出一次重读，正常批次不复制数据
+                        data = self._replay(filepath, batch, outcomes)
+                changed = any(error is None for _, error in outcomes)
+                if changed:
+                    atomic_write_data(filepath, data, self.serializer)
+                    for callback in dict.fromkeys(cb for _, _, cb in batch if cb):
+                        callback(filepath, data)
+            self._stats["updates"] += len(batch)
+            self._stats["writes"] += int(changed)
+        except Exception as e:
+            logger.error(f"写入数据文件失败 {filepath}: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), (result, error) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _replay(
+        self,
+        filepath: str,
+        batch: List[Tuple[Mutation, Future, Optional[Written]]],
+        outcomes: List[Tuple[Any, Optional[BaseException]]]
+    ) -> Dict[str, Any]:
+        """从文件内容重新应用已成功的更新（保留首次执行的结果，重放失败的更新改记为失败）"""
+        data = read_data(filepath, self.serializer)
+        for i, (result, error) in enumerate(outcomes):
+            if error is not None:
+                continue
+            try:
+                batch[i][0](data)
+            except Exception as e:
+                outcomes[i] = (None, e)
+                return self._replay(filepath, batch, outcomes)
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        """写入统计：更新次数与实际写文件次数"""
+        with self._cond:
+            pending = sum(len(batch) for batch in self._pending.values())
+        return dict(self._stats, pending=pending)
+
+
+# 全局写线程
+json_writer = CoalescingWriter()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+全市场K线面板
+将列式K线存储汇总为一个内存映射的三维数组 (股票 × 交易日 × 字段)，用于截面查询
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+import numpy as np
+
+from app.utils.atomic_io import atomic_write_json
+from app.utils.bar_store import BarStore, BAR_FIELDS, date_to_int, int_to_date
+
+logger = logging.getLogger(__name__)
+
+# 面板中的字段（日期作为第二维，不再单独存储）
+PANEL_FIELDS = BAR_FIELDS[1:]
+PANEL_FIELD_INDEX = {field: i for i, field in enumerate(PANEL_FIELDS)}
+
+
+class BarPanel:
+    """内存映射的全市场K线面板"""
+
+    def __init__(self, root_dir: str, period: str = "daily"):
+        """
+        Args:
+            root_dir: 面板文件目录
+            period: 数据周期
+        """
+        self.root_dir = root_dir
+        self.period = period
+        self.index_path = os.path.join(root_dir, f"{period}_index.json")
+        self._lock = threading.Lock()
+        self._stat_key: Optional[Tuple[int, int, int]] = None
+        self._panel: Optional[np.ndarray] = None
+        self._symbols: List[str] = []
+        self._symbol_index: Dict[str, int] = {}
+        self._dates: np.ndarray = np.empty(0, dtype=np.int64)
+        self._built_at = ''
+
+    def build(self, bar_store: BarStore, symbols: List[str] = None) -> Dict[str, Any]:
+        """
+        从列式K线存储构建面板
+
+        面板数据写入新文件后再原子替换索引文件，正在读取旧面板的请求不受影响
+        """
+        symbols = sorted(symbols) if symbols else bar_store.symbols(self.period)
+        series = {}
+        for symbol in symbols:
+            bars = bar_store.load(symbol, self.period)
+            if bars is not None and bars.shape[1] > 0:
+                series[symbol] = bars
+        symbols = list(series.keys())
+
+        # 交易日为所有股票日期的并集
+        if series:
+            dates = np.unique(np.concatenate([bars[0] for bars in series.values()])).astype(np.int64)
+        else:
+            dates = np.empty(0, dtype=np.int64)
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        built_at = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        panel_name = f"{self.period}_{built_at}.npy"
+        panel_path = os.path.join(self.root_dir, panel_name)
+
+        panel = np.lib.format.open_memmap(
+            panel_path, mode='w+', dtype=np.float64,
+            shape=(len(symbols), len(dates), len(PANEL_FIELDS))
+        )
+        panel[:] = np.nan
+        for row, symbol in enumerate(symbols):
+            bars = series[symbol]
+            columns = np.searchsorted(dates, bars[0].astype(np.int64))
+            panel[row, columns, :] = bars[1:].T
+        panel.flush()
+        del panel
+
+        index = {
+            "period": self.period,
+            "panel_file": panel_name,
+            "symbols": symbols,
+            "dates": dates.tolist(),
+            "fields": list(PANEL_FIELDS),
+            "built_at": datetime.now().isoformat()
+        }
+        atomic_write_json(self.index_path, index, indent=None)
+        self._remove_stale_panels(panel_name)
+
+        logger.info(f"K线面板构建完成: {len(symbols)} 只股票 × {len(dates)} 个交易日")
+        return self.info()
+
+    def _remove_stale_panels(self, current: str):
+        """删除旧的面板文件（已映射的读取者在POSIX系统上不受影响）"""
+        for name in os.listdir(self.root_dir):
+            if name.startswith(f"{self.period}_") and name.endswith(".npy") and name != current:
+                try:
+                    os.remove(os.path.join(self.root_dir, name))
+                except OSError as e:
+                    logger.warning(f"删除旧面板文件失败 {name}: {e}")
+
+    def _ensure_loaded(self) -> bool:
+        """索引文件变化时重新映射面板"""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return False
+
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if stat_key == self._stat_key:
+                return True
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self._panel = np.load(os.path.join(self.root_dir, index["panel_file"]), mmap_mode='r')
+            self._symbols = index["symbols"]
+            self._symbol_index = {symbol: i for i, symbol in enumerate(self._symbols)}
+            self._dates = np.asarray(index["dates"], dtype=np.int64)
+            self._built_at = index.get("built_at", '')
+            self._stat_key = stat_key
+            return True
+
+    @property
+    def symbols(self) -> List[str]:
+        self._ensure_loaded()
+        return self._symbols
+
+    @property
+    def dates(self) -> np.ndarray:
+        """交易日数组（YYYYMMDD整数）"""
+        self._ensure_loaded()
+        return self._dates
+
+    def symbol_row(self, symbol: str) -> Optional[int]:
+        """股票代码 -> 行号"""
+        self._ensure_loaded()
+        return self._symbol_index.get(symbol)
+
+    def date_column(self, value: Any) -> Optional[int]:
+        """日期 -> 列号，非交易日返回None"""
+        self._ensure_loaded()
+        target = date_to_int(value)
+        column = int(np.searchsorted(self._dates, target))
+        if column < self._dates.shape[0] and self._dates[column] == target:
+            return column
+        return None
+
+    def _date_slice(self, start_date: Any = None, end_date: Any = None) -> slice:
+        lo = np.searchsorted(self._dates, date_to_int(start_date), side='left') if start_date else 0
+        hi = np.searchsorted(self._dates, date_to_int(end_date), side='right') if end_date else self._dates.shape[0]
+        return slice(int(lo), int(hi))
+
+    def get(
+        self,
+        field: str,
+        start_date: Any = None,
+        end_date: Any = None,
+        symbols: List[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        截面查询
+
+        Args:
+            field: 字段名（close、volume等）
+            start_date: 开始日期
+            end_date: 结束日期
+            symbols: 股票代码列表，为空时返回全部股票
+
+        Returns:
+            {"symbols", "dates", "values"}，values形状为 (股票数, 交易日数)。
+            查询全部股票时values是面板的只读视图（不复制数据）；未找到的股票不在结果中
+        """
+        if field not in PANEL_FIELD_INDEX:
+            raise ValueError(f"不支持的字段: {field}")
+        if not self._ensure_loaded():
+            return None
+
+        # 在锁内取同一版本的面板和索引，避免与重新映射交错
+        with self._lock:
+            panel, all_symbols, symbol_index = self._panel, self._symbols, self._symbol_index
+            dates = self._date_slice(start_date, end_date)
+            all_dates = self._dates
+
+        if symbols is None:
+            rows = slice(None)
+            found = all_symbols
+        else:
+            found = [symbol for symbol in symbols if symbol in symbol_index]
+            rows = [symbol_index[symbol] for symbol in found]
+
+        return {
+            "symbols": found,
+            "dates": all_dates[dates],
+            "values": panel[rows, dates, PANEL_FIELD_INDEX[field]]
+        }
+
+    def info(self) -> Dict[str, Any]:
+        """面板概况"""
+        if not self._ensure_loaded():
+            return {"period": self.period, "built": False}
+        return {
+            "period": self.period,
+            "built": True,
+            "symbols": len(self._symbols),
+            "trading_days": int(self._dates.shape[0]),
+            "fields": list(PANEL_FIELDS),
+            "date_range": {
+                "start": int_to_date(self._dates[0]) if self._dates.shape[0] else '',
+                "end": int_to_date(self._dates[-1]) if self._dates.shape[0] else ''
+            },
+            "built_at": self._built_at
+        }
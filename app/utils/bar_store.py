@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+K线列式存储
+每只股票、每个周期一个.npy文件，按字段存放按日期排序的列；
+元信息（已覆盖的日期范围、更新时间）存放在同目录的.meta.json中，与K线文件一起写入和删除，不受缓存淘汰影响
+"""
+
+import io
+import os
+from datetime import date, datetime
+from typing import Dict, List, Any, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+from app.utils.atomic_io import atomic_write_bytes, atomic_write_json, read_json
+from app.utils.frame_normalizer import FrameSchema
+
+logger = logging.getLogger(__name__)
+
+# 字段顺序即文件中的行顺序；日期以YYYYMMDD整数存储
+BAR_FIELDS = (
+    "date", "open", "high", "low", "close", "volume", "turnover",
+    "amplitude", "change_percent", "change_amount", "turnover_rate"
+)
+FIELD_INDEX = {field: i for i, field in enumerate(BAR_FIELDS)}
+
+
+def date_to_int(value: Any) -> int:
+    """将日期（字符串/date/datetime）转换为YYYYMMDD整数"""
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    return int(str(value).replace('-', '')[:8])
+
+
+def int_to_date(value: int) -> str:
+    """将YYYYMMDD整数转换为YYYY-MM-DD字符串"""
+    value = int(value)
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+class BarStore:
+    """按股票分文件的列式K线存储"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def _path(self, symbol: str, period: str) -> str:
+        return os.path.join(self.root_dir, period, f"{symbol}.npy")
+
+    def _meta_path(self, symbol: str, period: str) -> str:
+        return os.path.join(self.root_dir, period, f"{symbol}.meta.json")
+
+    @staticmethod
+    def empty() -> np.ndarray:
+        """空K线数组"""
+        return np.empty((len(BAR_FIELDS), 0), dtype=np.float64)
+
+    def load(self, symbol: str, period: str = "daily") -> Optional[np.ndarray]:
+        """读取K线数组，形状为 (字段数, 记录数)，不存在时返回None"""
+        try:
+            return np.load(self._path(symbol, period))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"读取K线文件失败 {symbol}: {e}")
+            return None
+
+    def load_meta(self, symbol: str, period: str = "daily") -> Optional[Dict[str, Any]]:
+        """读取K线元信息，K线文件或元信息不存在时返回None"""
+        if not os.path.exists(self._path(symbol, period)):
+            return None
+        try:
+            return read_json(self._meta_path(symbol, period)) or None
+        except Exception as e:
+            logger.error(f"读取K线元信息失败 {symbol}: {e}")
+            return None
+
+    def save(self, symbol: str, period: str, bars: np.ndarray, meta: Dict[str, Any] = None) -> bool:
+        """原子写入K线数组（临时文件 + 重命名），meta不为空时随后写入元信息"""
+        try:
+            buffer = io.BytesIO()
+            np.save(buffer, np.ascontiguousarray(bars, dtype=np.float64))
+            atomic_write_bytes(self._path(symbol, period), buffer.getvalue())
+            if meta is not None:
+                atomic_write_json(self._meta_path(symbol, period), meta)
+            return True
+        except Exception as e:
+            logger.error(f"写入K线文件失败 {symbol}: {e}")
+            return False
+
+    def delete(self, symbol: str, period: str = None) -> bool:
+        """删除K线文件及其元信息，period为空时删除该股票所有周期"""
+        periods = [period] if period else self.periods()
+        deleted = False
+        for p in periods:
+            for path in (self._path(symbol, p), self._meta_path(symbol, p)):
+                if os.path.exists(path):
+                    os.remove(path)
+                    deleted = True
+        return deleted
+
+    def periods(self) -> List[str]:
+        """已存储的周期列表"""
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root_dir)
+            if os.path.isdir(os.path.join(self.root_dir, name))
+        )
+
+    def symbols(self, period: str = "daily") -> List[str]:
+        """已存储的股票代码列表"""
+        period_dir = os.path.join(self.root_dir, period)
+        if not os.path.isdir(period_dir):
+            return []
+        return sorted(
+            name[:-4] for name in os.listdir(period_dir)
+            if name.endswith(".npy")
+        )
+
+    @staticmethod
+    def merge(old: Optional[np.ndarray], new: np.ndarray) -> np.ndarray:
+        """合并K线：按日期去重（新数据优先）并排序"""
+        if old is None or old.shape[1] == 0:
+            combined = new
+        elif new.shape[1] == 0:
+            return old
+        else:
+            combined = np.concatenate([new, old], axis=1)
+        # unique返回每个日期首次出现的位置，new在前因此新数据优先
+        _, first = np.unique(combined[0], return_index=True)
+        return combined[:, first]
+
+    @staticmethod
+    def slice(bars: np.ndarray, start_date: Any = None, end_date: Any = None) -> np.ndarray:
+        """按日期范围切片（二分查找，返回视图）"""
+        dates = bars[0]
+        lo = np.searchsorted(dates, date_to_int(start_date), side='left') if start_date else 0
+        hi = np.searchsorted(dates, date_to_int(end_date), side='right') if end_date else dates.shape[0]
+        return bars[:, lo:hi]
+
+    @staticmethod
+    def column(bars: np.ndarray, field: str) -> np.ndarray:
+        """获取单个字段的列"""
+        return bars[FIELD_INDEX[field]]
+
+    @staticmethod
+    def from_frame(df: pd.DataFrame, column_map: Dict[str, str]) -> np.ndarray:
+        """
+        将DataFrame按列转换为K线数组
+
+        Args:
+            df: 原始数据
+            column_map: 原始列名 -> 标准字段名
+        """
+        if df is None or df.empty:
+            return BarStore.empty()
+        schema = FrameSchema(
+            {source: field for source, field in column_map.items() if field in FIELD_INDEX},
+            numeric=[field for field in BAR_FIELDS[1:] if field in column_map.values()],
+            dates=("date",)
+        )
+        frame = schema.frame(df)
+        bars = np.full((len(BAR_FIELDS), len(frame)), np.nan, dtype=np.float64)
+        dates = frame["date"]
+        bars[0] = (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).to_numpy(dtype=np.float64)
+        for field in schema.numeric:
+            bars[FIELD_INDEX[field]] = frame[field].to_numpy(dtype=np.float64)
+        return BarStore.merge(None, bars[:, np.isfinite(bars[0])])
+
+    @staticmethod
+    def to_records(bars: np.ndarray) -> List[Dict[str, Any]]:
+        """将K线数组转换为记录列表（用于接口返回）"""
+        if bars.shape[1] == 0:
+            return []
+        columns = {field: bars[i].tolist() for i, field in enumerate(BAR_FIELDS)}
+        columns["date"] = [int_to_date(value) for value in columns["date"]]
+        for field, values in columns.items():
+            if field != "date":
+                columns[field] = [None if value != value else value for value in values]
+        return [dict(zip(columns.keys(), row)) for row in zip(*columns.values())]
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+缓存存储引擎
+基于SQLite的键值表，每次读写只涉及单个缓存键。
+按键前缀划分命名空间，各命名空间有独立的过期时间；总条数和总字节数超出预算时按最近访问时间（LRU）淘汰，
+固定的命名空间（如交易日历、行业索引等元数据）不参与LRU淘汰
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+import logging
+from app.utils.serializer import serializer
+from app.utils.sqlite_local import ThreadLocalConnections
+
+logger = logging.getLogger(__name__)
+
+# 访问时间的更新粒度（秒），避免每次读取都写库
+TOUCH_INTERVAL = 60
+
+
+class CacheStore:
+    """SQLite键值缓存存储"""
+
+    def __init__(
+        self,
+        db_path: str,
+        legacy_json_path: str = None,
+        namespace_ttls: Dict[str, Optional[int]] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        eviction_interval: Optional[int] = None,
+        pinned: Iterable[str] = ()
+    ):
+        """
+        Args:
+            db_path: 缓存数据库路径
+            legacy_json_path: 旧版cache.json路径，存在时首次启动自动导入
+            namespace_ttls: {键前缀: 过期秒数}，None表示不过期；未匹配任何前缀的键归入默认命名空间（空字符串，不过期）
+            max_entries: 缓存条数上限，None表示不限
+            max_bytes: 缓存值总字节数上限，None表示不限
+            eviction_interval: 后台淘汰间隔（秒），None或0表示不启动后台线程
+            pinned: 不参与LRU淘汰的键前缀（仍按所属命名空间过期，计入总量）
+        """
+        self.db_path = db_path
+        # 前缀长的优先匹配
+        self.namespace_ttls = dict(sorted((namespace_ttls or {}).items(), key=lambda item: -len(item[0])))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction_interval = eviction_interval
+        self.pinned = tuple(pinned)
+        # 每线程一个连接，线程结束时自动关闭
+        self._connections = ThreadLocalConnections(db_path)
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "eviction_runs": 0}
+        self._last_eviction = ''
+        self._evictor: Optional[threading.Thread] = None
+        self._evictor_pid: Optional[int] = None
+        self._init_db()
+        if legacy_json_path:
+            self._migrate_legacy_json(legacy_json_path)
+        self._ensure_evictor()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        return self._connections.get()
+
+    def close(self):
+        """关闭所有线程的数据库连接"""
+        self._connections.close()
+
+    def _init_db(self):
+        """初始化缓存表"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                timestamp TEXT NOT NULL,
+                data_type TEXT NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+        if "accessed_at" not in columns:
+            # 旧表补充访问时间列，已有数据视为最久未访问
+            conn.execute("ALTER TABLE cache ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed_at)")
+
+    def _migrate_legacy_json(self, legacy_json_path: str):
+        """将旧版cache.json导入缓存表（仅执行一次）"""
+        if not os.path.exists(legacy_json_path):
+            return
+        try:
+            with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                legacy_data = json.load(f)
+
+            rows = []
+            for key, item in legacy_data.items():
+                if not isinstance(item, dict):
+                    continue
+                data = item.get("data")
+                value = self._encode(data)
+                rows.append((key, value, item.get("timestamp") or datetime.now().isoformat(),
+                             type(data).__name__, len(value)))
+
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 已存在的键以缓存表为准
+                conn.executemany(
+                    "INSERT OR IGNORE INTO cache (key, value, timestamp, data_type, size) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            os.replace(legacy_json_path, legacy_json_path + ".migrated")
+            logger.info(f"已迁移旧版缓存文件: {legacy_json_path}，共 {len(rows)} 条")
+        except Exception as e:
+            logger.error(f"迁移旧版缓存文件失败: {e}")
+
+    @staticmethod
+    def _encode(data: Any) -> bytes:
+        """序列化缓存值（按配置的编码与压缩方式）"""
+        return serializer.dumps(data)
+
+    @staticmethod
+    def _decode(value: bytes) -> Any:
+        """反序列化缓存值（兼容旧版JSON值）"""
+        return serializer.loads(value)
+
+    def namespace(self, key: str) -> str:
+        """缓存键所属的命名空间（匹配到的键前缀，未匹配时为空字符串）"""
+        for prefix in self.namespace_ttls:
+            if key.startswith(prefix):
+                return prefix
+        return ""
+
+    def _cutoff(self, namespace: str) -> Optional[str]:
+        """命名空间的过期分界时间，早于该时间写入的缓存已过期"""
+        ttl = self.namespace_ttls.get(namespace)
+        if not ttl:
+            return None
+        return (datetime.now() - timedelta(seconds=ttl)).isoformat()
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    def set(self, key: str, data: Any) -> bool:
+        """写入单个缓存键"""
+        try:
+            value = self._encode(data)
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (key, value, timestamp, data_type, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, datetime.now().isoformat(), type(data).__name__, len(value), time.time())
+            )
+            return True
+        except Exception as e:
+            logger.error(f"写入缓存失败 {key}: {e}")
+            return False
+
+    def get_item(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取单个缓存项（包含数据和时间戳），已过期的缓存视为不存在"""
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, timestamp, accessed_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+
+            value, timestamp, accessed_at = row
+            cutoff = self._cutoff(self.namespace(key))
+            if cutoff and timestamp < cutoff:
+                conn.execute("DELETE FROM cache WHERE key = ? AND timestamp = ?", (key, timestamp))
+                self._count("expired")
+                self._count("misses")
+                return None
+
+            now = time.time()
+            if now - accessed_at >= TOUCH_INTERVAL:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return {"data": self._decode(value), "timestamp": timestamp}
+        except Exception as e:
+            logger.error(f"读取缓存失败 {key}: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取单个缓存键的数据"""
+        item = self.get_item(key)
+        return item.get("data") if item else None
+
+    def delete(self, key: str) -> bool:
+        """删除单个缓存键，返回是否存在并被删除"""
+        cursor = self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def clear(self) -> bool:
+        """清空所有缓存"""
+        self._connect().execute("DELETE FROM cache")
+        return True
+
+    def evict(self) -> Dict[str, int]:
+        """
+        执行一次淘汰：先删除各命名空间的过期缓存，再按最近访问时间淘汰超出条数/字节预算的缓存
+
+        Returns:
+            {"expired": 过期删除条数, "evicted": 超预算淘汰条数}
+        """
+        conn = self._connect()
+        expired = 0
+        for prefix in self.namespace_ttls:
+            cutoff = self._cutoff(prefix)
+            if cutoff:
+                # GLOB按前缀匹配（不把下划线当作通配符），可利用主键索引
+                cursor = conn.execute(
+                    "DELETE FROM cache WHERE key GLOB ? AND timestamp < ?", (prefix + "*", cutoff)
+                )
+                expired += cursor.rowcount
+
+        evicted = 0
+        if self.max_entries is not None or self.max_bytes is not None:
+            count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            over_entries = count - self.max_entries if self.max_entries is not None else 0
+            over_bytes = total_bytes - self.max_bytes if self.max_bytes is not None else 0
+            if over_entries > 0 or over_bytes > 0:
+                victims: List[Tuple[str]] = []
+                candidates = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at, key").fetchall()
+                for key, size in candidates:
+                    if over_entries <= 0 and over_bytes <= 0:
+                        break
+                    if key.startswith(self.pinned):
+                        continue
+                    victims.append((key,))
+                    over_entries -= 1
+                    over_bytes -= size
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                evicted = len(victims)
+
+        with self._stats_lock:
+            self._stats["expired"] += expired
+            self._stats["evicted"] += evicted
+            self._stats["eviction_runs"] += 1
+            self._last_eviction = datetime.now().isoformat()
+        if expired or evicted:
+            logger.info(f"缓存淘汰完成: 过期 {expired} 条，超预算 {evicted} 条")
+        return {"expired": expired, "evicted": evicted}
+
+    def _ensure_evictor(self):
+        """启动后台淘汰线程（fork后的子进程重新启动）"""
+        if not self.eviction_interval:
+            return
+        if self._evictor is not None and self._evictor_pid == os.getpid() and self._evictor.is_alive():
+            return
+        self._evictor_pid = os.getpid()
+        self._evictor = threading.Thread(
+            target=_eviction_loop, args=(weakref.ref(self), self.eviction_interval),
+            name="cache-evictor", daemon=True
+        )
+        self._evictor.start()
+
+    def info(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有缓存键的元信息（不读取缓存值）"""
+        rows = self._connect().execute(
+            "SELECT key, timestamp, data_type, size FROM cache ORDER BY key"
+        ).fetchall()
+        return {
+            key: {"timestamp": timestamp, "data_type": data_type, "size": size}
+            for key, timestamp, data_type, size in rows
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计（总量、各命名空间用量、命中与淘汰计数）"""
+        self._ensure_evictor()
+        conn = self._connect()
+        count, total_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+
+        namespaces = {
+            prefix: {"entries": 0, "bytes": 0, "ttl": ttl}
+            for prefix, ttl in self.namespace_ttls.items()
+        }
+        namespaces.setdefault("", {"entries": 0, "bytes": 0, "ttl": None})
+        for key, size in conn.execute("SELECT key, size FROM cache"):
+            usage = namespaces[self.namespace(key)]
+            usage["entries"] += 1
+            usage["bytes"] += size
+
+        with self._stats_lock:
+            counters = dict(self._stats)
+            last_eviction = self._last_eviction
+        lookups = counters["hits"] + counters["misses"]
+        return dict(
+            counters,
+            entries=count,
+            total_bytes=total_size,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+            hit_rate=round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            namespaces=namespaces,
+            last_eviction=last_eviction
+        )
+
+
+def _eviction_loop(store_ref: "weakref.ReferenceType[CacheStore]", interval: int):
+    """后台淘汰线程：缓存存储对象被回收后自动退出"""
+    while True:
+        time.sleep(interval)
+        store = store_ref()
+        if store is None:
+            return
+        try:
+            store.evict()
+        except Exception as e:
+            logger.error(f"缓存淘汰失败: {e}")
+        del store
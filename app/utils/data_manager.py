@@ -1,10 +1,17 @@
-import json
 import csv
 import os
+import threading
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Callable, Optional, Tuple, Union
 import logging
 from app.core.config import settings
+from app.utils.analysis_store import AnalysisStore
+from app.utils.atomic_io import atomic_write_data, file_lock, json_writer
+from app.utils.cache_store import CacheStore
+from app.utils.frozen import freeze
+from app.utils.financial_journal import FinancialJournal
+from app.utils.helpers import to_records
+from app.utils.serializer import serializer
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +19,48 @@ logger = logging.getLogger(__name__)
 class DataManager:
     """本地数据管理器"""
     
-    def __init__(self):
-        self.data_dir = settings.DATA_DIR
+    def __init__(self, data_dir: str = None):
+        self.data_dir = data_dir or settings.DATA_DIR
         self._ensure_directories()
+        # 缓存存储引擎（按键读写，替代整体重写cache.json；按命名空间过期，超出预算按LRU淘汰，元数据不淘汰）
+        self.cache_store = CacheStore(
+            self._get_file_path("cache.db"),
+            legacy_json_path=self._get_file_path("cache.json"),
+            namespace_ttls={
+                "stock_cache_": settings.CACHE_TTL_STOCK or None,
+                "industry_cache_": settings.CACHE_TTL_INDUSTRY or None,
+                "historical_": settings.CACHE_TTL_HISTORICAL or None
+            },
+            max_entries=settings.CACHE_MAX_ENTRIES or None,
+            max_bytes=settings.CACHE_MAX_MB * 1024 * 1024 or None,
+            eviction_interval=settings.CACHE_EVICTION_INTERVAL or None,
+            # 交易日历与申万行业索引被淘汰后会在请求路径上同步重新下载
+            pinned=("trading_calendar", "shenwan_industry_index")
+        )
+        self._init_record_stores()
+        # 已解码JSON文件的进程内缓存：{绝对路径: ((inode, mtime_ns, size), 只读数据)}
+        self._json_cache: Dict[str, tuple] = {}
+        self._json_cache_lock = threading.Lock()
+        self._json_cache_stats = {"hits": 0, "misses": 0}
+    
+    def _init_record_stores(self):
+        """创建财务数据与分析结果的存储（其他存储后端可覆盖）"""
+        # 财务数据追加日志（按公司+报告期+数据类型去重）
+        self.financial_journal = FinancialJournal(
+            self._get_file_path("financial_data.jsonl"),
+            legacy_json_path=self._get_file_path("financial_data.json")
+        )
+        # 分析结果（索引与正文分表，按目标分页查询）
+        self.analysis_store = AnalysisStore(
+            self._get_file_path("analysis.db"),
+            legacy_json_path=self._get_file_path("analysis_results.json")
+        )
+    
+    def close(self):
+        """关闭缓存与分析结果数据库的连接（应用关闭时调用）"""
+        self.cache_store.close()
+        if self.analysis_store is not None:
+            self.analysis_store.close()
     
     def _ensure_directories(self):
         """确保数据目录存在"""
@@ -25,28 +71,89 @@ class DataManager:
         return os.path.join(self.data_dir, filename)
     
     def save_json(self, data: Dict[str, Any], filename: str) -> bool:
-        """保存JSON数据"""
+        """保存JSON数据（整体覆盖，按配置的编码与压缩方式原子替换写入）"""
         try:
             filepath = self._get_file_path(filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with file_lock(filepath):
+                atomic_write_data(filepath, data)
+                # 自身写入后直接刷新内存缓存，无需重新解析
+                self._remember_json(filepath, data)
             logger.info(f"数据已保存到: {filepath}")
             return True
         except Exception as e:
             logger.error(f"保存JSON文件失败: {e}")
+            self._forget_json(self._get_file_path(filename))
+            return False
+    
+    def _update_json(self, filename: str, mutate: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        对JSON文件做读-改-写
+        
+        交给单写线程执行：在跨进程文件锁内读取最新内容、应用mutate、原子写入，
+        同一文件排队中的更新合并为一次写入。返回mutate的返回值，失败时返回False
+        """
+        try:
+            return json_writer.update(self._get_file_path(filename), mutate, on_written=self._remember_json)
+        except Exception as e:
+            logger.error(f"更新JSON文件失败 {filename}: {e}")
             return False
     
     def load_json(self, filename: str) -> Dict[str, Any]:
-        """加载JSON数据"""
+        """加载JSON数据（返回可修改的浅拷贝，嵌套对象为只读视图）"""
+        return dict(self._load_cached_json(filename))
+    
+    def _load_cached_json(self, filename: str) -> Dict[str, Any]:
+        """加载JSON数据（返回共享的只读视图，文件mtime/大小变化时自动失效）"""
+        filepath = os.path.abspath(self._get_file_path(filename))
         try:
-            filepath = self._get_file_path(filename)
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            self._forget_json(filepath)
+            return freeze({})
+        
+        # 原子替换写入会更换inode，其他进程写入后同样能检测到
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._json_cache_lock:
+            cached = self._json_cache.get(filepath)
+            if cached and cached[0] == stat_key:
+                self._json_cache_stats["hits"] += 1
+                return cached[1]
+            self._json_cache_stats["misses"] += 1
+        
+        try:
+            # 自动识别旧版缩进JSON、紧凑JSON、msgpack及压缩格式
+            data = freeze(serializer.load_file(filepath))
         except Exception as e:
             logger.error(f"加载JSON文件失败: {e}")
-            return {}
+            return freeze({})
+        
+        with self._json_cache_lock:
+            self._json_cache[filepath] = (stat_key, data)
+        return data
+    
+    def _remember_json(self, filepath: str, data: Any):
+        """写入后更新内存缓存（需在文件锁内调用，保证stat与数据对应）"""
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        with self._json_cache_lock:
+            self._json_cache[filepath] = ((stat.st_ino, stat.st_mtime_ns, stat.st_size), freeze(data))
+    
+    def _forget_json(self, filepath: str):
+        """移除内存缓存"""
+        with self._json_cache_lock:
+            self._json_cache.pop(os.path.abspath(filepath), None)
+    
+    def get_memory_cache_stats(self) -> Dict[str, Any]:
+        """获取JSON文件内存缓存的命中统计"""
+        with self._json_cache_lock:
+            hits = self._json_cache_stats["hits"]
+            misses = self._json_cache_stats["misses"]
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "cached_files": len(self._json_cache)
+            }
     
     def save_csv(self, data: List[Dict[str, Any]], filename: str) -> bool:
         """保存CSV数据"""
@@ -81,102 +188,242 @@ class DataManager:
     # 公司数据管理
     def save_company(self, company_data: Dict[str, Any]) -> bool:
         """保存公司数据"""
-        companies = self.load_json("companies.json")
         company_id = company_data.get('code', company_data.get('id'))
-        companies[company_id] = company_data
-        return self.save_json(companies, "companies.json")
+        
+        def mutate(companies):
+            companies[company_id] = company_data
+            return True
+        return self._update_json("companies.json", mutate)
+    
+    def save_companies_bulk(self, companies_data: Union[List[Dict[str, Any]], Any]) -> bool:
+        """
+        批量保存公司数据（一次读写完成）
+        
+        Args:
+            companies_data: 公司记录列表或DataFrame，每条记录以code（或id）为键
+        """
+        records = to_records(companies_data)
+        if not records:
+            return True
+        
+        def mutate(companies):
+            for company_data in records:
+                company_id = company_data.get('code', company_data.get('id'))
+                if company_id:
+                    companies[company_id] = company_data
+            return True
+        return self._update_json("companies.json", mutate)
     
     def get_company(self, company_id: str) -> Optional[Dict[str, Any]]:
-        """获取公司数据"""
-        companies = self.load_json("companies.json")
+        """获取公司数据（只读视图）"""
+        companies = self._load_cached_json("companies.json")
         return companies.get(company_id)
     
     def get_all_companies(self) -> Dict[str, Any]:
-        """获取所有公司数据"""
-        return self.load_json("companies.json")
+        """获取所有公司数据（只读视图）"""
+        return self._load_cached_json("companies.json")
+    
+    def get_companies_by_industry(self, industry: str) -> List[Dict[str, Any]]:
+        """获取指定行业的公司列表"""
+        return [
+            company for company in self._load_cached_json("companies.json").values()
+            if company.get('industry') == industry
+        ]
     
     def delete_company(self, company_id: str) -> bool:
         """删除公司数据"""
-        companies = self.load_json("companies.json")
-        if company_id in companies:
-            del companies[company_id]
-            return self.save_json(companies, "companies.json")
-        return False
+        if company_id not in self._load_cached_json("companies.json"):
+            return False
+        return self._update_json("companies.json", lambda companies: companies.pop(company_id, None) is not None)
     
     # 财务数据管理
     def save_financial_data(self, company_id: str, financial_data: Dict[str, Any]) -> bool:
-        """保存财务数据"""
-        all_data = self.load_json("financial_data.json")
-        if company_id not in all_data:
-            all_data[company_id] = []
-        
+        """保存财务数据（相同报告期和数据类型的记录会被覆盖）"""
         # 添加时间戳
         financial_data['updated_at'] = datetime.now().isoformat()
-        all_data[company_id].append(financial_data)
-        
-        return self.save_json(all_data, "financial_data.json")
+        return self.financial_journal.upsert(company_id, financial_data)
     
     def get_financial_data(self, company_id: str) -> List[Dict[str, Any]]:
-        """获取公司财务数据"""
-        all_data = self.load_json("financial_data.json")
-        return all_data.get(company_id, [])
+        """获取公司财务数据（只读视图）"""
+        return self.financial_journal.get(company_id)
+    
+    def save_financial_data_bulk(
+        self,
+        financial_data: Union[List[Dict[str, Any]], Any],
+        company_id: str = None,
+        keep_timestamps: bool = False
+    ) -> bool:
+        """
+        批量保存财务数据（一次追加写入）
+        
+        Args:
+            financial_data: 财务记录列表或DataFrame
+            company_id: 公司代码；为空时从每条记录的company_id（或code）字段读取
+            keep_timestamps: 保留记录已有的updated_at（迁移、导入时使用），否则记为当前时间
+        """
+        return self.financial_journal.upsert_many(self._financial_items(financial_data, company_id, keep_timestamps))
+    
+    @staticmethod
+    def _financial_items(
+        financial_data: Union[List[Dict[str, Any]], Any],
+        company_id: str = None,
+        keep_timestamps: bool = False
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """将批量财务记录整理为 (公司代码, 记录) 列表，并添加时间戳"""
+        updated_at = datetime.now().isoformat()
+        items = []
+        for record in to_records(financial_data):
+            record = dict(record)
+            record_company = company_id or record.pop('company_id', None) or record.get('code')
+            if not record_company:
+                logger.warning(f"财务记录缺少公司代码，已跳过: {record}")
+                continue
+            if not (keep_timestamps and record.get('updated_at')):
+                record['updated_at'] = updated_at
+            items.append((record_company, record))
+        return items
+    
+    def get_all_financial_data(self) -> Dict[str, List[Dict[str, Any]]]:
+        """获取全部公司的财务数据（只读视图）"""
+        return self.financial_journal.get_all()
+    
+    def get_financial_data_by_period(
+        self,
+        start_date: str = None,
+        end_date: str = None,
+        company_ids: List[str] = None,
+        data_type: str = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按报告期范围查询财务数据
+        
+        Args:
+            start_date: 开始报告期（YYYYMMDD或YYYY-MM-DD）
+            end_date: 结束报告期
+            company_ids: 公司代码列表，为空时查询全部公司
+            data_type: 数据类型
+        
+        Returns:
+            财务记录列表，每条记录附带company_id
+        """
+        start = str(start_date).replace('-', '') if start_date else None
+        end = str(end_date).replace('-', '') if end_date else None
+        all_financial = self.get_all_financial_data()
+        results = []
+        for company_id in (company_ids or all_financial.keys()):
+            for record in all_financial.get(company_id, []):
+                report_date = str(record.get('report_date') or '').replace('-', '')[:8]
+                if not report_date:
+                    continue
+                if (start and report_date < start) or (end and report_date > end):
+                    continue
+                if data_type and record.get('data_type') != data_type:
+                    continue
+                results.append(dict(record, company_id=company_id))
+        return results
     
     def delete_financial_data(self, company_id: str, data_id: str = None) -> bool:
         """删除财务数据"""
-        all_data = self.load_json("financial_data.json")
-        if company_id in all_data:
-            if data_id:
-                # 删除特定记录
-                all_data[company_id] = [item for item in all_data[company_id] 
-                                      if item.get('id') != data_id]
-            else:
-                # 删除所有记录
-                del all_data[company_id]
-            return self.save_json(all_data, "financial_data.json")
-        return False
+        return self.financial_journal.delete(company_id, data_id)
     
     # 行业数据管理
     def save_industry_data(self, industry_name: str, industry_data: Dict[str, Any]) -> bool:
         """保存行业数据"""
-        all_data = self.load_json("industry_data.json")
         industry_data['updated_at'] = datetime.now().isoformat()
-        all_data[industry_name] = industry_data
-        return self.save_json(all_data, "industry_data.json")
+        
+        def mutate(all_data):
+            all_data[industry_name] = industry_data
+            return True
+        return self._update_json("industry_data.json", mutate)
+    
+    def save_industries_bulk(self, industries: Dict[str, Dict[str, Any]], keep_timestamps: bool = False) -> bool:
+        """
+        批量保存行业数据（一次读写完成）
+        
+        Args:
+            industries: {行业名称: 行业数据}
+            keep_timestamps: 保留数据已有的updated_at（迁移、导入时使用），否则记为当前时间
+        """
+        industries = self._industry_items(industries, keep_timestamps)
+        if not industries:
+            return True
+        
+        def mutate(all_data):
+            all_data.update(industries)
+            return True
+        return self._update_json("industry_data.json", mutate)
+    
+    @staticmethod
+    def _industry_items(industries: Dict[str, Dict[str, Any]], keep_timestamps: bool = False) -> Dict[str, Dict[str, Any]]:
+        """复制批量行业数据并添加时间戳"""
+        updated_at = datetime.now().isoformat()
+        items = {}
+        for industry_name, industry_data in industries.items():
+            industry_data = dict(industry_data)
+            if not (keep_timestamps and industry_data.get('updated_at')):
+                industry_data['updated_at'] = updated_at
+            items[industry_name] = industry_data
+        return items
     
     def get_industry_data(self, industry_name: str) -> Optional[Dict[str, Any]]:
-        """获取行业数据"""
-        all_data = self.load_json("industry_data.json")
+        """获取行业数据（只读视图）"""
+        all_data = self._load_cached_json("industry_data.json")
         return all_data.get(industry_name)
     
     def get_all_industries(self) -> Dict[str, Any]:
-        """获取所有行业数据"""
-        return self.load_json("industry_data.json")
+        """获取所有行业数据（只读视图）"""
+        return self._load_cached_json("industry_data.json")
     
     # 分析结果管理
+    @staticmethod
+    def _prepare_analysis_result(analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """补全分析结果的id和创建时间（调用方已提供时保留）"""
+        if not analysis_data.get('id'):
+            analysis_data['id'] = f"{analysis_data.get('target_type')}_{analysis_data.get('target_id')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if not analysis_data.get('created_at'):
+            analysis_data['created_at'] = datetime.now().isoformat()
+        return analysis_data
+    
     def save_analysis_result(self, analysis_data: Dict[str, Any]) -> bool:
         """保存分析结果"""
-        all_results = self.load_json("analysis_results.json")
-        analysis_id = f"{analysis_data.get('target_type')}_{analysis_data.get('target_id')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        analysis_data['id'] = analysis_id
-        analysis_data['created_at'] = datetime.now().isoformat()
-        all_results[analysis_id] = analysis_data
-        return self.save_json(all_results, "analysis_results.json")
-    
-    def get_analysis_results(self, target_type: str = None, target_id: str = None) -> List[Dict[str, Any]]:
-        """获取分析结果"""
-        all_results = self.load_json("analysis_results.json")
-        results = []
-        
-        for result in all_results.values():
-            if target_type and result.get('target_type') != target_type:
-                continue
-            if target_id and result.get('target_id') != target_id:
-                continue
-            results.append(result)
+        return self.analysis_store.save(self._prepare_analysis_result(analysis_data))
+    
+    def save_analysis_results_bulk(self, results: List[Dict[str, Any]]) -> bool:
+        """批量保存分析结果（单个事务，按id覆盖；已有的id和创建时间保留）"""
+        return self.analysis_store.save_many([self._prepare_analysis_result(dict(result)) for result in results])
+    
+    def get_analysis_result(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """按id获取分析结果"""
+        return self.analysis_store.get(analysis_id)
+    
+    def get_analysis_results(
+        self,
+        target_type: str = None,
+        target_id: str = None,
+        analysis_type: str = None,
+        limit: int = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        获取分析结果（按创建时间倒序）
         
-        # 按时间排序
-        results.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        return results
+        Args:
+            target_type: 目标类型（company、industry）
+            target_id: 目标ID（公司代码、行业名称）
+            analysis_type: 分析类型
+            limit: 返回条数，为空时返回全部
+            offset: 跳过条数
+        """
+        return self.analysis_store.list(target_type, target_id, analysis_type, limit, offset)
+    
+    def count_analysis_results(
+        self,
+        target_type: str = None,
+        target_id: str = None,
+        analysis_type: str = None
+    ) -> int:
+        """统计分析结果数量"""
+        return self.analysis_store.count(target_type, target_id, analysis_type)
     
     # 数据导出功能
     def export_to_excel(self, filename: str = None) -> bool:
@@ -197,18 +444,16 @@ class DataManager:
             if companies:
                 company_list = []
                 for company_id, company_data in companies.items():
-                    company_data['id'] = company_id
-                    company_list.append(company_data)
+                    company_list.append(dict(company_data, id=company_id))
                 data_sheets['companies'] = pd.DataFrame(company_list)
             
             # 财务数据
-            all_financial = self.load_json("financial_data.json")
+            all_financial = self.get_all_financial_data()
             if all_financial:
                 financial_list = []
                 for company_id, financial_records in all_financial.items():
                     for record in financial_records:
-                        record['company_id'] = company_id
-                        financial_list.append(record)
+                        financial_list.append(dict(record, company_id=company_id))
                 data_sheets['financial_data'] = pd.DataFrame(financial_list)
             
             # 行业数据
@@ -216,17 +461,15 @@ class DataManager:
             if industries:
                 industry_list = []
                 for industry_name, industry_data in industries.items():
-                    industry_data['industry_name'] = industry_name
-                    industry_list.append(industry_data)
+                    industry_list.append(dict(industry_data, industry_name=industry_name))
                 data_sheets['industry_data'] = pd.DataFrame(industry_list)
             
             # 分析结果
-            analysis_results = self.load_json("analysis_results.json")
+            analysis_results = self.get_analysis_results()
             if analysis_results:
                 analysis_list = []
-                for result_id, result_data in analysis_results.items():
-                    result_data['result_id'] = result_id
-                    analysis_list.append(result_data)
+                for result_data in analysis_results:
+                    analysis_list.append(dict(result_data, result_id=result_data.get('id')))
                 data_sheets['analysis_results'] = pd.DataFrame(analysis_list)
             
             # 保存到Excel
@@ -251,9 +494,8 @@ class DataManager:
             # 复制所有数据文件
             data_files = [
                 "companies.json",
-                "financial_data.json",
-                "industry_data.json",
-                "analysis_results.json"
+                "financial_data.jsonl",
+                "industry_data.json"
             ]
             
             for filename in data_files:
@@ -261,6 +503,8 @@ class DataManager:
                 if os.path.exists(filepath):
                     import shutil
                     shutil.copy2(filepath, backup_dir)
+            if self.analysis_store is not None:
+                self.analysis_store.backup(os.path.join(backup_dir, "analysis.db"))
             
             logger.info(f"数据已备份到: {backup_dir}")
             return True
@@ -273,68 +517,60 @@ class DataManager:
         summary = {
             "companies": len(self.get_all_companies()),
             "industries": len(self.get_all_industries()),
-            "analysis_results": len(self.load_json("analysis_results.json")),
-            "total_financial_records": 0
+            "analysis_results": self.count_analysis_results(),
+            "total_financial_records": self.financial_journal.count()
         }
         
-        # 计算财务记录总数
-        all_financial = self.load_json("financial_data.json")
-        for company_records in all_financial.values():
-            summary["total_financial_records"] += len(company_records)
-        
         return summary
     
     # 缓存数据管理
     def save_cache_data(self, cache_key: str, data: Any) -> bool:
         """保存缓存数据"""
-        try:
-            cache_data = self.load_json("cache.json")
-            cache_data[cache_key] = {
-                "data": data,
-                "timestamp": datetime.now().isoformat()
-            }
-            return self.save_json(cache_data, "cache.json")
-        except Exception as e:
-            logger.error(f"保存缓存数据失败: {e}")
-            return False
+        return self.cache_store.set(cache_key, data)
     
     def get_cache_data(self, cache_key: str) -> Optional[Any]:
         """获取缓存数据"""
-        try:
-            cache_data = self.load_json("cache.json")
-            cache_item = cache_data.get(cache_key)
-            if cache_item:
-                return cache_item.get("data")
-            return None
-        except Exception as e:
-            logger.error(f"获取缓存数据失败: {e}")
-            return None
+        return self.cache_store.get(cache_key)
+    
+    def get_cache_item(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """获取缓存项（包含数据和时间戳）"""
+        return self.cache_store.get_item(cache_key)
     
     def clear_cache(self, cache_key: str = None) -> bool:
         """清除缓存数据"""
         try:
             if cache_key:
                 # 清除指定缓存
-                cache_data = self.load_json("cache.json")
-                if cache_key in cache_data:
-                    del cache_data[cache_key]
-                    return self.save_json(cache_data, "cache.json")
+                return self.cache_store.delete(cache_key)
             else:
                 # 清除所有缓存
-                return self.save_json({}, "cache.json")
+                return self.cache_store.clear()
         except Exception as e:
             logger.error(f"清除缓存失败: {e}")
             return False
     
-    def get_cache_info(self) -> Dict[str, Any]:
-        """获取缓存信息"""
+    def evict_cache(self) -> Dict[str, int]:
+        """立即执行一次缓存淘汰（过期与超预算）"""
         try:
-            cache_data = self.load_json("cache.json")
-            cache_info = {}
-            for key, value in cache_data.items():
-                cache_info[key] = {
-                    "timestamp": value.get("timestamp"),
-                    "data_type": type(value.get("data")).__name__
+            return self.cache_store.evict()
+        except Exception as e:
+            logger.error(f"缓存淘汰失败: {e}")
+            return {"expired": 0, "evicted": 0}
+    
+    def get_cache_info(self, include_stats: bool = False) -> Dict[str, Any]:
+        """
+        获取缓存信息
+        
+        Args:
+            include_stats: 是否附带统计信息（以"_stats"键返回，包含内存缓存命中/未命中计数、
+                           缓存各命名空间用量及过期/淘汰计数）
+        """
+        try:
+            cache_info = self.cache_store.info()
+            if include_stats:
+                cache_info["_stats"] = {
+                    "memory_cache": self.get_memory_cache_stats(),
+                    "cache_store": self.cache_store.stats()
                 }
             return cache_info
         except Exception as e:
@@ -342,5 +578,13 @@ class DataManager:
             return {}
 
 
+def create_data_manager(data_dir: str = None) -> DataManager:
+    """按配置的存储后端（STORAGE_BACKEND）创建数据管理器"""
+    if settings.STORAGE_BACKEND == "sqlite":
+        from app.database.repository import SQLRepository
+        return SQLRepository(data_dir)
+    return DataManager(data_dir)
+
+
 # 创建全局数据管理器实例
-data_manager = DataManager() 
\ No newline at end of file
+data_manager = create_data_manager() 
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+并发调用相互独立的上游接口
+所有调用提交到进程内共享的有界线程池；每个调用的超时从它开始执行时计算，在线程池中排队的时间
+不计入（排队超过超时时间仍未开始的调用也记为超时），因此线程池繁忙时调用不会仅因排队而超时。
+单个调用失败或超时只记录错误，其余调用的结果照常返回（部分结果）。超时的调用无法中断，
+会在线程池中继续运行直到返回，线程池大小限制了同时占用的线程数
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """共享的有界线程池（fork后的子进程重新创建）"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.COLLECTOR_MAX_WORKERS), thread_name_prefix="collector"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def fan_out(
+    calls: Dict[str, Callable[[], Any]],
+    timeout: float = None,
+    executor: ThreadPoolExecutor = None
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    并发执行多个独立调用
+
+    Args:
+        calls: 名称 -> 无参调用
+        timeout: 每个调用的超时时间（秒，从调用开始执行时计算；排队超过该时间仍未开始的调用同样超时），
+            默认 COLLECTOR_CALL_TIMEOUT；整体等待不超过超时时间的2倍
+        executor: 线程池，默认共享线程池
+
+    Returns:
+        (名称 -> 结果, 名称 -> 错误信息)，每个名称只出现在其中一个字典中
+    """
+    timeout = settings.COLLECTOR_CALL_TIMEOUT if timeout is None else timeout
+    pool = executor or get_executor()
+    submitted = time.monotonic()
+    started: Dict[str, float] = {}
+
+    def run(name: str, call: Callable[[], Any]) -> Any:
+        started[name] = time.monotonic()
+        return call()
+
+    futures: Dict[str, Future] = {name: pool.submit(run, name, call) for name, call in calls.items()}
+    timed_out: Dict[str, str] = {}
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        deadlines = {}
+        for name in list(pending):
+            if futures[name].done():
+                pending.discard(name)
+                continue
+            # 已开始的调用从开始时计时，未开始的从提交时计时
+            deadline = started.get(name, submitted) + timeout
+            if deadline <= now:
+                pending.discard(name)
+                timed_out[name] = "超时" if name in started else "排队超时"
+            else:
+                deadlines[name] = deadline
+        if not deadlines:
+            break
+        wait([futures[name] for name in deadlines], timeout=min(deadlines.values()) - now,
+             return_when=FIRST_COMPLETED)
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for name, future in futures.items():
+        if name in timed_out and not future.done():
+            future.cancel()
+            errors[name] = f"{timed_out[name]}（{timeout}秒）"
+            logger.warning(f"上游调用{timed_out[name]}: {name}")
+            continue
+        error = future.exception()
+        if error is not None:
+            errors[name] = str(error) or type(error).__name__
+            logger.warning(f"上游调用失败: {name}, 错误: {error}")
+        else:
+            results[name] = future.result()
+    return results, errors
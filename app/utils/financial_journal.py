@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+财务数据追加日志
+以JSONL追加写入财务记录，按 (company_code, report_date, data_type) 去重，定期压缩
+"""
+
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+from app.utils.atomic_io import file_lock
+from app.utils.frozen import freeze, FrozenList
+from app.utils.serializer import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_report_date(value: Any) -> str:
+    """报告期统一为 YYYY-MM-DD（支持YYYYMMDD、YYYY-MM-DD[ 时间]、YYYY/MM/DD及date/datetime），无法识别时原样返回字符串"""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    text = str(value).strip()
+    if len(text) == 8 and text.isdigit():
+        text = f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    try:
+        return datetime.strptime(text[:10].replace('/', '-'), '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return text
+
+
+class FinancialJournal:
+    """财务数据追加日志"""
+
+    def __init__(
+        self,
+        journal_path: str,
+        legacy_json_path: str = None,
+        compact_ratio: float = 2.0,
+        compact_min_lines: int = 1000
+    ):
+        """
+        Args:
+            journal_path: 日志文件路径（JSONL）
+            legacy_json_path: 旧版financial_data.json路径，存在时首次启动自动导入
+            compact_ratio: 日志行数超过有效记录数的倍数时触发压缩
+            compact_min_lines: 触发压缩的最小日志行数
+        """
+        self.journal_path = journal_path
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+        self._lock = threading.RLock()
+        self._reset_state()
+
+        if legacy_json_path and not os.path.exists(journal_path):
+            self._migrate_legacy_json(legacy_json_path)
+
+    def _reset_state(self):
+        """清空内存索引"""
+        # {公司代码: {去重键: 记录}}，dict保持首次写入顺序，覆盖时位置不变
+        self._records: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self._views: Dict[str, FrozenList] = {}
+        self._offset = 0
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._lines = 0
+
+    @staticmethod
+    def _record_key(record: Dict[str, Any], line_no: int) -> Any:
+        """计算去重键（报告期统一格式，"20231231"与"2023-12-31"视为同一报告期），缺少报告期的记录按行号保留"""
+        report_date = record.get('report_date')
+        if not report_date:
+            return ('#', line_no)
+        return (normalize_report_date(report_date), record.get('data_type'))
+
+    def _apply(self, entry: Dict[str, Any]):
+        """将一条日志应用到内存索引"""
+        self._lines += 1
+        company_id = entry.get('company_id')
+        if company_id is None:
+            return
+
+        op = entry.get('op', 'upsert')
+        if op == 'upsert':
+            record = entry.get('record') or {}
+            self._records.setdefault(company_id, {})[self._record_key(record, self._lines)] = freeze(record)
+        elif op == 'delete':
+            data_id = entry.get('id')
+            if data_id is None:
+                self._records.pop(company_id, None)
+            elif company_id in self._records:
+                self._records[company_id] = {
+                    key: record for key, record in self._records[company_id].items()
+                    if record.get('id') != data_id
+                }
+        self._views.pop(company_id, None)
+
+    def _refresh(self):
+        """读取其他写入者追加的日志（仅读取新增部分）"""
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self._reset_state()
+            return
+
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            # 文件被压缩替换或截断，全量重建
+            self._reset_state()
+            self._file_id = file_id
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(stat.st_size - self._offset)
+
+        # 只消费完整的行，未写完的尾行留到下次读取
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply(json_loads(line))
+            except ValueError as e:
+                logger.warning(f"跳过损坏的财务日志行: {e}")
+        self._offset += end
+
+    def _append(self, entries: List[Dict[str, Any]]) -> bool:
+        """追加写入日志（持有跨进程文件锁，避免与其他进程的追加或压缩交错）"""
+        payload = b''.join(
+            json_dumps(entry) + b'\n'
+            for entry in entries
+        )
+        with file_lock(self.journal_path):
+            with open(self.journal_path, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+            self._maybe_compact()
+        return True
+
+    def _migrate_legacy_json(self, legacy_json_path: str):
+        """导入旧版financial_data.json（重复记录按去重键合并）"""
+        if not os.path.exists(legacy_json_path):
+            return
+        try:
+            with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                legacy_data = json.load(f)
+
+            entries = [
+                {'op': 'upsert', 'company_id': company_id, 'record': record}
+                for company_id, records in legacy_data.items()
+                for record in records
+            ]
+            with self._lock:
+                self._append(entries)
+                self.compact()
+            os.replace(legacy_json_path, legacy_json_path + ".migrated")
+            logger.info(f"已迁移旧版财务数据文件: {legacy_json_path}，共 {len(entries)} 条")
+        except Exception as e:
+            logger.error(f"迁移旧版财务数据文件失败: {e}")
+
+    def upsert(self, company_id: str, record: Dict[str, Any]) -> bool:
+        """写入单条财务记录，相同报告期和数据类型的记录会被覆盖"""
+        try:
+            with self._lock:
+                return self._append([{'op': 'upsert', 'company_id': company_id, 'record': record}])
+        except Exception as e:
+            logger.error(f"写入财务日志失败 {company_id}: {e}")
+            return False
+
+    def upsert_many(self, items: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """批量写入财务记录（一次追加写入），items为 (公司代码, 记录) 列表"""
+        if not items:
+            return True
+        try:
+            with self._lock:
+                return self._append([
+                    {'op': 'upsert', 'company_id': company_id, 'record': record}
+                    for company_id, record in items
+                ])
+        except Exception as e:
+            logger.error(f"批量写入财务日志失败: {e}")
+            return False
+
+    def delete(self, company_id: str, data_id: str = None) -> bool:
+        """删除公司的指定记录或全部记录"""
+        try:
+            with self._lock:
+                self._refresh()
+                if company_id not in self._records:
+                    return False
+                entry = {'op': 'delete', 'company_id': company_id}
+                if data_id:
+                    entry['id'] = data_id
+                return self._append([entry])
+        except Exception as e:
+            logger.error(f"删除财务记录失败 {company_id}: {e}")
+            return False
+
+    def get(self, company_id: str) -> List[Dict[str, Any]]:
+        """获取公司财务记录（只读视图）"""
+        with self._lock:
+            self._refresh()
+            view = self._views.get(company_id)
+            if view is None:
+                view = freeze(list(self._records.get(company_id, {}).values()))
+                self._views[company_id] = view
+            return view
+
+    def get_all(self) -> Dict[str, List[Dict[str, Any]]]:
+        """获取全部公司的财务记录"""
+        with self._lock:
+            self._refresh()
+            return {company_id: self.get(company_id) for company_id in self._records}
+
+    def count(self) -> int:
+        """有效财务记录总数"""
+        with self._lock:
+            self._refresh()
+            return sum(len(records) for records in self._records.values())
+
+    def _maybe_compact(self):
+        """日志冗余过多时压缩"""
+        live = sum(len(records) for records in self._records.values())
+        if self._lines >= self.compact_min_lines and self._lines > live * self.compact_ratio:
+            self.compact()
+
+    def compact(self) -> bool:
+        """压缩日志：只保留每个去重键的最新记录"""
+        with self._lock, file_lock(self.journal_path):
+            self._refresh()
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                for company_id, records in self._records.items():
+                    for record in records.values():
+                        entry = {'op': 'upsert', 'company_id': company_id, 'record': record}
+                        f.write(json_dumps(entry) + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+            stat = os.stat(self.journal_path)
+            self._file_id = (stat.st_dev, stat.st_ino)
+            self._offset = stat.st_size
+            self._lines = sum(len(records) for records in self._records.values())
+            logger.info(f"财务日志已压缩: {self.journal_path}，有效记录 {self._lines} 条")
+            return True
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+DataFrame列式规范化
+将AKShare等数据源返回的中文列名一次性映射为标准字段名，并按列转换类型（数值、日期、字符串），
+再整体输出为记录列表，避免逐行iterrows与逐个单元格float()转换
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 记录中日期字段的输出格式
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class FrameSchema:
+    """原始列名到标准字段的映射及各字段类型"""
+
+    def __init__(
+        self,
+        columns: Dict[str, str],
+        numeric: Iterable[str] = (),
+        dates: Iterable[str] = (),
+        strings: Iterable[str] = ()
+    ):
+        """
+        Args:
+            columns: 原始列名 -> 标准字段名，输出字段按此顺序排列
+            numeric: 转换为float的字段（无法解析的值为NaN）
+            dates: 转换为日期的字段（无法解析的值为NaT，记录中输出为YYYY-MM-DD字符串）
+            strings: 转换为去除首尾空白的字符串的字段
+        """
+        self.columns = dict(columns)
+        self.fields = list(dict.fromkeys(self.columns.values()))
+        self.numeric = tuple(numeric)
+        self.dates = tuple(dates)
+        self.strings = tuple(strings)
+
+    def frame(self, df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """
+        规范化DataFrame：一次重命名并只保留映射的字段，缺失的字段补为空值，再按列转换类型
+
+        Returns:
+            列为标准字段的新DataFrame（不修改原数据）
+        """
+        if df is None:
+            df = pd.DataFrame()
+        present = {source: field for source, field in self.columns.items() if source in df.columns}
+        frame = df[list(present)].rename(columns=present)
+        frame = frame.loc[:, ~frame.columns.duplicated()].reindex(columns=self.fields)
+
+        for field in self.numeric:
+            frame[field] = pd.to_numeric(frame[field], errors='coerce').astype('float64')
+        for field in self.dates:
+            frame[field] = pd.to_datetime(frame[field], errors='coerce')
+        for field in self.strings:
+            values = frame[field]
+            frame[field] = values.astype(str).str.strip().where(values.notna(), None)
+        return frame
+
+    def records(self, df: Optional[pd.DataFrame], **constants: Any) -> List[Dict[str, Any]]:
+        """规范化后输出为记录列表（NaN/NaT转换为None），constants为每条记录附加的固定字段"""
+        return frame_records(self.frame(df), self.dates, **constants)
+
+
+def frame_records(frame: pd.DataFrame, dates: Iterable[str] = (), **constants: Any) -> List[Dict[str, Any]]:
+    """
+    将已规范化的DataFrame按列输出为记录列表
+
+    Args:
+        frame: 规范化后的数据
+        dates: 需格式化为YYYY-MM-DD字符串的日期字段
+        constants: 每条记录附加的固定字段
+    """
+    if frame is None or frame.empty:
+        return []
+    columns = {}
+    for field in frame.columns:
+        values = frame[field]
+        if field in dates:
+            values = values.dt.strftime(DATE_FORMAT)
+        columns[field] = values.astype(object).where(values.notna(), None).tolist()
+    for field, value in constants.items():
+        columns[field] = [value] * len(frame)
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def frame_to_dict(df: Optional[pd.DataFrame], key: str, value: str) -> Dict[Any, Any]:
+    """将键值两列的DataFrame（如个股/债券信息的item、value列）转换为字典，缺少任一列时返回空字典"""
+    if df is None or df.empty or key not in df.columns or value not in df.columns:
+        return {}
+    values = df[value]
+    return dict(zip(df[key].tolist(), values.astype(object).where(values.notna(), None).tolist()))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+数据新鲜度
+按数据类别（行情、行业公司列表、行业数据、财务、历史行情、AI分析）配置新鲜期，
+以数据持久化的写入时间判断是否过期，不依赖进程内状态，服务重启或新建服务实例后缓存依然有效。
+开启 SESSION_AWARE_TTL 时行情类数据按交易时段计算过期时间：交易时段内按新鲜期过期，休市期间获取的数据有效至下一次开盘；
+历史行情在下一次收盘后过期
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Union
+from app.core.config import settings
+from app.utils.trading_calendar import trading_calendar
+
+# 数据类别 -> 新鲜期配置项
+DATA_CLASSES = {
+    "quote": "TTL_QUOTES",
+    "industry_list": "TTL_INDUSTRY_LISTS",
+    "industry": "TTL_INDUSTRY_DATA",
+    "financial": "TTL_FINANCIALS",
+    "history": "TTL_HISTORY",
+    "analysis": "TTL_ANALYSES",
+}
+
+# 随交易时段变化的数据类别
+QUOTE_CLASSES = ("quote", "industry_list")
+BAR_CLASSES = ("history",)
+
+Timestamp = Union[str, float, datetime, None]
+
+
+def ttl(data_class: str) -> timedelta:
+    """数据类别的新鲜期"""
+    if data_class not in DATA_CLASSES:
+        raise ValueError(f"未知的数据类别: {data_class}")
+    return timedelta(seconds=getattr(settings, DATA_CLASSES[data_class]))
+
+
+def parse_time(updated_at: Timestamp) -> Optional[datetime]:
+    """解析写入时间（ISO时间字符串、时间戳或datetime）为本地时间，无法解析时返回None"""
+    if not updated_at:
+        return None
+    try:
+        if isinstance(updated_at, (int, float)):
+            return datetime.fromtimestamp(updated_at)
+        if not isinstance(updated_at, datetime):
+            updated_at = datetime.fromisoformat(str(updated_at))
+        if updated_at.tzinfo is not None:
+            updated_at = updated_at.astimezone().replace(tzinfo=None)
+        return updated_at
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def data_age(updated_at: Timestamp) -> Optional[timedelta]:
+    """数据年龄，时间无法解析时返回None"""
+    updated = parse_time(updated_at)
+    return datetime.now() - updated if updated is not None else None
+
+
+def expires_at(updated_at: Timestamp, data_class: str) -> Optional[datetime]:
+    """数据的过期时间，时间无法解析时返回None"""
+    updated = parse_time(updated_at)
+    if updated is None:
+        return None
+    data_ttl = ttl(data_class)
+    if settings.SESSION_AWARE_TTL:
+        if data_class in QUOTE_CLASSES:
+            return trading_calendar.quote_expiry(updated, data_ttl)
+        if data_class in BAR_CLASSES:
+            return trading_calendar.bar_expiry(updated, data_ttl)
+    return updated + data_ttl
+
+
+def is_fresh(updated_at: Timestamp, data_class: str, grace: timedelta = None) -> bool:
+    """
+    数据是否仍在新鲜期内（写入时间未知时视为过期）
+
+    Args:
+        grace: 过期后仍视为可用的时长
+    """
+    expiry = expires_at(updated_at, data_class)
+    if expiry is None:
+        return False
+    return datetime.now() < expiry + (grace or timedelta(0))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+只读数据视图
+用于在多个请求之间安全共享已解码的JSON对象
+"""
+
+from typing import Any
+
+
+def _readonly(*args, **kwargs):
+    raise TypeError("只读数据视图不可修改，请先复制（dict(...) / list(...)）")
+
+
+class FrozenDict(dict):
+    """只读字典，仍然是dict子类，可直接用于序列化和Pydantic模型"""
+
+    __slots__ = ()
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class FrozenList(list):
+    """只读列表"""
+
+    __slots__ = ()
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __iadd__ = _readonly
+    __imul__ = _readonly
+    append = _readonly
+    clear = _readonly
+    extend = _readonly
+    insert = _readonly
+    pop = _readonly
+    remove = _readonly
+    reverse = _readonly
+    sort = _readonly
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def freeze(obj: Any) -> Any:
+    """递归转换为只读视图，已冻结的对象直接复用"""
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        frozen = FrozenDict()
+        dict.update(frozen, ((key, freeze(value)) for key, value in obj.items()))
+        return frozen
+    if isinstance(obj, list):
+        frozen = FrozenList()
+        list.extend(frozen, (freeze(value) for value in obj))
+        return frozen
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """递归转换为可修改的普通对象"""
+    if isinstance(obj, dict):
+        return {key: thaw(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(value) for value in obj]
+    return obj
@@ -1,9 +1,10 @@
 import os
-import json
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 import pandas as pd
+from app.utils.atomic_io import atomic_write_data
+from app.utils.serializer import serializer
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +15,10 @@ def ensure_directory(path: str) -> None:
 
 
 def save_json(data: Dict[str, Any], filepath: str) -> bool:
-    """保存JSON数据"""
+    """保存JSON数据（按配置的编码与压缩方式写入）"""
     try:
         ensure_directory(os.path.dirname(filepath))
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        atomic_write_data(filepath, data)
         return True
     except Exception as e:
         logger.error(f"保存JSON文件失败: {e}")
@@ -26,11 +26,10 @@ def save_json(data: Dict[str, Any], filepath: str) -> bool:
 
 
 def load_json(filepath: str) -> Optional[Dict[str, Any]]:
-    """加载JSON数据"""
+    """加载JSON数据（兼容旧版JSON及压缩格式）"""
     try:
         if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return serializer.load_file(filepath)
     except Exception as e:
         logger.error(f"加载JSON文件失败: {e}")
     return None
@@ -58,6 +57,17 @@ def load_csv(filepath: str) -> Optional[pd.DataFrame]:
     return None
 
 
+def to_records(data: Union[List[Dict[str, Any]], pd.DataFrame]) -> List[Dict[str, Any]]:
+    """将记录列表或DataFrame统一转换为字典列表（NaN转换为None）"""
+    if data is None:
+        return []
+    if isinstance(data, pd.DataFrame):
+        if data.empty:
+            return []
+        return data.astype(object).where(data.notna(), None).to_dict('records')
+    return list(data)
+
+
 def format_number(value: float, decimal_places: int = 2) -> str:
     """格式化数字"""
     if value is None:
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+申万行业分类索引
+个股 -> 申万一、二、三级行业的映射，由申万个股行业分类（ak.stock_industry_clf_hist_sw）与
+申万行业类目名称（ak.stock_industry_category_cninfo）构建，缓存在 data/cache.db 中并每天刷新。
+查询从不同步访问上游：没有缓存时启动后台加载（应用启动时预热），加载完成前查询返回空结果；
+过期后继续使用旧索引并在后台刷新。查询个股行业时不再需要下载整张板块成分表逐行查找
+"""
+
+import re
+import threading
+import time as _time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+import logging
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 行业级别
+LEVELS = (1, 2, 3)
+
+# 获取失败后的重试间隔（秒）：已有索引时沿用旧索引，较晚重试；尚无索引时较快重试
+RETRY_INTERVAL = 3600
+EMPTY_RETRY_INTERVAL = 60
+
+
+def _digits(values: pd.Series) -> pd.Series:
+    """行业代码只保留数字（巨潮类目编码带S前缀）"""
+    return values.astype(str).str.replace(r"\D", "", regex=True)
+
+
+def build_index(history: pd.DataFrame, categories: pd.DataFrame) -> Dict[str, List[str]]:
+    """
+    构建索引的列式数据
+
+    Args:
+        history: 个股行业分类变动历史（symbol、start_date、industry_code列），每只股票取最新一次分类
+        categories: 申万行业类目（类目编码、类目名称列，可含终止日期），代码按6位补零对齐三级行业代码
+
+    Returns:
+        {"symbols": [...], "codes": [...], "level1": [...], "level2": [...], "level3": [...]}
+    """
+    latest = history.dropna(subset=["symbol", "industry_code"])
+    if "start_date" in latest.columns:
+        latest = latest.sort_values("start_date", kind="stable")
+    latest = latest.assign(
+        symbol=latest["symbol"].astype(str).str.strip().str.zfill(6),
+        industry_code=_digits(latest["industry_code"]).str.zfill(6)
+    ).drop_duplicates("symbol", keep="last").sort_values("symbol")
+
+    names = categories
+    if "终止日期" in names.columns:
+        # 同一代码有多个类目时以未终止的为准
+        names = names.assign(_active=names["终止日期"].isna()).sort_values("_active", kind="stable")
+    names = pd.Series(
+        names["类目名称"].astype(str).to_numpy(),
+        index=_digits(names["类目编码"]).str.ljust(6, "0")
+    )
+    names = names[~names.index.duplicated(keep="last")]
+
+    codes = latest["industry_code"]
+    result = {"symbols": latest["symbol"].tolist(), "codes": codes.tolist()}
+    for level, prefix in zip(LEVELS, (2, 4, 6)):
+        level_codes = codes.str[:prefix].str.ljust(6, "0")
+        # 缺少名称的类目以代码代替
+        result[f"level{level}"] = level_codes.map(names).fillna(level_codes).tolist()
+    return result
+
+
+def _fetch_index() -> Dict[str, List[str]]:
+    """从AKShare获取申万行业分类"""
+    from app.utils.rate_limiter import akshare_api as ak
+    history = ak.stock_industry_clf_hist_sw()
+    categories = ak.stock_industry_category_cninfo(symbol="申银万国行业分类标准")
+    return build_index(history, categories)
+
+
+class _IndexData(NamedTuple):
+    """一份索引（整体替换，读取者无需加锁）"""
+
+    columns: Dict[str, List[str]]
+    position: Dict[str, int]  # 股票代码 -> 行号
+    members: Dict[str, np.ndarray]  # 行业名称（任一级别） -> 股票代码
+
+
+class IndustryIndex:
+    """个股申万行业索引"""
+
+    def __init__(
+        self,
+        fetcher: Callable[[], Dict[str, List[str]]] = None,
+        store=None,
+        cache_key: str = "shenwan_industry_index",
+        refresh_hours: int = None
+    ):
+        """
+        Args:
+            fetcher: 获取索引列式数据的函数，默认从AKShare获取
+            store: 缓存索引的存储，需提供 get_cache_data/save_cache_data，默认全局data_manager
+            cache_key: 缓存键
+            refresh_hours: 索引的刷新间隔（小时）
+        """
+        self.fetcher = fetcher or _fetch_index
+        self._store = store
+        self.cache_key = cache_key
+        self.refresh_hours = settings.INDUSTRY_INDEX_REFRESH_HOURS if refresh_hours is None else refresh_hours
+        self._data: Optional[_IndexData] = None
+        self._fetched_at = 0.0
+        self._source = "empty"
+        self._retry_at = 0.0
+        self._cache_checked = False
+        self._refreshing = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            from app.utils.data_manager import data_manager
+            self._store = data_manager
+        return self._store
+
+    def _use(self, columns: Dict[str, List[str]], fetched_at: float, source: str):
+        """切换到新索引"""
+        symbols = pd.Series(columns["symbols"], dtype=object)
+        members: Dict[str, Set[str]] = {}
+        for level in LEVELS:
+            for name, group in symbols.groupby(np.asarray(columns[f"level{level}"], dtype=object)):
+                members.setdefault(name, set()).update(group)
+        self._data = _IndexData(
+            columns,
+            {symbol: i for i, symbol in enumerate(columns["symbols"])},
+            {name: np.array(sorted(values), dtype=object) for name, values in members.items()}
+        )
+        self._fetched_at = fetched_at
+        self._source = source
+
+    def _expired(self) -> bool:
+        return _time.time() - self._fetched_at >= self.refresh_hours * 3600
+
+    def _load(self) -> bool:
+        """从上游获取并持久化索引，返回是否成功"""
+        try:
+            columns = self.fetcher()
+            if not columns or not columns.get("symbols"):
+                raise ValueError("行业分类为空")
+            fetched_at = _time.time()
+            self._use(columns, fetched_at, "akshare")
+            self.store.save_cache_data(self.cache_key, dict(columns, fetched_at=fetched_at))
+            logger.info(f"申万行业索引已更新: {len(columns['symbols'])} 只股票")
+            return True
+        except Exception as e:
+            self._retry_at = _time.time() + (RETRY_INTERVAL if self._data is not None else EMPTY_RETRY_INTERVAL)
+            fallback = "沿用旧索引" if self._data is not None else "行业查询暂不可用"
+            logger.warning(f"获取申万行业分类失败，{fallback}: {e}")
+            return False
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._idle.clear()
+
+        def run():
+            try:
+                self._load()
+            finally:
+                self._refreshing = False
+                self._idle.set()
+
+        threading.Thread(target=run, name="industry-index-refresh", daemon=True).start()
+
+    def _load_cached(self):
+        """读取持久化的索引（每个实例只读取一次）"""
+        with self._lock:
+            if self._data is not None or self._cache_checked:
+                return
+            self._cache_checked = True
+            try:
+                cached = self.store.get_cache_data(self.cache_key)
+                if cached and cached.get("symbols"):
+                    self._use(cached, cached.get("fetched_at", 0.0), "cache")
+            except Exception as e:
+                logger.warning(f"读取申万行业索引缓存失败: {e}")
+
+    def _ensure_loaded(self):
+        """加载索引：优先使用缓存；没有索引或已过期时在后台获取，不阻塞查询"""
+        if self._data is not None and not self._expired():
+            return
+        if self._data is None:
+            self._load_cached()
+        if _time.time() < self._retry_at:
+            return
+        if self._data is None or self._expired():
+            self._refresh_in_background()
+
+    def warm(self, wait: bool = False, timeout: float = None) -> bool:
+        """
+        预热索引（应用启动时调用）
+
+        Args:
+            wait: 是否等待正在进行的后台加载完成
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            索引是否可用
+        """
+        self._ensure_loaded()
+        if wait:
+            self._idle.wait(timeout)
+        return self._data is not None
+
+    def refresh(self) -> bool:
+        """立即从上游重新获取索引"""
+        with self._lock:
+            return self._load()
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """个股的申万行业分类，未收录时返回None"""
+        self._ensure_loaded()
+        data = self._data
+        i = data.position.get(str(symbol).strip()) if data is not None else None
+        if i is None:
+            return None
+        columns = data.columns
+        return {
+            "symbol": columns["symbols"][i],
+            "code": columns["codes"][i],
+            **{f"level{level}": columns[f"level{level}"][i] for level in LEVELS}
+        }
+
+    def industry(self, symbol: str, level: int = 1) -> str:
+        """个股指定级别的申万行业名称，未收录时返回空字符串"""
+        if level not in LEVELS:
+            raise ValueError(f"无效的行业级别: {level}")
+        classification = self.get(symbol)
+        return classification[f"level{level}"] if classification else ""
+
+    def symbols(self, industry: str) -> np.ndarray:
+        """属于某个申万行业（任一级别）的股票代码"""
+        self._ensure_loaded()
+        data = self._data
+        members = data.members.get(industry) if data is not None else None
+        return members if members is not None else np.array([], dtype=object)
+
+    def matching(self, pattern: re.Pattern) -> np.ndarray:
+        """行业名称（任一级别）匹配正则的全部股票代码"""
+        self._ensure_loaded()
+        data = self._data
+        members = data.members if data is not None else {}
+        groups = [codes for name, codes in members.items() if pattern.search(name)]
+        if not groups:
+            return np.array([], dtype=object)
+        return np.unique(np.concatenate(groups))
+
+    def industries(self, level: int = 1) -> Dict[str, int]:
+        """指定级别的申万行业及成分股数量"""
+        if level not in LEVELS:
+            raise ValueError(f"无效的行业级别: {level}")
+        self._ensure_loaded()
+        data = self._data
+        names = data.columns[f"level{level}"] if data is not None else []
+        return pd.Series(names, dtype=object).value_counts().sort_index().to_dict() if names else {}
+
+    def info(self) -> Dict[str, Any]:
+        """索引状态"""
+        return {
+            "source": self._source,
+            "symbols": len(self._data.position) if self._data is not None else 0,
+            "fetched_at": datetime.fromtimestamp(self._fetched_at).isoformat() if self._fetched_at else None,
+            "expired": self._expired(),
+            "loading": self._refreshing,
+        }
+
+
+# 全局申万行业索引
+industry_index = IndustryIndex()
@@ -1,10 +1,12 @@
-import json
 import csv
 import os
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
 import logging
 from app.core.config_simple_local import local_settings
+from app.utils.atomic_io import atomic_write_data, file_lock
+from app.utils.helpers import to_records
+from app.utils.serializer import serializer
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +18,10 @@ class LocalStorage:
         self.settings = local_settings
     
     def save_json(self, data: Dict[str, Any], filepath: str) -> bool:
-        """保存JSON数据"""
+        """保存JSON数据（按配置的编码与压缩方式写入）"""
         try:
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with file_lock(filepath):
+                atomic_write_data(filepath, data)
             logger.info(f"数据已保存到: {filepath}")
             return True
         except Exception as e:
@@ -28,11 +29,10 @@ class LocalStorage:
             return False
     
     def load_json(self, filepath: str) -> Optional[Dict[str, Any]]:
-        """加载JSON数据"""
+        """加载JSON数据（兼容旧版JSON及压缩格式）"""
         try:
             if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return serializer.load_file(filepath)
             return {}
         except Exception as e:
             logger.error(f"加载JSON文件失败: {e}")
@@ -74,6 +74,19 @@ class LocalStorage:
         companies[company_id] = company_data
         return self.save_json(companies, self.settings.COMPANIES_FILE)
     
+    def save_companies_bulk(self, companies_data: Union[List[Dict[str, Any]], Any]) -> bool:
+        """批量保存公司数据（一次读写完成），支持记录列表或DataFrame"""
+        records = to_records(companies_data)
+        if not records:
+            return True
+        
+        companies = self.load_json(self.settings.COMPANIES_FILE)
+        for company_data in records:
+            company_id = company_data.get('code', company_data.get('id'))
+            if company_id:
+                companies[company_id] = company_data
+        return self.save_json(companies, self.settings.COMPANIES_FILE)
+    
     def get_company(self, company_id: str) -> Optional[Dict[str, Any]]:
         """获取公司数据"""
         companies = self.load_json(self.settings.COMPANIES_FILE)
@@ -95,6 +108,50 @@ class LocalStorage:
         
         return self.save_json(all_data, self.settings.FINANCIAL_DATA_FILE)
     
+    def save_financial_data_bulk(
+        self,
+        financial_data: Union[List[Dict[str, Any]], Any],
+        company_id: str = None
+    ) -> bool:
+        """
+        批量保存财务数据（一次读写完成）
+        
+        相同公司、报告期和数据类型的记录会被覆盖，其余追加。
+        company_id为空时从每条记录的company_id（或code）字段读取。
+        """
+        records = to_records(financial_data)
+        if not records:
+            return True
+        
+        all_data = self.load_json(self.settings.FINANCIAL_DATA_FILE)
+        updated_at = datetime.now().isoformat()
+        # {公司代码: {(报告期, 数据类型): 列表下标}}，按需建立
+        positions = {}
+        for record in records:
+            record = dict(record)
+            record_company = company_id or record.pop('company_id', None) or record.get('code')
+            if not record_company:
+                logger.warning(f"财务记录缺少公司代码，已跳过: {record}")
+                continue
+            record['updated_at'] = updated_at
+            
+            company_records = all_data.setdefault(record_company, [])
+            if record_company not in positions:
+                positions[record_company] = {
+                    (existing.get('report_date'), existing.get('data_type')): i
+                    for i, existing in enumerate(company_records)
+                    if existing.get('report_date')
+                }
+            key = (record.get('report_date'), record.get('data_type'))
+            if key[0] and key in positions[record_company]:
+                company_records[positions[record_company][key]] = record
+            else:
+                if key[0]:
+                    positions[record_company][key] = len(company_records)
+                company_records.append(record)
+        
+        return self.save_json(all_data, self.settings.FINANCIAL_DATA_FILE)
+    
     def get_financial_data(self, company_id: str) -> List[Dict[str, Any]]:
         """获取公司财务数据"""
         all_data = self.load_json(self.settings.FINANCIAL_DATA_FILE)
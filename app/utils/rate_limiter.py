@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+按主机限流与重试
+每个上游主机一个令牌桶（进程内共享，所有线程的请求共同受限），请求先取令牌再发出，不再每次请求后固定休眠；
+可重试的失败（连接错误、超时、HTTP 429/5xx）按带随机抖动的指数退避重试，重试次数同时受单次请求的
+最大次数和主机的重试预算限制（重试数不超过请求数的一定比例），上游持续出错时不会因重试放大流量。
+AKShare接口通过 akshare_api 代理调用，按接口对应的数据源主机限流；yfinance调用用 rate_limiter.call 包装
+"""
+
+import importlib
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+
+import requests
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """令牌桶：平均每秒rate个请求，最多突发burst个"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数（令牌可以透支，等待的请求按预约顺序放行）"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self) -> float:
+        """取得一个令牌（必要时等待），返回等待的秒数"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RetryBudget:
+    """重试预算：每个请求存入ratio次重试额度，每次重试消耗一次，额度上限（也是初始额度）为reserve"""
+
+    def __init__(self, ratio: float, reserve: int):
+        self.ratio = ratio
+        self.reserve = max(0, reserve)
+        self._balance = float(self.reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self.reserve, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """消耗一次重试额度，额度不足时返回False"""
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, Optional[int]]]:
+    """解析 "主机=每秒请求数[:突发数],..." 格式的限流配置"""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        host, value = item.split("=", 1)
+        rate, _, burst = value.partition(":")
+        try:
+            limits[host.strip().lower()] = (float(rate), int(burst) if burst.strip() else None)
+        except ValueError:
+            logger.warning(f"忽略无效的限流配置: {item}")
+    return limits
+
+
+def host_of(url: str) -> str:
+    """URL的主机名"""
+    return (urlsplit(url).hostname or url).lower()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """是否为可重试的失败：连接错误、超时、HTTP 429/5xx或数据源的限流错误（如yfinance的YFRateLimitError）"""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is not None and response.status_code in RETRY_STATUS
+    if "RateLimit" in type(error).__name__:
+        return True
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+
+
+def _retry_after(error: BaseException) -> float:
+    """HTTP 429/503响应的Retry-After秒数"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class _HostState:
+    __slots__ = ("bucket", "budget", "stats", "lock")
+
+    def __init__(self, bucket: TokenBucket, budget: RetryBudget):
+        self.bucket = bucket
+        self.budget = budget
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "budget_exhausted": 0, "waited": 0.0}
+        # 同一主机的调用分布在多个线程，计数需加锁
+        self.lock = threading.Lock()
+
+    def count(self, stat: str, amount: float = 1):
+        with self.lock:
+            self.stats[stat] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.stats)
+
+
+class RateLimiter:
+    """按主机的限流与重试"""
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: int = None,
+        limits: Dict[str, Tuple[float, Optional[int]]] = None,
+        max_retries: int = None,
+        backoff_base: float = None,
+        backoff_max: float = None,
+        budget_ratio: float = None,
+        budget_reserve: int = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            rate: 未单独配置的主机每秒请求数（0表示不限流）
+            burst: 未单独配置的主机最多突发的请求数
+            limits: 主机（或域名后缀） -> (每秒请求数, 突发数)，默认取 RATE_LIMITS
+            max_retries: 单次调用的最大重试次数
+            backoff_base: 退避基数（秒），第n次重试前等待 [0.5, 1) × base × 2^(n-1) 秒
+            backoff_max: 单次退避的最长等待（秒）
+            budget_ratio: 每个请求存入的重试额度（重试数约为请求数的该比例）
+            budget_reserve: 重试额度上限（突发失败时可立即使用的重试次数）
+            sleep: 退避等待函数
+        """
+        self.rate = settings.RATE_LIMIT_RPS if rate is None else rate
+        self.burst = settings.RATE_LIMIT_BURST if burst is None else burst
+        self.limits = parse_limits(settings.RATE_LIMITS) if limits is None else limits
+        self.max_retries = settings.REQUEST_RETRY_COUNT if max_retries is None else max_retries
+        self.backoff_base = settings.RETRY_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.RETRY_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.budget_ratio = settings.RETRY_BUDGET_RATIO if budget_ratio is None else budget_ratio
+        self.budget_reserve = settings.RETRY_BUDGET_RESERVE if budget_reserve is None else budget_reserve
+        self._sleep = sleep
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, host: str) -> str:
+        """限流键：匹配到的配置（主机或域名后缀，最长优先），否则为主机本身"""
+        host = host.lower()
+        matched = [name for name in self.limits if host == name or host.endswith("." + name)]
+        return max(matched, key=len) if matched else host
+
+    def _state(self, host: str) -> _HostState:
+        key = self._key(host)
+        state = self._hosts.get(key)
+        if state is None:
+            with self._lock:
+                state = self._hosts.get(key)
+                if state is None:
+                    rate, burst = self.limits.get(key, (self.rate, self.burst))
+                    state = _HostState(
+                        TokenBucket(rate, burst or self.burst),
+                        RetryBudget(self.budget_ratio, self.budget_reserve)
+                    )
+                    self._hosts[key] = state
+        return state
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次重试前的等待秒数（指数退避，随机抖动避免多个请求同时重试）"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def call(self, host: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        限流调用func，可重试的失败按退避重试
+
+        Args:
+            host: 上游主机（或URL），同一主机的调用共享令牌桶与重试预算
+        """
+        state = self._state(host_of(host) if "/" in host else host)
+        state.budget.deposit()
+        attempt = 0
+        while True:
+            waited = state.bucket.acquire()
+            with state.lock:
+                state.stats["waited"] += waited
+                state.stats["requests"] += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                state.count("failures")
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                if not state.budget.withdraw():
+                    state.count("budget_exhausted")
+                    logger.warning(f"{host} 重试预算已用尽，不再重试: {e}")
+                    raise
+                attempt += 1
+                state.count("retries")
+                delay = max(self.backoff(attempt), min(_retry_after(e), self.backoff_max))
+                logger.info(f"{host} 请求失败，{delay:.2f}秒后第{attempt}次重试: {e}")
+                self._sleep(delay)
+
+    def wrap(self, host: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """返回限流调用func的函数"""
+        def limited(*args, **kwargs):
+            return self.call(host, func, *args, **kwargs)
+        limited.__name__ = getattr(func, "__name__", "limited")
+        limited.__doc__ = getattr(func, "__doc__", None)
+        return limited
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各主机的请求、重试、失败次数及限流等待时间"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        result = {}
+        for key, state in hosts.items():
+            stats = state.snapshot()
+            result[key] = dict(stats, waited=round(stats["waited"], 3), rate=state.bucket.rate)
+        return result
+
+
+# AKShare接口 -> 数据源主机（未列出的按接口名后缀推断）
+AKSHARE_HOSTS = {
+    "stock_zh_a_hist": "eastmoney.com",
+    "index_zh_a_hist": "eastmoney.com",
+    "fund_em_open_fund_info": "eastmoney.com",
+    "fund_em_fund_info": "eastmoney.com",
+    "stock_financial_abstract": "sina.com.cn",
+    "stock_sector_detail": "sina.com.cn",
+    "stock_sector_spot": "sina.com.cn",
+    "stock_zh_index_spot": "sina.com.cn",
+    "index_stock_cons": "sina.com.cn",
+    "bond_zh_hs_cov_daily": "sina.com.cn",
+    "bond_zh_cov_info": "eastmoney.com",
+    "news_economic": "akshare",
+    "stock_industry_clf_hist_sw": "swsresearch.com",
+}
+AKSHARE_HOST_SUFFIXES = (("_em", "eastmoney.com"), ("_sina", "sina.com.cn"), ("_cninfo", "cninfo.com.cn"))
+
+
+def akshare_host(name: str) -> str:
+    """AKShare接口对应的数据源主机"""
+    if name in AKSHARE_HOSTS:
+        return AKSHARE_HOSTS[name]
+    for suffix, host in AKSHARE_HOST_SUFFIXES:
+        if name.endswith(suffix):
+            return host
+    return "akshare"
+
+
+class RateLimitedModule:
+    """模块代理：首次使用时导入模块，可调用属性按主机限流调用"""
+
+    def __init__(self, module_name: str, host_for: Callable[[str], str], limiter: RateLimiter = None):
+        self._module_name = module_name
+        self._host_for = host_for
+        self._limiter = limiter
+        self._module = None
+        self._wrapped: Dict[str, Callable[..., Any]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        wrapped = self._wrapped.get(name)
+        if wrapped is not None:
+            return wrapped
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        value = getattr(self._module, name)
+        if not callable(value) or isinstance(value, type):
+            return value
+        wrapped = (self._limiter or rate_limiter).wrap(self._host_for(name), value)
+        self._wrapped[name] = wrapped
+        return wrapped
+
+
+# 全局限流器
+rate_limiter = RateLimiter()
+
+# 限流的AKShare接口（用法与akshare模块相同）
+akshare_api = RateLimitedModule("akshare", akshare_host)
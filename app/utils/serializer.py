@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+数据文件序列化
+可选编码（json / msgpack）与压缩（none / gzip / zstd），由配置 DATA_FORMAT、DATA_COMPRESSION 指定。
+读取时按文件头自动识别编码与压缩方式，旧版缩进JSON文件无需转换即可读取
+"""
+
+import gzip
+import json
+from typing import Any, Optional
+import logging
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "msgpack")
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# JSON文本的首个非空白字符（兼容带BOM的旧文件）
+_JSON_LEADS = set(b'{["-0123456789tfn')
+
+if orjson is not None:
+    # 日期时间交给default=str处理，与标准库输出保持一致
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def json_dumps(data: Any) -> bytes:
+    """编码为紧凑的UTF-8 JSON（安装了orjson时使用orjson）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # 超出64位的整数等orjson不支持的值，回退到标准库
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def json_loads(payload: Any) -> Any:
+    """解析JSON（安装了orjson时使用orjson）"""
+    if orjson is not None:
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity等标准库可解析的旧数据
+            pass
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = bytes(payload).decode('utf-8-sig')
+    return json.loads(payload)
+
+
+class Serializer:
+    """数据文件编解码器"""
+
+    def __init__(self, format: str = "json", compression: str = "none", level: Optional[int] = None):
+        """
+        Args:
+            format: 编码格式 json / msgpack，msgpack未安装时回退到json
+            compression: 压缩方式 none / gzip / zstd，zstandard未安装时回退到gzip
+            level: 压缩级别，默认 gzip 6、zstd 3
+        """
+        format = (format or "json").lower()
+        compression = (compression or "none").lower()
+        if format not in FORMATS:
+            raise ValueError(f"不支持的数据编码: {format}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+
+        if format == "msgpack" and msgpack is None:
+            logger.warning("未安装msgpack，数据文件改用JSON编码")
+            format = "json"
+        if compression == "zstd" and zstandard is None:
+            logger.warning("未安装zstandard，数据文件改用gzip压缩")
+            compression = "gzip"
+
+        self.format = format
+        self.compression = compression
+        self.level = level
+
+    def dumps(self, data: Any) -> bytes:
+        """编码并压缩"""
+        if self.format == "msgpack":
+            payload = msgpack.packb(data, default=str, use_bin_type=True)
+        else:
+            payload = json_dumps(data)
+
+        if self.compression == "gzip":
+            return gzip.compress(payload, compresslevel=self.level or 6, mtime=0)
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=self.level or 3).compress(payload)
+        return payload
+
+    @staticmethod
+    def loads(payload: bytes) -> Any:
+        """
+        解压并解码（与当前配置无关，按内容自动识别）
+
+        msgpack与JSON按首字节区分，要求顶层为字典、列表或字符串
+        """
+        payload = bytes(payload)
+        if payload[:2] == _GZIP_MAGIC:
+            payload = gzip.decompress(payload)
+        elif payload[:4] == _ZSTD_MAGIC:
+            if zstandard is None:
+                raise RuntimeError("数据为zstd压缩格式，请安装zstandard")
+            payload = zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+
+        head = payload[:64].lstrip(b"\xef\xbb\xbf \t\r\n")
+        if not head or head[0] in _JSON_LEADS:
+            return json_loads(payload)
+        if msgpack is None:
+            raise RuntimeError("数据为msgpack编码，请安装msgpack")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+    def load_file(self, filepath: str) -> Any:
+        """读取文件"""
+        with open(filepath, 'rb') as f:
+            return self.loads(f.read())
+
+    def __repr__(self) -> str:
+        return f"Serializer(format={self.format!r}, compression={self.compression!r})"
+
+
+def _default_serializer() -> Serializer:
+    try:
+        return Serializer(settings.DATA_FORMAT, settings.DATA_COMPRESSION)
+    except ValueError as e:
+        logger.warning(f"数据文件序列化配置无效，使用JSON: {e}")
+        return Serializer()
+
+
+# 全局序列化器
+serializer = _default_serializer()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+单飞调用（single-flight）
+同一个键同时只执行一次上游调用，并发的相同请求等待这次调用并共享其结果（或异常），
+避免缓存过期瞬间大量请求同时访问AKShare。
+有等待者时每个调用方得到结果的独立副本（深拷贝），调用方修改返回的字典/列表不会影响其他请求；
+只读的结果（如行情快照）可用 copy_result=False 直接共享
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # 按命名空间（键中第一个冒号之前的部分）统计，避免键数量无限增长
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _namespace(key: str) -> str:
+        return key.split(":", 1)[0]
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[..., Any],
+        *args,
+        timeout: float = None,
+        copy_result: bool = True,
+        **kwargs
+    ) -> Any:
+        """
+        执行fn；已有相同键的调用在进行中时，等待其完成并返回其结果
+
+        Args:
+            key: 调用键，建议形如 "命名空间:参数"
+            fn: 上游调用
+            timeout: 等待他人调用的最长秒数，超时抛出TimeoutError（不影响进行中的调用）
+            copy_result: 有等待者时各调用方得到结果的深拷贝；结果只读时可设为False直接共享
+        """
+        namespace = self._namespace(key)
+        with self._lock:
+            stats = self._stats.setdefault(namespace, {"calls": 0, "shared": 0, "max_waiters": 0})
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                stats["shared"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                stats["calls"] += 1
+                leader = True
+
+        if not leader:
+            if not call.event.wait(timeout):
+                # 超时的请求没有拿到共享结果，不计入等待者与共享统计
+                with self._lock:
+                    call.waiters -= 1
+                    stats["shared"] -= 1
+                raise TimeoutError(f"等待上游调用超时: {key}")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result) if copy_result else call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                stats["max_waiters"] = max(stats["max_waiters"], call.waiters)
+            if call.waiters:
+                logger.debug(f"合并并发调用 {key}: {call.waiters} 个请求共享结果")
+            call.event.set()
+        # 移出进行中的调用后等待者数量不再变化；有等待者时保留原结果供其复制
+        if call.waiters and copy_result:
+            return copy.deepcopy(call.result)
+        return call.result
+
+    def in_flight(self) -> Dict[str, int]:
+        """进行中的调用及其等待者数量"""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """各命名空间的实际调用次数、共享结果的请求数、单次调用共享结果的最大请求数（等待超时的不计）"""
+        with self._lock:
+            namespaces = {namespace: dict(stats) for namespace, stats in self._stats.items()}
+            in_flight = {key: call.waiters for key, call in self._calls.items()}
+        return {"namespaces": namespaces, "in_flight": in_flight}
+
+
+# 全局单飞调用（上游数据源）
+single_flight = SingleFlight()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+线程本地SQLite连接
+每个线程一个连接（SQLite连接不宜跨线程并发使用），线程结束时连接随线程本地数据释放而关闭，
+不会随线程池、后台线程的创建销毁不断累积文件句柄；close() 关闭所有线程的连接（进程退出前调用）
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Holder:
+    """线程本地的连接持有者，线程结束后被回收，触发关闭连接"""
+
+    __slots__ = ("conn", "pid", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.pid = os.getpid()
+
+
+def _close(conn: sqlite3.Connection, pid: int):
+    # fork得到的子进程不关闭父进程的连接（由父进程自己关闭）
+    if os.getpid() != pid:
+        return
+    try:
+        conn.close()
+    except Exception as e:
+        logger.debug(f"关闭SQLite连接失败: {e}")
+
+
+class ThreadLocalConnections:
+    """按线程分配、随线程回收的SQLite连接"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._finalizers: List[weakref.finalize] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            holder = _Holder(conn)
+            finalizer = weakref.finalize(holder, _close, conn, holder.pid)
+            finalizer.atexit = False
+            with self._lock:
+                # 顺带清理已随线程结束关闭的连接
+                self._finalizers = [item for item in self._finalizers if item.alive]
+                self._finalizers.append(finalizer)
+            self._local.holder = holder
+        return holder.conn
+
+    def open_count(self) -> int:
+        """当前未关闭的连接数"""
+        with self._lock:
+            return sum(1 for finalizer in self._finalizers if finalizer.alive)
+
+    def close(self):
+        """关闭所有线程的连接；之后的调用会按需重新连接"""
+        with self._lock:
+            finalizers, self._finalizers = self._finalizers, []
+        for finalizer in finalizers:
+            finalizer()
+        self._local = threading.local()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+A股交易日历与交易时段
+交易日来自AKShare（ak.tool_trade_date_hist_sina），缓存在 data/cache.db 中并定期在后台刷新
+（请求路径上不同步下载，应用启动时预热）；加载完成前、获取失败且无缓存时按工作日近似。
+交易时段划分为集合竞价、上午、午间休市、下午、收盘后及非交易日，用于按时段决定行情类数据的新鲜期
+与后台刷新频率：交易时段内按配置的TTL刷新，休市期间数据不再变化，有效至下一次开盘
+"""
+
+import threading
+import time as _time
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 交易所时区（北京时间，无夏令时）
+MARKET_TZ = timezone(timedelta(hours=8))
+
+# 交易时段
+PRE_OPEN = "pre_open"  # 开盘集合竞价
+MORNING = "morning"  # 上午连续竞价
+LUNCH = "lunch"  # 午间休市
+AFTERNOON = "afternoon"  # 下午连续竞价（含收盘集合竞价）
+CLOSED = "closed"  # 交易日的非交易时间
+HOLIDAY = "holiday"  # 非交易日
+
+# 行情会变化的时段
+ACTIVE_SESSIONS = (PRE_OPEN, MORNING, AFTERNOON)
+
+# (时段, 开始, 结束)
+SESSIONS = (
+    (PRE_OPEN, time(9, 15), time(9, 30)),
+    (MORNING, time(9, 30), time(11, 30)),
+    (LUNCH, time(11, 30), time(13, 0)),
+    (AFTERNOON, time(13, 0), time(15, 0)),
+)
+OPEN_TIME = time(9, 15)
+RESUME_TIME = time(13, 0)
+CLOSE_TIME = time(15, 0)
+
+# 获取交易日失败后的重试间隔（秒）
+RETRY_INTERVAL = 3600
+# 查找下一个交易日的最大天数
+MAX_LOOKAHEAD_DAYS = 366
+
+
+def _fetch_trade_dates() -> List[str]:
+    """从AKShare获取历史及当年的全部交易日"""
+    from app.utils.rate_limiter import akshare_api as ak
+    df = ak.tool_trade_date_hist_sina()
+    return [str(value)[:10] for value in df["trade_date"]]
+
+
+def _to_market(at: Optional[datetime]) -> datetime:
+    """转换为交易所时间（不带时区的时间按本地时间处理）"""
+    if at is None:
+        return datetime.now(MARKET_TZ)
+    return at.astimezone(MARKET_TZ)
+
+
+def _from_market(value: datetime, like: Optional[datetime]) -> datetime:
+    """按输入时间的形式返回：带时区的输入返回交易所时间，否则返回本地时间（不带时区）"""
+    if like is not None and like.tzinfo is not None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+class TradingCalendar:
+    """交易日历"""
+
+    def __init__(
+        self,
+        fetcher: Callable[[], List[str]] = None,
+        store=None,
+        cache_key: str = "trading_calendar",
+        refresh_days: int = None
+    ):
+        """
+        Args:
+            fetcher: 获取交易日列表（YYYY-MM-DD）的函数，默认 ak.tool_trade_date_hist_sina
+            store: 缓存交易日的存储，需提供 get_cache_data/save_cache_data，默认全局data_manager
+            cache_key: 缓存键
+            refresh_days: 交易日缓存的刷新间隔（天）
+        """
+        self.fetcher = fetcher or _fetch_trade_dates
+        self._store = store
+        self.cache_key = cache_key
+        self.refresh_days = settings.TRADING_CALENDAR_REFRESH_DAYS if refresh_days is None else refresh_days
+        self._dates: Optional[frozenset] = None
+        self._first: Optional[date] = None
+        self._last: Optional[date] = None
+        self._fetched_at = 0.0
+        self._source = "weekdays"
+        self._retry_at = 0.0
+        self._cache_checked = False
+        self._refreshing = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            from app.utils.data_manager import data_manager
+            self._store = data_manager
+        return self._store
+
+    def _use(self, dates: List[str], fetched_at: float, source: str):
+        parsed = sorted(date.fromisoformat(value) for value in dates)
+        self._dates = frozenset(parsed)
+        self._first, self._last = parsed[0], parsed[-1]
+        self._fetched_at = fetched_at
+        self._source = source
+
+    def _expired(self) -> bool:
+        return _time.time() - self._fetched_at >= self.refresh_days * 86400
+
+    def _load(self) -> bool:
+        """从AKShare获取并持久化交易日，返回是否成功"""
+        try:
+            dates = self.fetcher()
+            if not dates:
+                raise ValueError("交易日列表为空")
+            fetched_at = _time.time()
+            self._use(dates, fetched_at, "akshare")
+            self.store.save_cache_data(self.cache_key, {"dates": sorted(dates), "fetched_at": fetched_at})
+            logger.info(f"交易日历已更新: {len(dates)} 个交易日，截至 {self._last}")
+            return True
+        except Exception as e:
+            self._retry_at = _time.time() + RETRY_INTERVAL
+            fallback = "沿用缓存的交易日" if self._dates is not None else "按工作日近似"
+            logger.warning(f"获取交易日历失败，{fallback}: {e}")
+            return False
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._idle.clear()
+
+        def run():
+            try:
+                self._load()
+            finally:
+                self._refreshing = False
+                self._idle.set()
+
+        threading.Thread(target=run, name="trading-calendar-refresh", daemon=True).start()
+
+    def _load_cached(self):
+        """读取缓存的交易日（每个实例只读取一次）"""
+        with self._lock:
+            if self._dates is not None or self._cache_checked:
+                return
+            self._cache_checked = True
+            try:
+                cached = self.store.get_cache_data(self.cache_key)
+                if cached and cached.get("dates"):
+                    self._use(cached["dates"], cached.get("fetched_at", 0.0), "cache")
+            except Exception as e:
+                logger.warning(f"读取交易日历缓存失败: {e}")
+
+    def _ensure_loaded(self):
+        """加载交易日：优先使用缓存；没有交易日或已过期时在后台获取，期间沿用旧数据或按工作日近似，不阻塞查询"""
+        if self._dates is not None and not self._expired():
+            return
+        if self._dates is None:
+            self._load_cached()
+        if _time.time() < self._retry_at:
+            return
+        if self._dates is None or self._expired():
+            self._refresh_in_background()
+
+    def warm(self, wait: bool = False, timeout: float = None) -> bool:
+        """
+        预热交易日历（应用启动时调用）
+
+        Args:
+            wait: 是否等待正在进行的后台加载完成
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            是否已有交易日数据（否则按工作日近似）
+        """
+        self._ensure_loaded()
+        if wait:
+            self._idle.wait(timeout)
+        return self._dates is not None
+
+    def refresh(self) -> bool:
+        """立即从AKShare重新获取交易日"""
+        with self._lock:
+            return self._load()
+
+    def is_trading_day(self, day: date) -> bool:
+        """是否为交易日（超出日历范围的日期按工作日判断）"""
+        self._ensure_loaded()
+        if self._dates is not None and self._first <= day <= self._last:
+            return day in self._dates
+        return day.weekday() < 5
+
+    def session(self, at: datetime = None) -> str:
+        """指定时间（默认当前）所处的交易时段"""
+        market = _to_market(at)
+        if not self.is_trading_day(market.date()):
+            return HOLIDAY
+        now = market.time()
+        for name, start, end in SESSIONS:
+            if start <= now < end:
+                return name
+        return CLOSED
+
+    def is_active(self, at: datetime = None) -> bool:
+        """行情是否处于变化中（集合竞价或连续竞价时段）"""
+        return self.session(at) in ACTIVE_SESSIONS
+
+    def _next_trading_day(self, day: date) -> date:
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            day += timedelta(days=1)
+            if self.is_trading_day(day):
+                return day
+        return day
+
+    @staticmethod
+    def _at(day: date, moment: time) -> datetime:
+        return datetime.combine(day, moment, tzinfo=MARKET_TZ)
+
+    def next_open(self, at: datetime = None) -> datetime:
+        """下一次行情开始变化的时间（开盘集合竞价或午后开盘）；交易时段内返回at本身"""
+        market = _to_market(at)
+        day, now = market.date(), market.time()
+        if self.is_trading_day(day):
+            if now < OPEN_TIME:
+                return _from_market(self._at(day, OPEN_TIME), at)
+            if now < CLOSE_TIME:
+                if self.session(market) == LUNCH:
+                    return _from_market(self._at(day, RESUME_TIME), at)
+                return _from_market(market, at)
+        return _from_market(self._at(self._next_trading_day(day), OPEN_TIME), at)
+
+    def next_close(self, at: datetime = None) -> datetime:
+        """at之后（含交易中）最近一次收盘时间"""
+        market = _to_market(at)
+        day = market.date()
+        if self.is_trading_day(day) and market.time() < CLOSE_TIME:
+            return _from_market(self._at(day, CLOSE_TIME), at)
+        return _from_market(self._at(self._next_trading_day(day), CLOSE_TIME), at)
+
+    @staticmethod
+    def _settle() -> timedelta:
+        return timedelta(seconds=settings.SESSION_SETTLE_SECONDS)
+
+    def quote_expiry(self, updated_at: datetime, ttl: timedelta) -> datetime:
+        """
+        行情类数据的过期时间
+        交易时段内（含休市后的结算缓冲期）获取的数据在ttl后过期；休市期间获取的数据有效至下一次开盘
+        """
+        if self.is_active(updated_at) or self.is_active(updated_at - self._settle()):
+            return updated_at + ttl
+        return self.next_open(updated_at)
+
+    def bar_expiry(self, updated_at: datetime, ttl: timedelta) -> datetime:
+        """日线数据的过期时间：下一次收盘（加结算缓冲期）后过期，最长不超过ttl"""
+        close = self.next_close(updated_at - self._settle())
+        return min(updated_at + ttl, close + self._settle())
+
+    def info(self, at: datetime = None) -> Dict[str, Any]:
+        """日历与当前时段信息"""
+        market = _to_market(at)
+        self._ensure_loaded()
+        return {
+            "session": self.session(market),
+            "trading_day": self.is_trading_day(market.date()),
+            "market_time": market.isoformat(),
+            "next_open": self.next_open(market).isoformat(),
+            "next_close": self.next_close(market).isoformat(),
+            "source": self._source,
+            "loading": self._refreshing,
+            "trade_dates": len(self._dates) if self._dates is not None else 0,
+            "last_trade_date": self._last.isoformat() if self._last else None,
+        }
+
+
+# 全局交易日历
+trading_calendar = TradingCalendar()
@@ -87,10 +87,49 @@ def validate_env_file():
         'LOG_FILE',
         'DEBUG',
         'SECRET_KEY',
+        'WORKERS',
+        'SPOT_REFRESH_INTERVAL',
+        'SPOT_MAX_AGE',
+        'SPOT_FEED_QUEUE_SIZE',
+        'SPOT_FEED_KEEPALIVE',
+        'SESSION_AWARE_TTL',
+        'SESSION_SETTLE_SECONDS',
+        'TRADING_CALENDAR_REFRESH_DAYS',
+        'INDUSTRY_INDEX_REFRESH_HOURS',
+        'STALE_WHILE_REVALIDATE',
+        'MAX_STALENESS',
+        'TTL_QUOTES',
+        'TTL_INDUSTRY_LISTS',
+        'TTL_INDUSTRY_DATA',
+        'TTL_FINANCIALS',
+        'TTL_HISTORY',
+        'TTL_ANALYSES',
         'CRAWLER_DELAY',
         'CRAWLER_TIMEOUT',
+        'COLLECTOR_MAX_WORKERS',
+        'COLLECTOR_CALL_TIMEOUT',
+        'BULK_WORKERS',
+        'BULK_BATCH_SIZE',
+        'BULK_MAX_SECONDS',
+        'RATE_LIMIT_RPS',
+        'RATE_LIMIT_BURST',
+        'RATE_LIMITS',
+        'REQUEST_RETRY_COUNT',
+        'RETRY_BACKOFF_BASE',
+        'RETRY_BACKOFF_MAX',
+        'RETRY_BUDGET_RATIO',
+        'RETRY_BUDGET_RESERVE',
         'USER_AGENT',
         'DATABASE_URL',
+        'STORAGE_BACKEND',
+        'DATA_FORMAT',
+        'DATA_COMPRESSION',
+        'CACHE_TTL_STOCK',
+        'CACHE_TTL_INDUSTRY',
+        'CACHE_TTL_HISTORICAL',
+        'CACHE_MAX_ENTRIES',
+        'CACHE_MAX_MB',
+        'CACHE_EVICTION_INTERVAL',
         'EASTMONEY_BASE_URL',
         'THS_BASE_URL',
         'STATS_BASE_URL',
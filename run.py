@@ -21,6 +21,7 @@ def main():
     print(f"🔧 调试模式: {settings.DEBUG}")
     print(f"📝 日志级别: {settings.LOG_LEVEL}")
     print(f"🎯 目标行业: {settings.TARGET_INDUSTRIES}")
+    print(f"👷 工作进程: {1 if settings.DEBUG else settings.WORKERS}")
     print("🌐 访问地址:")
     print("   📱 本地访问: http://localhost:8000")
     print("   🌍 网络访问: http://0.0.0.0:8000")
@@ -34,6 +35,7 @@ def main():
         host="0.0.0.0",
         port=8000,
         reload=settings.DEBUG,
+        workers=None if settings.DEBUG else settings.WORKERS,
         log_level=settings.LOG_LEVEL.lower()
     )
 
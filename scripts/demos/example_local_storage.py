@@ -115,9 +115,9 @@ def main():
     print("\n✅ 所有示例执行完成！")
     print("\n📁 数据文件位置:")
     print(f"  - 公司数据: {data_manager._get_file_path('companies.json')}")
-    print(f"  - 财务数据: {data_manager._get_file_path('financial_data.json')}")
+    print(f"  - 财务数据: {data_manager._get_file_path('financial_data.jsonl')}")
     print(f"  - 行业数据: {data_manager._get_file_path('industry_data.json')}")
-    print(f"  - 分析结果: {data_manager._get_file_path('analysis_results.json')}")
+    print(f"  - 分析结果: {data_manager._get_file_path('analysis.db')}")
     
     print("\n💡 提示:")
     print("  - 数据文件会自动创建在 ./data/ 目录下")
@@ -168,7 +168,7 @@ def main():
     print("1. 系统会自动使用缓存数据（5分钟内有效）")
     print("2. 使用 force_refresh=true 可以强制获取最新数据")
     print("3. 如果实时获取失败，会自动降级到本地存储")
-    print("4. 缓存数据会保存在 ./data/cache.json 中")
+    print("4. 缓存数据会保存在 ./data/cache.db 中（SQLite键值表）")
     print("5. 可以通过 /cache/info 查看缓存状态")
 
 if __name__ == "__main__":
@@ -74,10 +74,9 @@ def add_test_companies():
     # 合并所有公司
     all_companies = {**medical_companies, **new_energy_companies, **semiconductor_companies}
     
-    # 添加公司数据
-    for code, company_data in all_companies.items():
-        success = data_manager.save_company(company_data)
-        print(f"添加公司 {code}: {'成功' if success else '失败'}")
+    # 批量添加公司数据
+    success = data_manager.save_companies_bulk(list(all_companies.values()))
+    print(f"添加公司 {', '.join(all_companies.keys())}: {'成功' if success else '失败'}")
     
     print(f"\n总共添加了 {len(all_companies)} 家公司")
 
@@ -87,8 +86,10 @@ def add_test_financial_data():
     
     companies = ["PFE", "JNJ", "TSLA", "NVDA", "000001", "300750", "000002"]
     
+    financial_records = []
     for company_code in companies:
-        financial_data = {
+        financial_records.append({
+            "company_id": company_code,
             "report_date": "2024-01-01",
             "data_type": "年报",
             "revenue": 1000000 + hash(company_code) % 5000000,  # 随机收入
@@ -96,10 +97,11 @@ def add_test_financial_data():
             "total_assets": 5000000 + hash(company_code) % 20000000,  # 随机总资产
             "total_liabilities": 2000000 + hash(company_code) % 8000000,  # 随机总负债
             "operating_cash_flow": 300000 + hash(company_code) % 1500000  # 随机经营现金流
-        }
-        
-        success = data_manager.save_financial_data(company_code, financial_data)
-        print(f"添加 {company_code} 财务数据: {'成功' if success else '失败'}")
+        })
+    
+    # 批量写入（一次追加）
+    success = data_manager.save_financial_data_bulk(financial_records)
+    print(f"添加 {', '.join(companies)} 财务数据: {'成功' if success else '失败'}")
 
 def add_test_industry_data():
     """添加测试行业数据"""
@@ -0,0 +1,5 @@
+"""
+pytest配置：在收集测试（导入app）之前把数据目录指向临时目录
+"""
+
+import helpers  # noqa: F401
@@ -0,0 +1,47 @@
+"""
+测试公共工具
+导入时把数据与日志目录指向临时目录（须在导入app之前导入本模块），测试不会在仓库的 data/、logs/ 下建库写文件；
+并提供各测试共用的内存缓存与申万行业索引
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+if "DATA_DIR" not in os.environ:
+    _root = tempfile.mkdtemp(prefix="industry_analyze_test_")
+    atexit.register(shutil.rmtree, _root, ignore_errors=True)
+    os.environ["DATA_DIR"] = os.path.join(_root, "data")
+    os.environ.setdefault("LOG_DIR", os.path.join(_root, "logs"))
+    os.environ.setdefault("LOG_FILE", os.path.join(_root, "logs", "app.log"))
+
+from app.utils.industry_index import IndustryIndex  # noqa: E402
+
+
+class MemoryStore:
+    """内存缓存（替代数据管理器的 get_cache_data/save_cache_data）"""
+
+    def __init__(self):
+        self.items = {}
+
+    def get_cache_data(self, key):
+        return self.items.get(key)
+
+    def save_cache_data(self, key, data):
+        self.items[key] = data
+        return True
+
+
+def industries():
+    """已加载的申万行业索引（不访问网络）"""
+    columns = {
+        "symbols": ["000001", "300760", "600519"],
+        "codes": ["480301", "370301", "340501"],
+        "level1": ["银行", "医药生物", "食品饮料"],
+        "level2": ["股份制银行Ⅱ", "医疗器械", "白酒Ⅱ"],
+        "level3": ["股份制银行Ⅲ", "医疗设备", "白酒Ⅲ"],
+    }
+    index = IndustryIndex(lambda: columns, MemoryStore())
+    index.warm(wait=True)
+    return index
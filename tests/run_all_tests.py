@@ -56,7 +56,14 @@ def main():
         "test_basic.py",
         "test_all_modules.py", 
         "test_financial_fix.py",
-        "test_api_error.py"
+        "test_api_error.py",
+        "test_data_manager.py",
+        "test_bar_store.py",
+        "test_realtime_service.py",
+        "test_trading_calendar.py",
+        "test_frame_normalizer.py",
+        "test_industry_index.py",
+        "test_collectors.py"
     ]
     
     # 运行统计
@@ -0,0 +1,173 @@
+"""
+K线列式存储测试
+"""
+
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import helpers  # noqa: F401  数据目录指向临时目录
+from app.utils.bar_store import BarStore, date_to_int, int_to_date
+from app.utils.bar_panel import BarPanel
+from app.services.incremental_data_service import IncrementalDataService, HIST_COLUMN_MAP
+from app.utils.data_manager import data_manager
+
+
+def _hist_frame(dates, close):
+    """构造akshare历史行情格式的DataFrame"""
+    return pd.DataFrame({
+        "日期": dates,
+        "开盘": close,
+        "最高": close,
+        "最低": close,
+        "收盘": close,
+        "成交量": [100] * len(dates),
+    })
+
+
+def test_bar_store_roundtrip():
+    """测试K线转换、读写与切片"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        store = BarStore(root_dir)
+        bars = BarStore.from_frame(
+            _hist_frame(["2024-01-03", "2024-01-02", "bad"], [11.0, 10.0, 9.0]),
+            HIST_COLUMN_MAP
+        )
+
+        # 无效日期被丢弃，按日期排序
+        assert bars.shape == (11, 2)
+        assert BarStore.column(bars, "close").tolist() == [10.0, 11.0]
+        assert date_to_int("2024-01-02") == 20240102
+        assert int_to_date(20240102) == "2024-01-02"
+
+        assert store.save("000001", "daily", bars)
+        loaded = store.load("000001", "daily")
+        assert np.array_equal(loaded, bars, equal_nan=True)
+        assert store.symbols("daily") == ["000001"]
+
+        sliced = BarStore.slice(loaded, "2024-01-03", "2024-12-31")
+        records = BarStore.to_records(sliced)
+        assert records[0]["date"] == "2024-01-03"
+        assert records[0]["turnover"] is None
+
+        # 元信息随K线文件写入和删除
+        assert store.load_meta("000001", "daily") is None
+        assert store.save("000001", "daily", bars, {"coverage": {"start": "2024-01-02"}})
+        assert store.load_meta("000001", "daily") == {"coverage": {"start": "2024-01-02"}}
+        assert store.symbols("daily") == ["000001"]
+
+        assert store.delete("000001")
+        assert store.load("000001", "daily") is None
+        assert store.load_meta("000001", "daily") is None
+
+
+def test_bar_store_merge():
+    """测试合并去重（新数据优先）"""
+    old = BarStore.from_frame(_hist_frame(["2024-01-02", "2024-01-03"], [10.0, 11.0]), HIST_COLUMN_MAP)
+    new = BarStore.from_frame(_hist_frame(["2024-01-03", "2024-01-04"], [12.0, 13.0]), HIST_COLUMN_MAP)
+
+    merged = BarStore.merge(old, new)
+    assert [int_to_date(d) for d in merged[0]] == ["2024-01-02", "2024-01-03", "2024-01-04"]
+    assert BarStore.column(merged, "close").tolist() == [10.0, 12.0, 13.0]
+
+
+def test_incremental_fetches_only_gaps():
+    """测试增量更新只获取缺失区间"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        service = IncrementalDataService(BarStore(root_dir))
+        calls = []
+
+        def fake_fetch(symbol, period, start, end):
+            calls.append((start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
+            dates = pd.date_range(start, end).strftime('%Y-%m-%d').tolist()
+            return BarStore.from_frame(_hist_frame(dates, [1.0] * len(dates)), HIST_COLUMN_MAP)
+
+        service._fetch_bars = fake_fetch
+        try:
+            result = service.get_stock_historical_data("999999", "2024-01-10", "2024-01-20", force_refresh=True)
+            assert result["total_records"] == 11
+
+            result = service.get_stock_historical_data("999999", "2024-01-05", "2024-01-15")
+            assert calls[-1] == ("2024-01-05", "2024-01-09")
+            assert result["data"][0]["date"] == "2024-01-05"
+            assert result["total_records"] == 11
+
+            # 已覆盖的范围不再请求
+            service.get_stock_historical_data("999999", "2024-01-06", "2024-01-18")
+            assert len(calls) == 2
+
+            stats = service.get_data_statistics("999999")
+            assert stats["total_records"] == 16
+            assert stats["price_stats"]["avg"] == 1.0
+
+            # 元信息与K线文件一起存放，清空缓存后仍按增量更新
+            assert service.bar_store.load_meta("999999", "daily")["coverage"]["start"] == "2024-01-05"
+            assert data_manager.get_cache_data("historical_999999_daily") is None
+            # 缓存状态按K线文件统计
+            info = service.get_storage_info()
+            assert list(info) == ["999999_daily"] and info["999999_daily"]["total_records"] == 16
+        finally:
+            assert service.clear_cache("999999")
+
+
+def test_legacy_meta_migration():
+    """测试缓存中的旧版K线元信息迁移到K线文件旁"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        service = IncrementalDataService(BarStore(root_dir))
+        meta = {"coverage": {"start": "2024-01-02", "end": "2024-01-03"}, "last_updated": "2024-01-03T16:00:00"}
+        service.bar_store.save("999998", "daily", BarStore.from_frame(
+            _hist_frame(["2024-01-02", "2024-01-03"], [10.0, 11.0]), HIST_COLUMN_MAP))
+        data_manager.save_cache_data("historical_999998_daily", meta)
+        try:
+            assert service._get_cached_meta("999998", "daily") == meta
+            assert service.bar_store.load_meta("999998", "daily") == meta
+            assert data_manager.get_cache_data("historical_999998_daily") is None
+        finally:
+            service.clear_cache("999998")
+
+
+def test_bar_panel_cross_section():
+    """测试全市场面板构建与截面查询"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        store = BarStore(f"{root_dir}/bars")
+        store.save("000001", "daily", BarStore.from_frame(
+            _hist_frame(["2024-01-02", "2024-01-03", "2024-01-04"], [10.0, 11.0, 12.0]), HIST_COLUMN_MAP))
+        store.save("600519", "daily", BarStore.from_frame(
+            _hist_frame(["2024-01-03", "2024-01-05"], [100.0, 101.0]), HIST_COLUMN_MAP))
+
+        panel = BarPanel(f"{root_dir}/panel")
+        assert panel.get("close") is None
+        info = panel.build(store)
+        assert info["symbols"] == 2 and info["trading_days"] == 4
+
+        assert panel.symbol_row("600519") == 1
+        assert panel.date_column("2024-01-04") == 2
+        assert panel.date_column("2024-01-06") is None
+
+        section = panel.get("close", "2024-01-03", "2024-01-04")
+        assert section["symbols"] == ["000001", "600519"]
+        assert section["dates"].tolist() == [20240103, 20240104]
+        assert section["values"][0].tolist() == [11.0, 12.0]
+        assert np.isnan(section["values"][1, 1])
+        # 全部股票的查询结果是面板视图，不复制数据
+        assert not section["values"].flags.owndata
+
+        section = panel.get("close", symbols=["600519", "999999"])
+        assert section["symbols"] == ["600519"]
+        assert section["values"].shape == (1, 4)
+
+        # 重建后读取者自动切换到新面板
+        store.delete("600519")
+        panel.build(store)
+        assert panel.symbols == ["000001"]
+
+
+if __name__ == "__main__":
+    # 运行测试
+    test_bar_store_roundtrip()
+    test_bar_store_merge()
+    test_incremental_fetches_only_gaps()
+    test_legacy_meta_migration()
+    test_bar_panel_cross_section()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,356 @@
+"""
+数据采集器测试
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pandas as pd
+import requests
+
+from helpers import industries
+from app.core.config import settings
+from app.utils.fan_out import fan_out
+from app.utils.rate_limiter import RateLimitedModule, RateLimiter, TokenBucket, parse_limits
+from app.services.collectors import akshare_collector
+from app.services.collectors.akshare_collector import AKShareCollector
+from app.services.collectors.base_collector import BaseCollector
+from app.services.collectors.bulk_collector import BulkCollector
+from app.utils.atomic_io import read_data
+
+
+def test_fan_out():
+    """测试并发执行、失败与超时只影响对应调用"""
+    release = threading.Event()
+
+    def failing():
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        started = time.time()
+        results, errors = fan_out({
+            "fast": lambda: 1,
+            "slow": lambda: release.wait(5) and 2,
+            "failing": failing,
+        }, timeout=0.2, executor=executor)
+        release.set()
+    assert time.time() - started < 2
+    assert results == {"fast": 1}
+    assert errors["failing"] == "boom"
+    assert "超时" in errors["slow"]
+
+    # 超时从调用开始执行时计算，排队时间不计入；排队超过超时时间的调用记为排队超时
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results, errors = fan_out({
+            "first": lambda: time.sleep(0.15) or 1,
+            "second": lambda: time.sleep(0.15) or 2,
+        }, timeout=0.25, executor=executor)
+        assert results == {"first": 1, "second": 2} and errors == {}
+
+        release.clear()
+        results, errors = fan_out({
+            "blocking": lambda: release.wait(5),
+            "queued": lambda: 3,
+        }, timeout=0.1, executor=executor)
+        release.set()
+    assert "排队超时" in errors["queued"] and "超时" in errors["blocking"]
+
+
+def test_stock_data_concurrent_and_partial():
+    """测试个股数据的上游调用并发执行，失败的部分记录在errors中"""
+    barrier = threading.Barrier(3, timeout=2)
+
+    def concurrent(result):
+        # 三个上游调用必须同时进行才能通过栅栏
+        def call(**kwargs):
+            barrier.wait()
+            return result
+        return call
+
+    def failing(**kwargs):
+        barrier.wait()
+        raise ConnectionError("upstream down")
+
+    original, original_index = akshare_collector.ak, akshare_collector.industry_index
+    akshare_collector.industry_index = industries()
+    akshare_collector.ak = SimpleNamespace(
+        stock_zh_a_hist=concurrent(pd.DataFrame({"日期": ["2024-01-02"], "收盘": [10.8]})),
+        stock_individual_info_em=concurrent(pd.DataFrame({"item": ["股票简称"], "value": ["平安银行"]})),
+        stock_financial_abstract=failing,
+    )
+    try:
+        stock = AKShareCollector().get_stock_data("000001", timeout=5)
+        assert stock["company_name"] == "平安银行"
+        assert stock["industry"] == "银行"
+        assert stock["historical_data"][0]["close"] == 10.8
+        assert stock["financial_data"] == {}
+        assert stock["errors"] == {"financial_data": "upstream down"}
+
+        def down(**kwargs):
+            raise ConnectionError("upstream down")
+
+        akshare_collector.ak = SimpleNamespace(
+            stock_zh_a_hist=down, stock_individual_info_em=down, stock_financial_abstract=down
+        )
+        assert "全部获取失败" in AKShareCollector().collect(symbol="000001", type="stock", timeout=5)["error"]
+
+        # 行业索引未加载时最多等待单次调用超时，不长期占用采集线程
+        waits = []
+        akshare_collector.industry_index = SimpleNamespace(
+            warm=lambda wait=False, timeout=None: waits.append(timeout) or False, get=lambda symbol: None
+        )
+        akshare_collector.ak = SimpleNamespace(
+            stock_zh_a_hist=lambda **kwargs: pd.DataFrame(),
+            stock_individual_info_em=lambda **kwargs: pd.DataFrame({"item": ["股票简称"], "value": ["平安银行"]}),
+            stock_financial_abstract=lambda **kwargs: pd.DataFrame(),
+        )
+        AKShareCollector().get_stock_data("000001", timeout=3)
+        AKShareCollector().get_stock_data("000001")
+        assert waits == [3, settings.COLLECTOR_CALL_TIMEOUT]
+    finally:
+        akshare_collector.ak, akshare_collector.industry_index = original, original_index
+
+
+class _FakeCollector(BaseCollector):
+    """记录调用的采集器，代码以9开头时返回错误"""
+
+    symbol_key = "ticker"
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def collect(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs["ticker"])
+        time.sleep(self.delay)
+        if kwargs["ticker"].startswith("9"):
+            return {"error": "not found"}
+        if kwargs["ticker"].startswith("8"):
+            return {"company_name": "部分数据", "errors": {"financial_data": "超时（20秒）"}}
+        return {"company_name": f"公司{kwargs['ticker']}", "market": kwargs.get("market", "")}
+
+
+class _Sink:
+    """内存写入，可在指定批次失败以模拟进程中断"""
+
+    def __init__(self, fail_on_part=None):
+        self.parts = {}
+        self.fail_on_part = fail_on_part
+
+    def __call__(self, job_dir, part, results):
+        if part == self.fail_on_part:
+            raise IOError("disk full")
+        self.parts[part] = dict(results)
+
+
+def test_bulk_checkpoint_and_resume():
+    """测试批量采集按批写入、中断后从检查点继续"""
+    symbols = [f"{i:06d}" for i in range(1, 11)] + ["900001"]
+    with tempfile.TemporaryDirectory() as root_dir:
+        collector = _FakeCollector()
+        sink = _Sink(fail_on_part=2)
+        bulk = BulkCollector(collector, "nightly", workers=1, batch_size=4, sink=sink, root_dir=root_dir)
+        try:
+            bulk.run(symbols, market="A股")
+            assert False, "第2批写入失败时应中断"
+        except IOError:
+            pass
+        checkpoint = bulk.load_checkpoint()
+        assert checkpoint["done"] == symbols[:4]
+        assert sink.parts[1]["000001"] == {"company_name": "公司000001", "market": "A股"}
+
+        # 继续时跳过已写入的代码，失败的批次重新采集
+        resumed = _FakeCollector()
+        sink.fail_on_part = None
+        bulk = BulkCollector(resumed, "nightly", workers=3, batch_size=4, sink=sink, root_dir=root_dir)
+        stats = bulk.run(symbols + ["000001"])
+        assert sorted(resumed.calls) == symbols[4:]
+        assert stats["completed"] == 6 and stats["failed"] == 1 and stats["skipped"] == 4
+        assert stats["remaining"] == 0
+        checkpoint = bulk.load_checkpoint()
+        assert checkpoint["done"] == symbols[:10]
+        assert checkpoint["failed"] == {"900001": "not found"}
+        assert sum(len(part) for part in sink.parts.values()) == 10
+
+        # 不重试失败的代码时全部跳过
+        again = BulkCollector(_FakeCollector(), "nightly", sink=sink, root_dir=root_dir)
+        assert again.run(symbols, retry_failed=False)["skipped"] == 11
+
+        # 部分上游调用失败的结果记为失败，不写入，继续时重新采集
+        partial = _FakeCollector()
+        bulk = BulkCollector(partial, "nightly", sink=sink, root_dir=root_dir)
+        stats = bulk.run(symbols + ["800001"], retry_failed=False)
+        assert partial.calls == ["800001"] and stats["failed"] == 1
+        assert "financial_data" in bulk.load_checkpoint()["failed"]["800001"]
+        assert "800001" not in bulk.load_checkpoint()["done"]
+        bulk.run(symbols + ["800001"])
+        assert partial.calls.count("800001") == 2
+
+
+def test_bulk_deadline_and_default_sink():
+    """测试到达最长运行时间后停止，结果写入分片文件"""
+    from app.utils.data_manager import DataManager
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        manager = DataManager(os.path.join(root_dir, "data"))
+        collector = _FakeCollector(delay=0.05)
+        bulk = BulkCollector(collector, "window", workers=2, batch_size=100, root_dir=root_dir)
+        bulk.sink._data_manager = manager
+        stats = bulk.run([f"{i:06d}" for i in range(1, 101)], max_seconds=0.1)
+        assert 0 < stats["completed"] < 100
+        assert stats["remaining"] == 100 - stats["completed"]
+
+        part = read_data(os.path.join(root_dir, "window", "part-00001.json"))
+        assert len(part) == stats["completed"]
+        assert manager.get_company("000001")["name"] == "公司000001"
+
+
+def _http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return requests.HTTPError(f"{status}", response=response)
+
+
+def test_token_bucket():
+    """测试令牌桶的突发与平均速率"""
+    bucket = TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays[0] == 0 and delays[1] == 0
+    assert 0.05 < delays[2] <= 0.1 and 0.15 < delays[3] <= 0.2
+    assert TokenBucket(rate=0).reserve() == 0
+
+    assert parse_limits("eastmoney.com=8:4, sina.com.cn=3,bad=x") == {
+        "eastmoney.com": (8.0, 4), "sina.com.cn": (3.0, None)
+    }
+    limiter = RateLimiter(rate=0, limits={"eastmoney.com": (8, 4)})
+    assert limiter._key("push2his.eastmoney.com") == "eastmoney.com"
+    assert limiter._key("eastmoney.com") == "eastmoney.com"
+    assert limiter._key("noteastmoney.com") == "noteastmoney.com"
+    assert limiter._state("push2.eastmoney.com") is limiter._state("eastmoney.com")
+
+
+def test_retry_backoff_and_budget():
+    """测试可重试的失败按退避重试，其他错误及预算用尽时不重试"""
+    sleeps = []
+    limiter = RateLimiter(
+        rate=0, limits={}, max_retries=3, backoff_base=1.0, backoff_max=3.0,
+        budget_ratio=0.0, budget_reserve=3, sleep=sleeps.append
+    )
+    outcomes = [_http_error(503), requests.ConnectionError("reset"), "ok"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call("example.com", flaky) == "ok"
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+    stats = limiter.stats()["example.com"]
+    assert stats["requests"] == 3 and stats["retries"] == 2
+
+    # Retry-After优先（不超过最长等待），4xx与其他异常不重试
+    outcomes[:] = [_http_error(429, retry_after=60), "ok"]
+    assert limiter.call("example.com", flaky) == "ok" and sleeps[-1] == 3.0
+    for error in (_http_error(404), ValueError("bad data")):
+        outcomes[:] = [error, "ok"]
+        try:
+            limiter.call("example.com", flaky)
+            assert False, "不可重试的错误应直接抛出"
+        except type(error):
+            pass
+
+    # 预算（初始3次，已用3次）用尽后不再重试
+    outcomes[:] = [_http_error(502), "ok"]
+    try:
+        limiter.call("example.com", flaky)
+        assert False, "预算用尽时应直接抛出"
+    except requests.HTTPError:
+        pass
+    assert limiter.stats()["example.com"]["budget_exhausted"] == 1
+    assert len(sleeps) == 3
+
+
+def test_concurrent_stats():
+    """测试多线程并发调用同一主机时计数不丢失"""
+    import sys
+
+    limiter = RateLimiter(rate=0, limits={}, max_retries=0, budget_reserve=0)
+
+    def work(i):
+        for _ in range(200):
+            try:
+                limiter.call("example.com", lambda: i % 2 and 1 / 0)
+            except ZeroDivisionError:
+                pass
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    stats = limiter.stats()["example.com"]
+    assert stats["requests"] == 1600 and stats["failures"] == 800
+
+
+def test_collector_requests_rate_limited():
+    """测试BaseCollector的请求与AKShare接口经过限流器"""
+    from app.services.collectors import base_collector
+
+    class _Session:
+        def __init__(self):
+            self.calls = []
+
+        def request(self, method, url, **kwargs):
+            self.calls.append((method, url, kwargs.get("data")))
+            response = requests.Response()
+            response.status_code = 503 if len(self.calls) == 1 else 200
+            return response
+
+    limiter = RateLimiter(rate=0, limits={}, backoff_base=0.0, budget_reserve=5)
+    original = base_collector.rate_limiter
+    base_collector.rate_limiter = limiter
+    try:
+        collector = _FakeCollector()
+        collector.session = _Session()
+        assert collector.get("https://api.example.com/quote?code=1").status_code == 200
+        assert collector.post("https://api.example.com/query", data={"a": 1}).status_code == 200
+        assert collector.session.calls[-1] == ("POST", "https://api.example.com/query", {"a": 1})
+        assert limiter.stats()["api.example.com"]["retries"] == 1
+
+        collector.session.request = lambda method, url, **kwargs: _http_error(404).response
+        assert collector.get("https://api.example.com/missing") is None
+    finally:
+        base_collector.rate_limiter = original
+
+    api = RateLimitedModule("json", lambda name: "json.example.com", limiter)
+    assert api.loads("[1]") == [1]
+    assert api.JSONDecodeError.__name__ == "JSONDecodeError"
+    assert limiter.stats()["json.example.com"]["requests"] == 1
+
+
+if __name__ == "__main__":
+    # 运行测试
+    test_fan_out()
+    test_stock_data_concurrent_and_partial()
+    test_bulk_checkpoint_and_resume()
+    test_bulk_deadline_and_default_sink()
+    test_token_bucket()
+    test_retry_backoff_and_budget()
+    test_concurrent_stats()
+    test_collector_requests_rate_limited()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,465 @@
+"""
+本地数据管理器测试
+"""
+
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import helpers  # noqa: F401  数据目录指向临时目录
+from app.utils.data_manager import DataManager
+from app.utils.financial_journal import FinancialJournal
+
+
+def test_cache_store_roundtrip():
+    """测试缓存按键读写"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+
+        assert manager.save_cache_data("stock_cache_000001", {"code": "000001", "current_price": 10.5})
+        assert manager.save_cache_data("industry_cache_医药", [{"code": "600276"}])
+
+        assert manager.get_cache_data("stock_cache_000001")["current_price"] == 10.5
+        assert manager.get_cache_data("missing") is None
+        assert manager.get_cache_item("industry_cache_医药")["timestamp"]
+
+        cache_info = manager.get_cache_info()
+        assert cache_info["stock_cache_000001"]["data_type"] == "dict"
+        assert cache_info["industry_cache_医药"]["data_type"] == "list"
+
+        assert manager.clear_cache("stock_cache_000001") == True
+        assert manager.clear_cache("stock_cache_000001") == False
+        assert manager.clear_cache() == True
+        assert manager.get_cache_info() == {}
+
+
+def test_cache_store_migrates_legacy_json():
+    """测试旧版cache.json自动迁移"""
+    # 时间戳需在历史数据缓存的保留期内
+    timestamp = datetime.now().replace(microsecond=0).isoformat()
+    with tempfile.TemporaryDirectory() as data_dir:
+        legacy_path = os.path.join(data_dir, "cache.json")
+        with open(legacy_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "historical_000001_daily": {
+                    "data": {"symbol": "000001"},
+                    "timestamp": timestamp
+                }
+            }, f)
+
+        manager = DataManager(data_dir)
+
+        assert manager.get_cache_data("historical_000001_daily") == {"symbol": "000001"}
+        assert manager.get_cache_item("historical_000001_daily")["timestamp"] == timestamp
+        assert not os.path.exists(legacy_path)
+
+
+def test_cache_store_eviction():
+    """测试缓存按命名空间过期及超预算LRU淘汰"""
+    from app.utils.cache_store import CacheStore
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = CacheStore(
+            os.path.join(data_dir, "cache.db"),
+            namespace_ttls={"stock_cache_": 60, "historical_": None},
+            max_entries=3,
+            pinned=("trading_calendar",)
+        )
+        store.set("stock_cache_000001", {"price": 1})
+        store.set("historical_000001_daily", {"symbol": "000001"})
+        # 写入时间早于保留期的缓存读取时视为不存在
+        conn = store._connect()
+        conn.execute("UPDATE cache SET timestamp = '2000-01-01T00:00:00' WHERE key LIKE 'stock_cache_%'")
+        assert store.get("stock_cache_000001") is None
+        assert store.get("historical_000001_daily") == {"symbol": "000001"}
+
+        for i in range(4):
+            store.set(f"other_{i}", {"i": i})
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (i + 10, f"other_{i}"))
+        conn.execute("UPDATE cache SET accessed_at = 100 WHERE key = 'historical_000001_daily'")
+        store.set("stock_cache_000002", {"price": 2})
+        conn.execute("UPDATE cache SET timestamp = '2000-01-01T00:00:00' WHERE key = 'stock_cache_000002'")
+
+        assert store.evict() == {"expired": 1, "evicted": 2}
+        assert sorted(store.info()) == ["historical_000001_daily", "other_2", "other_3"]
+
+        stats = store.stats()
+        assert stats["entries"] == 3
+        assert stats["expired"] == 2 and stats["evicted"] == 2
+        assert stats["namespaces"][""]["entries"] == 2
+        assert stats["namespaces"]["historical_"]["entries"] == 1
+
+        # 固定的键即使最久未访问也不淘汰
+        store.set("trading_calendar", ["2024-01-02"])
+        conn.execute("UPDATE cache SET accessed_at = 0 WHERE key = 'trading_calendar'")
+        assert store.evict() == {"expired": 0, "evicted": 1}
+        assert sorted(store.info()) == ["historical_000001_daily", "other_3", "trading_calendar"]
+
+
+def test_sqlite_connections_closed():
+    """测试每线程的SQLite连接在线程结束或关闭存储时释放"""
+    import gc
+    import threading
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+        connections = manager.cache_store._connections
+        assert connections.open_count() == 1
+
+        threads = [
+            threading.Thread(target=manager.save_cache_data, args=(f"stock_cache_{i}", {"i": i}))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gc.collect()
+        # 工作线程的连接随线程结束关闭，不会随线程数累积
+        assert connections.open_count() == 1
+        assert manager.get_cache_data("stock_cache_7") == {"i": 7}
+
+        manager.close()
+        assert connections.open_count() == 0
+        assert manager.analysis_store._connections.open_count() == 0
+        # 关闭后仍可按需重新连接
+        assert manager.get_cache_data("stock_cache_0") == {"i": 0}
+        manager.close()
+
+
+def test_json_memory_cache():
+    """测试JSON文件内存缓存命中与失效"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+        manager.save_company({"code": "000001", "name": "平安银行", "industry": "金融"})
+
+        # 自身写入后直接命中
+        company = manager.get_company("000001")
+        assert company["name"] == "平安银行"
+        assert manager.get_all_companies()["000001"] is company
+        assert manager.get_memory_cache_stats()["hits"] == 2
+
+        # 返回只读视图
+        try:
+            company["name"] = "被修改"
+            assert False, "只读视图不应允许修改"
+        except TypeError:
+            pass
+
+        # 外部修改文件后按mtime/大小失效
+        time.sleep(0.01)
+        with open(os.path.join(data_dir, "companies.json"), 'w', encoding='utf-8') as f:
+            json.dump({"000002": {"code": "000002", "name": "万科A"}}, f, ensure_ascii=False)
+        assert manager.get_company("000001") is None
+        assert manager.get_company("000002")["name"] == "万科A"
+
+        stats = manager.get_cache_info(include_stats=True)["_stats"]["memory_cache"]
+        assert stats["misses"] >= 1
+
+
+def test_financial_journal_upsert():
+    """测试财务数据按 (公司, 报告期, 数据类型) 去重"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+
+        manager.save_financial_data("000001", {"report_date": "20231231", "data_type": "annual", "revenue": 1.0})
+        manager.save_financial_data("000001", {"report_date": "20230930", "data_type": "quarterly", "revenue": 2.0})
+        # 重复刷新同一报告期只覆盖，不产生重复记录
+        manager.save_financial_data("000001", {"report_date": "20231231", "data_type": "annual", "revenue": 3.0})
+
+        records = manager.get_financial_data("000001")
+        assert [r["report_date"] for r in records] == ["20231231", "20230930"]
+        assert records[0]["revenue"] == 3.0
+        assert manager.get_data_summary()["total_financial_records"] == 2
+
+        # 新实例从日志重建
+        assert DataManager(data_dir).get_financial_data("000001")[0]["revenue"] == 3.0
+
+        # 报告期格式不同也视为同一报告期
+        manager.save_financial_data("000001", {"report_date": "2023-12-31", "data_type": "annual", "revenue": 4.0})
+        records = manager.get_financial_data("000001")
+        assert len(records) == 2 and records[0]["revenue"] == 4.0
+
+        assert manager.delete_financial_data("000001") == True
+        assert manager.get_financial_data("000001") == []
+
+
+def test_financial_journal_compaction_and_migration():
+    """测试日志压缩与旧版JSON迁移"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        legacy_path = os.path.join(data_dir, "financial_data.json")
+        with open(legacy_path, 'w', encoding='utf-8') as f:
+            json.dump({"000002": [
+                {"report_date": "20231231", "data_type": "annual", "revenue": 1.0},
+                {"report_date": "20231231", "data_type": "annual", "revenue": 2.0}
+            ]}, f)
+
+        journal_path = os.path.join(data_dir, "financial_data.jsonl")
+        journal = FinancialJournal(journal_path, legacy_json_path=legacy_path, compact_min_lines=10)
+        assert [r["revenue"] for r in journal.get("000002")] == [2.0]
+        assert not os.path.exists(legacy_path)
+
+        for i in range(20):
+            journal.upsert("000002", {"report_date": "20231231", "data_type": "annual", "revenue": float(i)})
+
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            assert len(f.readlines()) < 20
+        assert journal.get("000002")[0]["revenue"] == 19.0
+
+
+def test_bulk_writes():
+    """测试批量写入公司和财务数据"""
+    import pandas as pd
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+
+        companies = pd.DataFrame([
+            {"code": "000001", "name": "平安银行", "industry": "金融"},
+            {"code": "600519", "name": "贵州茅台", "industry": None},
+        ])
+        assert manager.save_companies_bulk(companies)
+        assert manager.get_company("600519")["industry"] is None
+        assert len(manager.get_all_companies()) == 2
+
+        assert manager.save_financial_data_bulk([
+            {"company_id": "000001", "report_date": "20231231", "data_type": "annual", "revenue": 1.0},
+            {"company_id": "600519", "report_date": "20231231", "data_type": "annual", "revenue": 2.0},
+            {"company_id": "600519", "report_date": "20231231", "data_type": "annual", "revenue": 3.0},
+        ])
+        assert manager.get_financial_data("600519")[0]["revenue"] == 3.0
+        assert "company_id" not in manager.get_financial_data("000001")[0]
+        assert manager.get_data_summary()["total_financial_records"] == 2
+
+
+def _save_companies_in_process(data_dir, prefix):
+    """子进程中写入公司数据"""
+    manager = DataManager(data_dir)
+    for i in range(10):
+        manager.save_company({"code": f"{prefix}{i:02d}", "name": f"公司{prefix}{i}"})
+
+
+def test_concurrent_updates():
+    """测试多线程、多进程并发更新不丢失且不会读到半写文件"""
+    import multiprocessing
+    from concurrent.futures import ThreadPoolExecutor
+    from app.utils.atomic_io import json_writer
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+        writes_before = json_writer.stats()["writes"]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda i: manager.save_company({"code": f"T{i:03d}", "name": f"公司{i}"}), range(50)
+            ))
+        assert all(results)
+        assert len(manager.get_all_companies()) == 50
+        # 同一文件排队中的更新合并写入
+        assert json_writer.stats()["writes"] - writes_before <= 50
+
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=_save_companies_in_process, args=(data_dir, f"P{n}")) for n in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert all(process.exitcode == 0 for process in processes)
+
+        companies = manager.get_all_companies()
+        assert len(companies) == 90
+        assert manager.delete_company("P000") == True
+        assert manager.delete_company("P000") == False
+        # 目录中不残留临时文件
+        assert not [name for name in os.listdir(data_dir) if name.endswith(".tmp")]
+
+
+def test_failed_update_not_written():
+    """测试抛出异常的更新不会写入部分修改，同批的其他更新照常写入"""
+    from app.utils.atomic_io import CoalescingWriter, read_data
+
+    def half_applied(data):
+        data["partial"] = True
+        raise ValueError("校验失败")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "companies.json")
+        writer = CoalescingWriter()
+        calls = []
+
+        def add_a(data):
+            calls.append("a")
+            data["a"] = 1
+            return "a"
+
+        # 持有队列锁提交，写线程一次取出全部三个更新
+        with writer._cond:
+            futures = [
+                writer.submit(path, add_a),
+                writer.submit(path, half_applied),
+                writer.submit(path, lambda data: data.update(b=2)),
+            ]
+        assert futures[0].result(5) == "a"
+        futures[2].result(5)
+        # 失败后重读文件并重放此前成功的更新，结果取首次执行
+        assert calls == ["a", "a"]
+        try:
+            futures[1].result(5)
+            assert False, "失败的更新应抛出异常"
+        except ValueError:
+            pass
+        assert read_data(path) == {"a": 1, "b": 2}
+
+        # 全部失败时不写文件
+        writes = writer.stats()["writes"]
+        try:
+            writer.update(path, half_applied, timeout=5)
+        except ValueError:
+            pass
+        assert writer.stats()["writes"] == writes
+        assert read_data(path) == {"a": 1, "b": 2}
+
+
+def test_analysis_results_index():
+    """测试分析结果按目标索引、分页及旧版JSON迁移"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        legacy_path = os.path.join(data_dir, "analysis_results.json")
+        with open(legacy_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "old": {"id": "old", "target_type": "company", "target_id": "000001",
+                        "analysis_type": "comprehensive", "created_at": "2023-01-01T00:00:00"}
+            }, f)
+
+        manager = DataManager(data_dir)
+        assert not os.path.exists(legacy_path)
+        assert manager.get_analysis_result("old")["target_id"] == "000001"
+
+        for i in range(5):
+            manager.save_analysis_result({
+                "id": f"a{i}", "target_type": "company", "target_id": "000001",
+                "analysis_type": "financial" if i % 2 else "comprehensive",
+                "created_at": f"2024-01-0{i + 1}T00:00:00"
+            })
+        manager.save_analysis_result({"target_type": "industry", "target_id": "银行"})
+
+        results = manager.get_analysis_results("company", "000001")
+        assert [r["id"] for r in results] == ["a4", "a3", "a2", "a1", "a0", "old"]
+        page = manager.get_analysis_results("company", "000001", limit=2, offset=1)
+        assert [r["id"] for r in page] == ["a3", "a2"]
+        financial = manager.get_analysis_results("company", "000001", analysis_type="financial")
+        assert [r["id"] for r in financial] == ["a3", "a1"]
+        assert manager.count_analysis_results("company", "000001") == 6
+        assert manager.get_data_summary()["analysis_results"] == 7
+
+
+def test_serializer_formats():
+    """测试数据文件编码与压缩，以及旧版缩进JSON文件的兼容读取"""
+    from app.utils.serializer import Serializer
+    from app.utils.helpers import save_json, load_json
+
+    record = {"code": "000001", "name": "平安银行", "revenue": 1.5, "tags": ["金融", None]}
+    for compression in ("none", "gzip", "zstd"):
+        codec = Serializer("json", compression)
+        assert Serializer.loads(codec.dumps(record)) == record
+    gzip_codec = Serializer("json", "gzip")
+    assert gzip_codec.dumps(record)[:2] == b"\x1f\x8b"
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 旧版：标准库json缩进写入
+        with open(os.path.join(data_dir, "companies.json"), 'w', encoding='utf-8') as f:
+            json.dump({"000001": record}, f, ensure_ascii=False, indent=2)
+        manager = DataManager(data_dir)
+        assert manager.get_company("000001")["name"] == "平安银行"
+
+        # 按当前配置重新写入后仍可读取
+        assert manager.save_json({"000001": record}, "companies.json")
+        assert manager.get_company("000001")["tags"] == ["金融", None]
+
+        filepath = os.path.join(data_dir, "export", "sample.json")
+        assert save_json({"000001": record}, filepath)
+        assert load_json(filepath) == {"000001": record}
+
+        with open(filepath, 'wb') as f:
+            f.write(gzip_codec.dumps({"000001": record}))
+        assert load_json(filepath) == {"000001": record}
+
+
+def test_sql_repository():
+    """测试SQL数据仓库（接口与DataManager一致）及JSON迁移"""
+    from app.database.repository import SQLRepository, MIGRATION_MARKER
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 先用JSON后端写入数据，再由SQL数据仓库首次启动时迁移
+        json_manager = DataManager(data_dir)
+        json_manager.save_company({"code": "000001", "name": "平安银行", "industry": "金融"})
+        json_manager.save_financial_data("000001", {"report_date": "20231231", "data_type": "annual", "revenue": 1.0})
+        json_manager.save_industry_data("金融", {"company_count": 1})
+        updated_at = json_manager.get_financial_data("000001")[0]["updated_at"]
+
+        repository = SQLRepository(data_dir)
+        assert os.path.exists(os.path.join(data_dir, MIGRATION_MARKER))
+        assert repository.get_company("000001")["name"] == "平安银行"
+        assert repository.get_industry_data("金融")["company_count"] == 1
+        # 迁移保留原有的更新时间；SQL后端不另建财务日志与分析结果库
+        assert repository.get_financial_data("000001")[0]["updated_at"] == updated_at
+        assert repository.financial_journal is None and repository.analysis_store is None
+
+        repository.save_companies_bulk([
+            {"code": "600519", "name": "贵州茅台", "industry": "白酒"},
+            {"code": "000001", "name": "平安银行", "industry": "银行"},
+        ])
+        assert [c["code"] for c in repository.get_companies_by_industry("银行")] == ["000001"]
+        assert len(repository.get_all_companies()) == 2
+
+        repository.save_financial_data_bulk([
+            {"company_id": "000001", "report_date": "20231231", "data_type": "annual", "revenue": 3.0},
+            {"company_id": "600519", "report_date": "2023-09-30", "data_type": "quarterly", "revenue": 2.0},
+        ])
+        assert [r["revenue"] for r in repository.get_financial_data("000001")] == [3.0]
+        records = repository.get_financial_data_by_period("2023-10-01", "20231231")
+        assert [(r["company_id"], r["revenue"]) for r in records] == [("000001", 3.0)]
+        # JSON后端的同名接口返回相同结果
+        json_manager.save_financial_data("000001", {"report_date": "20231231", "data_type": "annual", "revenue": 3.0})
+        json_records = json_manager.get_financial_data_by_period("2023-10-01", "20231231")
+        assert [(r["company_id"], r["revenue"]) for r in json_records] == [("000001", 3.0)]
+
+        repository.save_analysis_result({"target_type": "company", "target_id": "000001", "summary": "稳健"})
+        assert repository.get_analysis_results("company", "000001")[0]["summary"] == "稳健"
+
+        assert repository.get_data_summary() == {
+            "companies": 2, "industries": 1, "analysis_results": 1, "total_financial_records": 2
+        }
+        # 缺少报告期的记录同样按 (公司, 数据类型) 覆盖
+        repository.save_financial_data("600519", {"data_type": "forecast", "revenue": 1.0})
+        repository.save_financial_data("600519", {"data_type": "forecast", "revenue": 4.0})
+        assert [r["revenue"] for r in repository.get_financial_data("600519")] == [2.0, 4.0]
+        assert len(repository.get_financial_data_by_period()) == 2
+
+        assert repository.delete_financial_data("600519") == True
+        assert repository.get_financial_data("600519") == []
+        assert repository.delete_company("600519") == True
+
+        # 缓存接口沿用CacheStore
+        assert repository.save_cache_data("k", {"v": 1})
+        assert repository.get_cache_data("k") == {"v": 1}
+        repository.engine.dispose()
+
+
+if __name__ == "__main__":
+    # 运行测试
+    test_cache_store_roundtrip()
+    test_cache_store_migrates_legacy_json()
+    test_cache_store_eviction()
+    test_sqlite_connections_closed()
+    test_json_memory_cache()
+    test_financial_journal_upsert()
+    test_financial_journal_compaction_and_migration()
+    test_bulk_writes()
+    test_concurrent_updates()
+    test_failed_update_not_written()
+    test_analysis_results_index()
+    test_serializer_formats()
+    test_sql_repository()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,115 @@
+"""
+DataFrame列式规范化测试
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from helpers import industries
+from app.utils.frame_normalizer import FrameSchema, frame_to_dict
+from app.services.collectors import akshare_collector
+from app.services.collectors.akshare_collector import AKShareCollector
+
+
+def _hist_frame():
+    """构造akshare日线格式的DataFrame（数值列含字符串与缺失值，缺少换手率列）"""
+    return pd.DataFrame({
+        "日期": ["2024-01-02", "2024-01-03", "2024-01-04"],
+        "开盘": ["10.5", 11, "-"],
+        "最高": [11.0, 12.0, 13.0],
+        "最低": [10.0, 10.5, 11.0],
+        "收盘": [10.8, 11.5, 12.5],
+        "成交量": [100, 200, np.nan],
+        "成交额": [1000.0, 2000.0, 3000.0],
+        "涨跌幅": [1.0, -0.5, 2.0],
+    })
+
+
+def test_schema_records():
+    """测试一次重命名、按列转换类型及缺失字段补空"""
+    records = akshare_collector.STOCK_HIST_SCHEMA.records(_hist_frame())
+    assert len(records) == 3
+    assert list(records[0]) == [
+        "date", "open", "high", "low", "close", "volume", "amount", "change_pct", "turnover"
+    ]
+    assert records[0]["date"] == "2024-01-02"
+    assert records[0]["open"] == 10.5 and isinstance(records[1]["open"], float)
+    # 无法解析的数值、缺失值及缺失的列均为None
+    assert records[2]["open"] is None
+    assert records[2]["volume"] is None
+    assert records[0]["turnover"] is None
+
+    schema = FrameSchema({"代码": "symbol", "最新价": "price"}, numeric=("price",), strings=("symbol",))
+    frame = schema.frame(pd.DataFrame({"代码": [" 600519", None], "最新价": ["1700.5", None], "其他": [1, 2]}))
+    assert list(frame.columns) == ["symbol", "price"]
+    assert frame["price"].dtype == np.float64
+    assert schema.records(None) == []
+    assert schema.records(frame.iloc[0:0]) == []
+    assert schema.records(pd.DataFrame({"代码": [" 600519", None]}), industry="白酒") == [
+        {"symbol": "600519", "price": None, "industry": "白酒"},
+        {"symbol": None, "price": None, "industry": "白酒"},
+    ]
+
+    info = pd.DataFrame({"item": ["股票简称", "总股本"], "value": ["平安银行", np.nan]})
+    assert frame_to_dict(info, "item", "value") == {"股票简称": "平安银行", "总股本": None}
+    assert frame_to_dict(info, "明细", "数据") == {}
+
+
+def test_collector_methods():
+    """测试采集器各方法的输出（不访问网络）"""
+    original, original_index = akshare_collector.ak, akshare_collector.industry_index
+    akshare_collector.industry_index = industries()
+    akshare_collector.ak = SimpleNamespace(
+        stock_zh_a_hist=lambda **kwargs: _hist_frame(),
+        stock_individual_info_em=lambda symbol: pd.DataFrame({"item": ["股票简称"], "value": ["平安银行"]}),
+        stock_financial_abstract=lambda symbol: pd.DataFrame(),
+        stock_sector_detail=lambda sector: pd.DataFrame({
+            "代码": [600519, "000001"],
+            "名称": ["贵州茅台", "平安银行"],
+            "最新价": [1700.0, "10.5"],
+            "涨跌幅": [1.2, None],
+            "行业": ["食品饮料", "银行"],
+        }),
+        stock_sector_spot=lambda indicator: pd.DataFrame({
+            "板块名称": ["银行"], "涨跌幅": [0.5], "最新价": ["1000"], "总成交量": [1e6], "总成交额": [1e9]
+        }),
+        fund_em_open_fund_info=lambda fund, indicator: pd.DataFrame({
+            "净值日期": ["2023-12-29", "2024-01-02", "2024-01-03"],
+            "单位净值": [1.0, 1.01, "1.02"],
+            "日增长率": [0.0, 1.0, 0.99],
+        }),
+        fund_em_fund_info=lambda fund: pd.DataFrame({"明细": ["基金简称"], "数据": ["测试基金"]}),
+    )
+    try:
+        collector = AKShareCollector()
+        stock = collector.get_stock_data("000001")
+        assert stock["company_name"] == "平安银行"
+        assert stock["industry"] == "银行"
+        assert stock["industry_levels"]["level3"] == "股份制银行Ⅲ"
+        assert [item["close"] for item in stock["historical_data"]] == [10.8, 11.5, 12.5]
+
+        fund = collector.get_fund_data("000001", start_date="20240101", end_date="20240131")
+        assert fund["fund_name"] == "测试基金"
+        assert [item["date"] for item in fund["historical_data"]] == ["2024-01-02", "2024-01-03"]
+        assert fund["historical_data"][1]["nav"] == 1.02
+        assert fund["historical_data"][0]["accumulative_nav"] is None
+
+        assert collector.get_industry_list() == [
+            {"name": "银行", "change_pct": 0.5, "price": 1000.0, "volume": 1e6, "amount": 1e9}
+        ]
+        stocks = collector.get_industry_stocks("申万一级")
+        assert stocks[0] == {
+            "symbol": "600519", "name": "贵州茅台", "price": 1700.0, "change_pct": 1.2, "industry": "申万一级"
+        }
+        assert stocks[1]["change_pct"] is None
+    finally:
+        akshare_collector.ak, akshare_collector.industry_index = original, original_index
+
+
+if __name__ == "__main__":
+    # 运行测试
+    test_schema_records()
+    test_collector_methods()
+    print("✅ 所有测试通过！")
@@ -0,0 +1,130 @@
+"""
+申万行业索引测试
+"""
+
+import re
+import threading
+import time
+
+import pandas as pd
+
+from helpers import MemoryStore
+from app.utils.industry_index import IndustryIndex, build_index
+
+
+def _history():
+    """申万个股行业分类变动历史（000001曾被重新分类）"""
+    return pd.DataFrame({
+        "symbol": ["000001", "000001", "600519", "600276", "688180"],
+        "start_date": ["2014-01-01", "2021-07-30", "2021-07-30", "2021-07-30", "2021-07-30"],
+        "industry_code": ["480101", "480301", "340501", "370101", "370201"],
+    })
+
+
+def _categories():
+    """申万行业类目（巨潮类目编码带S前缀）"""
+    return pd.DataFrame({
+        "类目编码": ["S48", "S4803", "S480301", "S34", "S3405", "S340501", "S37", "S3701", "S370101", "S3702",
+                 "S370201", "S3702"],
+        "类目名称": ["银行", "股份制银行Ⅱ", "股份制银行Ⅲ", "食品饮料", "白酒Ⅱ", "白酒Ⅲ", "医药生物", "化学制药",
+                 "化学制剂", "中药Ⅱ", "中药Ⅲ", "中药（旧）"],
+        "终止日期": [None] * 11 + ["2021-07-29"],
+    })
+
+
+def _index(store=None, fetched=None, warm=True, gate=None):
+    calls = []
+
+    def fetcher():
+        calls.append(1)
+        if gate is not None:
+            gate.wait(5)
+        return fetched if fetched is not None else build_index(_history(), _categories())
+
+    index = IndustryIndex(fetcher, store or MemoryStore(), refresh_hours=24)
+    if warm:
+        index.warm(wait=True, timeout=5)
+    return index, calls
+
+
+def test_build_and_lookup():
+    """测试按最新分类构建索引及各级行业查询"""
+    index, calls = _index()
+    assert index.get("000001") == {
+        "symbol": "000001", "code": "480301", "level1": "银行", "level2": "股份制银行Ⅱ", "level3": "股份制银行Ⅲ"
+    }
+    assert index.industry("600519") == "食品饮料"
+    assert index.industry("688180", level=2) == "中药Ⅱ"
+    assert index.industry("999999") == ""
+    assert index.get("999999") is None
+
+    assert index.symbols("医药生物").tolist() == ["600276", "688180"]
+    assert index.symbols("白酒Ⅲ").tolist() == ["600519"]
+    assert index.matching(re.compile("医药|中药")).tolist() == ["600276", "688180"]
+    assert index.industries(1) == {"医药生物": 2, "银行": 1, "食品饮料": 1}
+    assert calls == [1]
+
+
+def test_cache_and_refresh():
+    """测试索引持久化复用、过期后后台刷新及获取失败时沿用旧索引"""
+    store = MemoryStore()
+    index, calls = _index(store)
+    assert index.industry("000001") == "银行"
+    assert store.items["shenwan_industry_index"]["symbols"] == ["000001", "600276", "600519", "688180"]
+
+    # 新实例直接使用缓存，不访问上游
+    cached, cached_calls = _index(store)
+    assert cached.industry("600519") == "食品饮料"
+    assert cached.info()["source"] == "cache"
+    assert cached_calls == []
+
+    # 过期后先返回旧索引，后台刷新
+    store.items["shenwan_industry_index"]["fetched_at"] = time.time() - 25 * 3600
+    renamed = build_index(_history(), _categories().replace({"银行": "银行业"}))
+    gate = threading.Event()
+    expired, expired_calls = _index(store, renamed, warm=False, gate=gate)
+    assert expired.industry("000001") == "银行"
+    gate.set()
+    for _ in range(100):
+        if expired.info()["source"] == "akshare":
+            break
+        time.sleep(0.01)
+    assert expired.industry("000001") == "银行业"
+    assert expired_calls == [1]
+
+    def failing():
+        raise ConnectionError("network down")
+
+    unavailable = IndustryIndex(failing, MemoryStore())
+    assert not unavailable.warm(wait=True, timeout=5)
+    assert unavailable.get("000001") is None
+    assert unavailable.industries(1) == {}
+    assert unavailable.info()["source"] == "empty"
+
+
+def test_lookup_never_blocks():
+    """测试没有索引时查询立即返回空结果，索引在后台加载"""
+    release = threading.Event()
+
+    def slow_fetcher():
+        release.wait(5)
+        return build_index(_history(), _categories())
+
+    index = IndustryIndex(slow_fetcher, MemoryStore())
+    started = time.time()
+    assert index.get("000001") is None
+    assert index.matching(re.compile("银行")).tolist() == []
+    assert time.time() - started < 1
+    assert index.info()["loading"]
+
+    release.set()
+    assert index.warm(wait=True, timeout=5)
+    assert index.industry("000001") == "银行"
+
+
+if __name__ == "__main__":
+    # 运行测试
+    test_build_and_lookup()
+    test_cache_and_refresh()
+    test_lookup_never_blocks()
+    print("✅ 所有测试通过！")
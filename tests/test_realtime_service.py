@@ -0,0 +1,468 @@
+"""
+实时数据服务测试
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from helpers import industries
+from app.core.config import settings
+from app.services.spot_snapshot import SpotSnapshotManager
+from app.services.realtime_data_service import RealtimeDataService
+from app.utils.single_flight import SingleFlight
+
+
+def _spot_frame():
+    """构造akshare全市场行情格式的DataFrame"""
+    return pd.DataFrame({
+        "代码": ["000001", "600519", "600276"],
+        "名称": ["平安银行", "贵州茅台", "恒瑞医药"],
+        "最新价": [10.5, 1700.0, 45.2],
+        "涨跌幅": [1.2, -0.5, 0.3],
+        "成交量": [1000, 200, 300],
+        "成交额": [1.0e6, 3.4e8, 1.3e7],
+        "总市值": [2.0e11, 2.1e12, 2.9e11],
+        "市盈率": [5.1, 30.2, 60.0],
+        "市净率": [0.6, 9.1, 7.5],
+    })
+
+
+@contextmanager
+def _session_agnostic():
+    """按固定TTL计算过期时间，使测试结果与运行时所处的交易时段无关"""
+    original = settings.SESSION_AWARE_TTL
+    settings.SESSION_AWARE_TTL = False
+    try:
+        yield
+    finally:
+        settings.SESSION_AWARE_TTL = original
+
+
+class _CountingFetcher:
+    """记录调用次数的行情拉取函数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return _spot_frame()
+
+
+def test_spot_snapshot_shared():
+    """测试多个服务实例共享同一份快照，只拉取一次全表"""
+    fetcher = _CountingFetcher()
+    snapshots = SpotSnapshotManager(fetcher, refresh_interval=0, max_age=300, industries=industries())
+
+    first = RealtimeDataService(snapshots)._fetch_stock_realtime("000001")
+    second = RealtimeDataService(snapshots)._fetch_stock_realtime("600519")
+    assert fetcher.calls == 1
+    assert first["name"] == "平安银行"
+    assert second["current_price"] == 1700.0
+    assert first["snapshot_time"] == second["snapshot_time"]
+    assert first["snapshot_age"] >= 0
+
+    # 超过最大年龄时同步刷新
+    assert snapshots.get(max_age=0).version == 2
+    assert fetcher.calls == 2
+    assert snapshots.info()["available"] == True
+
+
+def test_spot_snapshot_index():
+    """测试快照按代码/名称索引及批量查询"""
+    frame = _spot_frame()
+    frame.loc[1, "市盈率"] = "-"
+    snapshots = SpotSnapshotManager(lambda: frame, refresh_interval=0, max_age=300, industries=industries())
+    snapshot = snapshots.get()
+
+    assert snapshot.row("600276") == 2
+    assert snapshot.row("贵州茅台") == 1
+    assert snapshot.quote("恒瑞医药")["code"] == "600276"
+    assert snapshot.quote("999999") is None
+
+    quotes, missing = snapshot.quotes(["600519", "999999", "000001", "600519"])
+    assert list(quotes) == ["600519", "000001"]
+    assert missing == ["999999"]
+    assert quotes["600519"]["pe_ratio"] is None
+    assert quotes["000001"]["current_price"] == 10.5
+
+
+def test_industry_matching():
+    """测试行业关键词匹配结果按快照缓存，申万行业成分股单独查询"""
+    frame = _spot_frame()
+    frame.loc[3] = ["688180", "君实生物", 30.0, 1.0, 100, 3.0e6, 3.0e10, float("nan"), 3.0]
+    frame.loc[4] = ["300760", "迈瑞", 300.0, 0.5, 100, 3.0e7, 3.6e11, 30.0, 9.0]
+    snapshots = SpotSnapshotManager(lambda: frame, refresh_interval=0, max_age=300, industries=industries())
+    snapshot = snapshots.get()
+
+    # 行业关键词只匹配名称，名称不含关键词的迈瑞（申万医药生物）不在结果中
+    mask = snapshot.industry_mask("医药")
+    assert mask.tolist() == [False, False, True, True, False]
+    assert snapshot.industry_mask("医药") is mask
+    assert snapshot.industry_rows("银行").tolist() == [0]
+
+    service = RealtimeDataService(snapshots)
+    companies = service._fetch_industry_companies("医药")
+    assert [company["code"] for company in companies] == ["600276", "688180"]
+    assert companies[1]["pe_ratio"] is None and companies[1]["industry"] == "医药"
+
+    # 申万行业成分股按分类精确匹配
+    assert snapshot.shenwan_rows("医药生物").tolist() == [4]
+    assert snapshot.shenwan_rows("白酒Ⅱ").tolist() == [1]
+    assert snapshot.shenwan_rows("医药").tolist() == []
+    shenwan = service.get_shenwan_companies_realtime("医药生物")
+    assert [company["code"] for company in shenwan["companies"]] == ["300760"]
+    assert shenwan["companies"][0]["industry"] == "医药生物"
+
+    from fastapi import HTTPException
+    from app.api.endpoints import realtime_data
+    original = realtime_data.realtime_service
+    realtime_data.realtime_service = service
+    try:
+        response = realtime_data.get_shenwan_companies_realtime("医药生物")
+        assert response.count == 1 and response.companies[0].code == "300760"
+        try:
+            realtime_data.get_shenwan_companies_realtime("医药")
+            assert False, "不存在的申万行业应返回404"
+        except HTTPException as e:
+            assert e.status_code == 404
+    finally:
+        realtime_data.realtime_service = original
+    assert service._fetch_stock_realtime("600519")["industry"] == "食品饮料"
+    assert companies[0]["snapshot_time"] == snapshot.meta()["snapshot_time"]
+
+    # 刷新后的新快照重新匹配
+    assert snapshots.get(max_age=0).industry_mask("医药") is not mask
+
+
+def test_batch_quotes():
+    """测试批量行情查询（服务与接口）"""
+    from app.api.endpoints import realtime_data
+
+    fetcher = _CountingFetcher()
+    service = RealtimeDataService(SpotSnapshotManager(fetcher, refresh_interval=0, max_age=300, industries=industries()))
+    result = service.get_stocks_realtime_data(["000001", " 600519", "", "888888"])
+    assert list(result["quotes"]) == ["000001", "600519"]
+    assert result["missing"] == ["888888"]
+    assert result["quotes"]["600519"]["source"] == "AKShare实时获取"
+    assert result["snapshot_age"] >= 0
+
+    original = realtime_data.realtime_service
+    realtime_data.realtime_service = service
+    try:
+        response = realtime_data.get_stocks_realtime_data("600276,000001,888888", False)
+        assert response.count == 2
+        assert response.quotes["600276"].name == "恒瑞医药"
+        assert response.missing == ["888888"]
+        response = realtime_data.post_stocks_realtime_data(
+            realtime_data.BatchStockRequest(symbols=["600519"])
+        )
+        assert response.quotes["600519"].current_price == 1700.0
+    finally:
+        realtime_data.realtime_service = original
+    assert fetcher.calls == 1
+
+
+def test_single_flight():
+    """测试并发的相同请求只执行一次上游调用，各调用方得到结果的独立副本"""
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch(value):
+        calls.append(value)
+        release.wait(5)
+        return {"value": value}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("spot:all", slow_fetch, 1)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    # 等所有请求都进入等待后再放行
+    deadline = time.time() + 5
+    while flight.in_flight().get("spot:all", 0) < 7 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert len(results) == 8 and all(result == {"value": 1} for result in results)
+    # 每个调用方得到独立副本，修改不会影响其他请求
+    results[0]["industry"] = "银行"
+    assert len({id(result) for result in results}) == 8
+    assert all("industry" not in result for result in results[1:])
+    stats = flight.stats()["namespaces"]["spot"]
+    assert stats == {"calls": 1, "shared": 7, "max_waiters": 7}
+    assert flight.in_flight() == {}
+
+    # 只读结果可直接共享；没有等待者时不复制
+    release.clear()
+    shared = []
+    threads = [
+        threading.Thread(target=lambda: shared.append(flight.do("spot:all", slow_fetch, 2, copy_result=False)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    while flight.in_flight().get("spot:all", 0) < 2 and time.time() < deadline + 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(result is shared[0] for result in shared)
+    single = {"value": 3}
+    assert flight.do("spot:one", lambda: single) is single
+
+    # 异常同样共享，下次调用重新执行
+    def failing():
+        raise ConnectionError("down")
+
+    try:
+        flight.do("financial:000001", failing)
+        assert False, "应抛出异常"
+    except ConnectionError:
+        pass
+    assert flight.do("financial:000001", lambda: "ok") == "ok"
+
+    # 等待超时的请求不计入等待者与共享统计
+    release.clear()
+    leader = threading.Thread(target=lambda: flight.do("bars:000001", slow_fetch, 4))
+    leader.start()
+    while "bars:000001" not in flight.in_flight() and time.time() < deadline + 10:
+        time.sleep(0.01)
+    try:
+        flight.do("bars:000001", slow_fetch, 4, timeout=0.05)
+        assert False, "应等待超时"
+    except TimeoutError:
+        pass
+    assert flight.in_flight() == {"bars:000001": 0}
+    release.set()
+    leader.join()
+    assert flight.stats()["namespaces"]["bars"] == {"calls": 1, "shared": 0, "max_waiters": 0}
+
+
+def test_spot_snapshot_keeps_old_on_failure():
+    """测试刷新失败时保留旧快照"""
+    frames = [_spot_frame()]
+
+    def fetcher():
+        if not frames:
+            raise ConnectionError("network down")
+        return frames.pop()
+
+    snapshots = SpotSnapshotManager(fetcher, refresh_interval=0, max_age=300, industries=industries())
+    assert snapshots.get().version == 1
+    assert snapshots.get(max_age=0).version == 1
+    assert snapshots.info()["failures"] == 1
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_stale_snapshot_revalidate():
+    """测试过期不久的快照直接返回并在后台刷新，过期太久时同步刷新"""
+    from datetime import timedelta
+
+    with _session_agnostic():
+        fetcher = _CountingFetcher()
+        snapshots = SpotSnapshotManager(fetcher, refresh_interval=0, max_age=60, industries=industries())
+        service = RealtimeDataService(snapshots)
+        first = snapshots.get()
+        first.fetched_at -= timedelta(seconds=120)
+
+        quote = service._fetch_stock_realtime("000001")
+        assert quote["stale"] == True
+        assert quote["snapshot_age"] >= 120
+        assert _wait_for(lambda: snapshots.peek().version == 2)
+        assert fetcher.calls == 2
+        assert service._fetch_stock_realtime("000001")["stale"] == False
+
+        # 超过 MAX_STALENESS 或强制刷新时同步刷新
+        snapshots.peek().fetched_at -= timedelta(seconds=60 + settings.MAX_STALENESS)
+        assert snapshots.get().version == 3
+        assert snapshots.get(max_age=0, allow_stale=False).version == 4
+        assert snapshots.info()["stale_served"] == 1
+
+
+def test_stale_financial_and_industry_data():
+    """测试过期的财务/行业数据先返回旧值，后台刷新"""
+    from datetime import datetime, timedelta
+    from app.services import realtime_data_service
+
+    expired = (datetime.now() - timedelta(days=7, minutes=10)).isoformat()
+    too_old = (datetime.now() - timedelta(days=30)).isoformat()
+
+    class _Store:
+        financial = {"000001": [{"report_date": "2024-12-31", "updated_at": expired}]}
+        industry = {"银行": {"name": "银行", "updated_at": too_old}}
+
+        def get_financial_data(self, code):
+            return self.financial.get(code, [])
+
+        def get_industry_data(self, industry):
+            return self.industry.get(industry)
+
+    service = RealtimeDataService(SpotSnapshotManager(_spot_frame, refresh_interval=0, industries=industries()))
+    refreshed = []
+    service._collect_financial_data = lambda code: refreshed.append(code) or [{"report_date": "new"}]
+    service._collect_industry_data = lambda industry: refreshed.append(industry) or {"name": industry}
+
+    original = realtime_data_service.data_manager
+    realtime_data_service.data_manager = _Store()
+    try:
+        financial = service.get_financial_data("000001")
+        assert financial[0]["stale"] == True and financial[0]["report_date"] == "2024-12-31"
+        assert _wait_for(lambda: refreshed == ["000001"] and not service._revalidating)
+
+        # 超过 MAX_STALENESS 的行业数据同步刷新
+        assert service.get_industry_data("银行") == {"name": "银行"}
+        assert refreshed == ["000001", "银行"]
+
+        # 旧版本写入的示例指标不当作新鲜数据返回
+        _Store.industry["医药"] = {
+            "industry": "医药", "market_size": 1000000000, "growth_rate": 0.15,
+            "source": "AKShare行业数据", "updated_at": datetime.now().isoformat()
+        }
+        assert service.get_industry_data("医药") == {"name": "医药"}
+        assert refreshed[-1] == "医药"
+    finally:
+        realtime_data_service.data_manager = original
+
+
+def test_industry_data_without_placeholders():
+    """测试行业数据不写入示例指标，缺失的指标列在unavailable_fields中"""
+    service = RealtimeDataService(SpotSnapshotManager(_spot_frame, refresh_interval=0, industries=industries()))
+    data = service._fetch_industry_data("医药")
+    assert data["market_size"] is None and data["growth_rate"] is None and data["avg_pe"] is None
+    assert data["company_count"] == 1
+    assert data["unavailable_fields"] == ["market_size", "growth_rate", "avg_pe"]
+    assert service._fetch_industry_data("军工")["unavailable_fields"] == [
+        "market_size", "growth_rate", "company_count", "avg_pe"
+    ]
+
+
+def test_persisted_cache_freshness():
+    """测试缓存新鲜度按持久化的写入时间判断，新建的服务实例同样命中缓存"""
+    from app.services import realtime_data_service
+    from app.utils import freshness
+
+    class _Cache:
+        def __init__(self):
+            self.items = {}
+
+        def get_cache_item(self, key):
+            return self.items.get(key)
+
+        def save_cache_data(self, key, data):
+            self.items[key] = {"data": data, "timestamp": time.time()}
+            return True
+
+    cache = _Cache()
+    fetcher = _CountingFetcher()
+    snapshots = SpotSnapshotManager(fetcher, refresh_interval=0, max_age=300, industries=industries())
+    original = realtime_data_service.data_manager
+    realtime_data_service.data_manager = cache
+    try:
+        with _session_agnostic():
+            first = RealtimeDataService(snapshots).get_stock_realtime_data("000001")
+            assert "stock_cache_000001" in cache.items
+            # 新实例直接使用缓存
+            quote = RealtimeDataService(snapshots).get_stock_realtime_data("000001")
+            assert quote["update_time"] == first["update_time"] and quote["stale"] == False
+
+            # 超过新鲜期及 MAX_STALENESS 后重新获取
+            time.sleep(0.001)
+            cache.items["stock_cache_000001"]["timestamp"] -= (
+                freshness.ttl("quote").total_seconds() + settings.MAX_STALENESS + 1
+            )
+            quote = RealtimeDataService(snapshots).get_stock_realtime_data("000001")
+            assert quote["update_time"] != first["update_time"]
+            assert fetcher.calls == 1
+    finally:
+        realtime_data_service.data_manager = original
+
+    assert freshness.is_fresh(time.time(), "financial")
+    assert not freshness.is_fresh(None, "history")
+    assert freshness.data_age("not a date") is None
+
+
+def test_snapshot_delta_feed():
+    """测试快照增量计算及按过滤条件分组推送（同组连接共享同一帧），已断开的连接自动移除"""
+    import asyncio
+    import json
+    from app.services.spot_feed import SpotDeltaFeed, FeedFilter, diff_snapshots
+
+    base = _spot_frame()
+    frame = base[base["代码"] != "600276"].copy()
+    frame.loc[frame["代码"] == "600519", "最新价"] = 1710.0
+    frame.loc[frame["代码"] == "000001", "涨跌幅"] = 9.9  # 价格与成交量未变，不推送
+    frame = pd.concat([frame, pd.DataFrame({"代码": ["300750"], "名称": ["宁德时代"], "最新价": [200.0]})])
+    frames = [frame, base]
+    snapshots = SpotSnapshotManager(lambda: frames.pop(), refresh_interval=0, max_age=300, industries=industries())
+    feed = SpotDeltaFeed(snapshots)
+
+    first = snapshots.get()
+    loop = asyncio.new_event_loop()
+    try:
+        watch = [feed.subscribe(FeedFilter.create(["600519", "300750 "]), loop) for _ in range(2)]
+        sector = feed.subscribe(FeedFilter.create(industry="医药"), loop)
+        second = snapshots.refresh()
+        loop.run_until_complete(asyncio.sleep(0))
+
+        delta = diff_snapshots(first, second)
+        assert second.codes[delta.rows].tolist() == ["600519", "300750"]
+        assert first.codes[delta.removed_rows].tolist() == ["600276"]
+
+        shared = watch[0].queue.get_nowait()
+        assert watch[1].queue.get_nowait() is shared
+        payload = json.loads(shared.split(b"data: ", 1)[1])
+        assert [quote["code"] for quote in payload["quotes"]] == ["600519", "300750"]
+        assert payload["base_version"] == 1 and payload["version"] == 2
+
+        sector_payload = json.loads(sector.queue.get_nowait().split(b"data: ", 1)[1])
+        assert sector_payload["quotes"] == [] and sector_payload["removed"] == ["600276"]
+        assert feed.stats()["frames"] == 2 and feed.stats()["deliveries"] == 3
+
+        assert feed.snapshot_frame(FeedFilter.create(["000001"])).startswith(b"id: 2\nevent: snapshot\n")
+        for subscription in watch + [sector]:
+            feed.unsubscribe(subscription)
+        assert feed.stats()["connections"] == 0
+    finally:
+        loop.close()
+
+    # 事件循环已关闭（连接已断开）的订阅在下次推送时移除，不再投递
+    dead_loop = asyncio.new_event_loop()
+    dead = feed.subscribe(FeedFilter.create(["600519"]), dead_loop)
+    dead_loop.close()
+    frames.append(base.assign(最新价=base["最新价"] + 1))
+    snapshots.refresh()
+    stats = feed.stats()
+    assert dead.closed and stats["connections"] == 0 and stats["closed"] == 1
+    assert stats["deliveries"] == 3
+
+
+if __name__ == "__main__":
+    # 运行测试
+    test_spot_snapshot_shared()
+    test_spot_snapshot_index()
+    test_industry_matching()
+    test_batch_quotes()
+    test_single_flight()
+    test_spot_snapshot_keeps_old_on_failure()
+    test_stale_snapshot_revalidate()
+    test_stale_financial_and_industry_data()
+    test_industry_data_without_placeholders()
+    test_persisted_cache_freshness()
+    test_snapshot_delta_feed()
+    print("✅ 所有测试通过！")
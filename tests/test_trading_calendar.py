@@ -0,0 +1,123 @@
+"""
+交易日历与交易时段测试
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from helpers import MemoryStore
+from app.utils.trading_calendar import (
+    TradingCalendar, MARKET_TZ, PRE_OPEN, MORNING, LUNCH, AFTERNOON, CLOSED, HOLIDAY
+)
+
+# 2024年国庆节前后的交易日
+TRADE_DATES = ["2024-09-26", "2024-09-27", "2024-09-30", "2024-10-08", "2024-10-09"]
+
+
+def _at(day, hour, minute=0):
+    return datetime.fromisoformat(f"{day}T{hour:02d}:{minute:02d}:00").replace(tzinfo=MARKET_TZ)
+
+
+def _calendar(store=None, warm=True):
+    calls = []
+
+    def fetcher():
+        calls.append(1)
+        return list(TRADE_DATES)
+
+    calendar = TradingCalendar(fetcher, store or MemoryStore())
+    if warm:
+        calendar.warm(wait=True, timeout=5)
+    return calendar, calls
+
+
+def test_sessions():
+    """测试交易时段划分"""
+    calendar, calls = _calendar()
+    assert calendar.session(_at("2024-09-30", 9, 20)) == PRE_OPEN
+    assert calendar.session(_at("2024-09-30", 10)) == MORNING
+    assert calendar.session(_at("2024-09-30", 12)) == LUNCH
+    assert calendar.session(_at("2024-09-30", 14, 59)) == AFTERNOON
+    assert calendar.session(_at("2024-09-30", 15)) == CLOSED
+    assert calendar.session(_at("2024-09-30", 8)) == CLOSED
+    assert calendar.session(_at("2024-10-03", 10)) == HOLIDAY
+    assert calendar.session(_at("2024-09-28", 10)) == HOLIDAY
+    # 不带时区的时间按本地时间处理
+    assert calendar.session(_at("2024-09-30", 10).astimezone().replace(tzinfo=None)) == MORNING
+    assert calls == [1]
+
+    assert calendar.next_open(_at("2024-09-30", 12)) == _at("2024-09-30", 13)
+    assert calendar.next_open(_at("2024-09-30", 16)) == _at("2024-10-08", 9, 15)
+    assert calendar.next_open(_at("2024-09-30", 10)) == _at("2024-09-30", 10)
+    assert calendar.next_close(_at("2024-09-27", 16)) == _at("2024-09-30", 15)
+
+
+def test_session_expiry():
+    """测试按交易时段计算过期时间"""
+    calendar, _ = _calendar()
+    minute = timedelta(minutes=1)
+    # 交易时段内按TTL过期
+    assert calendar.quote_expiry(_at("2024-09-30", 10), minute) == _at("2024-09-30", 10, 1)
+    # 收盘后的结算缓冲期内仍按TTL过期，之后有效至下一次开盘（跨越国庆假期）
+    assert calendar.quote_expiry(_at("2024-09-30", 15, 3), minute) == _at("2024-09-30", 15, 4)
+    assert calendar.quote_expiry(_at("2024-09-30", 15, 10), minute) == _at("2024-10-08", 9, 15)
+    assert calendar.quote_expiry(_at("2024-09-30", 12), minute) == _at("2024-09-30", 13)
+
+    # 日线在下一次收盘（加缓冲期）后过期，且不超过TTL
+    day = timedelta(days=1)
+    assert calendar.bar_expiry(_at("2024-09-30", 10), day) == _at("2024-09-30", 15, 5)
+    assert calendar.bar_expiry(_at("2024-09-30", 16), day) == _at("2024-10-01", 16)
+    assert calendar.bar_expiry(_at("2024-09-30", 16), day * 30) == _at("2024-10-08", 15, 5)
+
+
+def test_calendar_cache_and_fallback():
+    """测试交易日缓存复用及获取失败时按工作日近似"""
+    store = MemoryStore()
+    calendar, calls = _calendar(store)
+    assert calendar.is_trading_day(_at("2024-10-08", 10).date())
+    assert store.items["trading_calendar"]["dates"] == TRADE_DATES
+
+    def failing():
+        raise ConnectionError("network down")
+
+    cached = TradingCalendar(failing, store)
+    assert cached.warm(wait=True, timeout=5)
+    assert not cached.is_trading_day(_at("2024-10-03", 10).date())
+    assert cached.info(_at("2024-10-03", 10))["source"] == "cache"
+
+    fallback = TradingCalendar(failing, MemoryStore())
+    assert not fallback.warm(wait=True, timeout=5)
+    assert fallback.is_trading_day(_at("2024-10-03", 10).date())
+    assert not fallback.is_trading_day(_at("2024-10-05", 10).date())
+    assert fallback.info()["source"] == "weekdays"
+    assert calls == [1]
+
+
+def test_lookup_never_blocks():
+    """测试没有交易日数据时查询不等待下载：先按工作日近似，后台加载完成后使用交易日"""
+    release = threading.Event()
+
+    def slow_fetcher():
+        release.wait(5)
+        return list(TRADE_DATES)
+
+    calendar = TradingCalendar(slow_fetcher, MemoryStore())
+    started = time.time()
+    # 国庆假期的工作日
+    assert calendar.is_trading_day(_at("2024-10-03", 10).date())
+    assert calendar.info(_at("2024-10-03", 10))["loading"]
+    assert time.time() - started < 1
+    release.set()
+    assert calendar.warm(wait=True, timeout=5)
+    assert not calendar.is_trading_day(_at("2024-10-03", 10).date())
+    assert calendar.info()["source"] == "akshare"
+
+
+if __name__ == "__main__":
+    # 运行测试
+    test_sessions()
+    test_session_expiry()
+    test_calendar_cache_and_fallback()
+    test_lookup_never_blocks()
+    print("✅ 所有测试通过！")